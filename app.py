@@ -1,29 +1,162 @@
-from flask import Flask, render_template, request, jsonify, Response, send_from_directory
+from flask import Flask, render_template, request, jsonify, Response, send_from_directory, stream_with_context, g
 from flask_pymongo import PyMongo
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
 import threading
 import time
-import requests
 from ping3 import ping
 import os
 import csv
 import io
-from io import TextIOWrapper
 import json
 from bson import ObjectId, json_util
 import subprocess
 import platform
 from requests.exceptions import RequestException
 import socket
-from pymongo.errors import DuplicateKeyError
+from pymongo import ReturnDocument
+from pymongo.errors import BulkWriteError, OperationFailure
 import sys
 import re
+import itertools
+import base64
+import zlib
+import hashlib
+from probe_engine import ProbeEngine
+from pinger import BatchPinger, PingerUnavailable
+from port_prober import PortProber
+from http_client import ProbeHTTPClient
+from bulk_writer import BulkWriter
+from summary_counters import SummaryCounters, SEQUENCE_STATUSES
+from system_events import (SystemEvents, BatchGroup, STREAM_BUSY, STREAM_START, change_event, parse_event_id,
+                           plain, sse_message)
+from probe_history import ProbeHistory, RESOLUTIONS
+from leases import LeaseManager
+from check_scheduler import CheckScheduler
+from probe_cache import ProbeCache
+import metrics
+import request_timing
+from request_timing import span, spanned
+from profiler import SamplingProfiler
+import hmac
+import logging
+import logging_config
+from sequence_engine import (SequenceEngine, SequenceError, dependency_graph,
+                             DryRunRunner, LocalRunner, SSHRunner)
+from urllib.parse import urlparse
+
+logging_config.configure()
+log = logging.getLogger('app')
 
 app = Flask(__name__, static_url_path='/static', static_folder='static')
 
 # MongoDB configuration
 app.config["MONGO_URI"] = os.getenv("MONGO_URI", "mongodb://localhost:27017/app_monitor")
-mongo = PyMongo(app)
+mongo = PyMongo(app, event_listeners=[metrics.MongoCommandTimer(), request_timing.MongoSpanListener()])
+metrics.init_app(app)
+request_timing.init_app(app)
+
+# Probe configuration
+PROBE_CONCURRENCY = int(os.getenv("PROBE_CONCURRENCY", 50))
+STATUS_INTERVAL = int(os.getenv("STATUS_INTERVAL", 60))
+STATUS_BATCH_SIZE = int(os.getenv("STATUS_BATCH_SIZE", 500))
+STATUS_FLUSH_INTERVAL = float(os.getenv("STATUS_FLUSH_INTERVAL", 2))
+IMPORT_CHUNK_SIZE = int(os.getenv("IMPORT_CHUNK_SIZE", 1000))
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", 1000))
+PING_TIMEOUT = float(os.getenv("PING_TIMEOUT", 2))
+DB_TIMEOUT = float(os.getenv("DB_TIMEOUT", 2))
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", 10))
+HTTP_POOL_HOSTS = int(os.getenv("HTTP_POOL_HOSTS", 1000))
+HTTP_POOL_PER_HOST = int(os.getenv("HTTP_POOL_PER_HOST", 4))
+HTTP_RELEARN_AFTER = int(os.getenv("HTTP_RELEARN_AFTER", 3))
+DB_FINGERPRINT = os.getenv("DB_FINGERPRINT", "true").lower() in ("1", "true", "yes")
+SUMMARY_RECONCILE_INTERVAL = int(os.getenv("SUMMARY_RECONCILE_INTERVAL", 300))
+EVENTS_HEARTBEAT = float(os.getenv("EVENTS_HEARTBEAT", 15))
+EVENTS_SIZE_MB = int(os.getenv("EVENTS_SIZE_MB", 16))
+EVENTS_MAX_STREAMS = int(os.getenv("EVENTS_MAX_STREAMS", 8))
+TOMBSTONE_RETENTION_DAYS = int(os.getenv("TOMBSTONE_RETENTION_DAYS", 7))
+HISTORY_RAW_DAYS = int(os.getenv("HISTORY_RAW_DAYS", 7))
+HISTORY_HOURLY_DAYS = int(os.getenv("HISTORY_HOURLY_DAYS", 90))
+HISTORY_DAILY_DAYS = int(os.getenv("HISTORY_DAILY_DAYS", 730))
+HISTORY_ROLLUP_INTERVAL = int(os.getenv("HISTORY_ROLLUP_INTERVAL", 300))
+PROBE_SCHEDULER = os.getenv("PROBE_SCHEDULER", "true").lower() in ("1", "true", "yes")
+PROBE_SHARDS = max(1, int(os.getenv("PROBE_SHARDS", 1)))
+LEASE_TTL = float(os.getenv("LEASE_TTL", 30))
+CHECK_INTERVAL_MIN = int(os.getenv("CHECK_INTERVAL_MIN", 10))
+CHECK_BACKOFF_MAX = int(os.getenv("CHECK_BACKOFF_MAX", 900))
+CHECK_JITTER = float(os.getenv("CHECK_JITTER", 0.1))
+NODE_CONCURRENCY = int(os.getenv("NODE_CONCURRENCY", 16))
+PROBE_CACHE_TTL = float(os.getenv("PROBE_CACHE_TTL", 10))
+PROFILER_TOKEN = os.getenv("PROFILER_TOKEN")
+SEQUENCE_RUNNER = os.getenv("SEQUENCE_RUNNER", "dry-run").lower()
+SEQUENCE_SSH_USER = os.getenv("SEQUENCE_SSH_USER")
+SEQUENCE_CONCURRENCY = int(os.getenv("SEQUENCE_CONCURRENCY", 10))
+SEQUENCE_STEP_TIMEOUT = float(os.getenv("SEQUENCE_STEP_TIMEOUT", 300))
+SEQUENCE_TOKEN = os.getenv("SEQUENCE_TOKEN")
+SEQUENCE_RUNNERS = ('dry-run', 'local', 'ssh')
+if SEQUENCE_RUNNER not in SEQUENCE_RUNNERS:
+    # A typo must not report shutdowns as done without running them
+    raise ValueError(f"Unknown SEQUENCE_RUNNER {SEQUENCE_RUNNER!r}, expected one of: {', '.join(SEQUENCE_RUNNERS)}")
+probe_engine = ProbeEngine(PROBE_CONCURRENCY)
+# Separate pool for cluster nodes: node checks run inside probes on probe_engine
+node_engine = ProbeEngine(NODE_CONCURRENCY)
+pinger = BatchPinger(timeout=PING_TIMEOUT)
+port_prober = PortProber(timeout=DB_TIMEOUT)
+http_client = ProbeHTTPClient(pool_connections=HTTP_POOL_HOSTS,
+                              pool_maxsize=HTTP_POOL_PER_HOST,
+                              timeout=HTTP_TIMEOUT)
+summary_counters = SummaryCounters(mongo.db.summary)
+system_events = SystemEvents(mongo.db.system_events, size_bytes=EVENTS_SIZE_MB * 1024 * 1024)
+# Each open stream holds a worker thread until the client goes away
+event_stream_slots = threading.BoundedSemaphore(EVENTS_MAX_STREAMS)
+probe_history = ProbeHistory(mongo.db, raw_days=HISTORY_RAW_DAYS, hourly_days=HISTORY_HOURLY_DAYS,
+                             daily_days=HISTORY_DAILY_DAYS, batch_size=STATUS_BATCH_SIZE,
+                             flush_interval=STATUS_FLUSH_INTERVAL)
+# Each probe shard is owned by one process at a time; the maintenance lease
+# elects the process that rebuilds the summary and rolls up probe history
+probe_leases = LeaseManager(mongo.db.leases, 'probe',
+                            [f"probe-shard-{shard}" for shard in range(PROBE_SHARDS)], ttl=LEASE_TTL)
+maintenance_lease = LeaseManager(mongo.db.leases, 'maintenance', ['maintenance'],
+                                 ttl=LEASE_TTL, owner=probe_leases.owner)
+# Shares results between manual tests and check_all runs of the same system
+probe_cache = ProbeCache(ttl=PROBE_CACHE_TTL)
+sampling_profiler = SamplingProfiler()
+check_scheduler = CheckScheduler(default_interval=STATUS_INTERVAL, min_interval=CHECK_INTERVAL_MIN,
+                                 jitter=CHECK_JITTER, max_backoff=CHECK_BACKOFF_MAX)
+
+def record_change(before, after):
+    """Apply a single system change to the summary counters and the event feed.
+
+    Called after the system write succeeded, so failures are only logged:
+    the reconciler repairs the counters and clients must not retry the write.
+    """
+    system_id = (after or before)['_id']
+    for target in (summary_counters, system_events):
+        try:
+            target.record(before, after)
+        except Exception:
+            log.exception("Error recording change of system %s", system_id)
+
+def change_batch():
+    """Batch system changes for the summary counters and the event feed."""
+    return BatchGroup(summary_counters.batch(), system_events.batch())
+
+def record_sample(system_id, check, success, latency=None, node=None):
+    """Record a check result in probe history and the probe metrics."""
+    probe_history.record(system_id, check, success, latency, node=node)
+    metrics.observe_probe(check, success, latency)
+
+@app.before_request
+def enter_profile():
+    # Only an attribute check unless a profile of requests is running
+    session = sampling_profiler.session
+    if session is not None and session.enter():
+        g.profile_session = session
+
+@app.teardown_request
+def leave_profile(error=None):
+    session = g.pop('profile_session', None)
+    if session is not None:
+        session.leave()
 
 def parse_json(data):
     return json.loads(json_util.dumps(data))
@@ -32,47 +165,243 @@ def parse_json(data):
 def index():
     return render_template('index.html')
 
+# Query options for GET /api/systems, all backed by indexes on the systems collection
+SYSTEM_FILTERS = ['status', 'sequence_status', 'app_name', 'owner']
+SYSTEM_SORT_FIELDS = ['_id', 'name', 'app_name', 'owner', 'status', 'sequence_status', 'created_at', 'last_check']
+MAX_PAGE_SIZE = 1000
+
+# updated_at and deleted_at come from the MongoDB server clock ($currentDate),
+# except on bulk imports, which stamp updated_at with the app's UTC clock.
+# Delta queries reach back a little further than asked so that writes stamped
+# just before a previous response but committed just after it are not missed.
+DELTA_OVERLAP = timedelta(seconds=1)
+
+# Newest values that make up the systems version, as (collection, field)
+VERSION_FIELDS = [('systems', 'updated_at'), ('system_tombstones', 'deleted_at'), ('systems', 'last_check')]
+
+def version_queries(include_last_check):
+    """(collection name, find_one() arguments) for each value of the systems version."""
+    fields = VERSION_FIELDS if include_last_check else VERSION_FIELDS[:2]
+    return [(name, {'filter': {}, 'projection': {field: 1}, 'sort': [(field, -1)]}) for name, field in fields]
+
+def version_from(docs):
+    """Return (etag seed, latest change) from the documents found with version_queries().
+
+    The seed changes whenever a system is added, edited, deleted or changes
+    status. last_check moves on every sweep, so it only counts when the
+    response includes it.
+    """
+    values = [doc.get(field) if doc else None for doc, (_, field) in zip(docs, VERSION_FIELDS)]
+    updated, deleted, checked = values + [None] * (len(VERSION_FIELDS) - len(values))
+    latest = max((value for value in (updated, deleted) if value), default=None)
+    return f"{updated}|{deleted}|{checked}", latest
+
+def systems_version(include_last_check):
+    """Return (etag seed, latest change) for the systems collection; see version_from()."""
+    return version_from([mongo.db[name].find_one(**query) for name, query in version_queries(include_last_check)])
+
+def parse_timestamp(value):
+    since = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if since.tzinfo is not None:
+        since = since.astimezone(timezone.utc).replace(tzinfo=None)
+    return since
+
+def encode_page_cursor(system, sort_field):
+    token = json_util.dumps({'v': system.get(sort_field), 'id': system['_id']})
+    return base64.urlsafe_b64encode(token.encode()).decode()
+
+def decode_page_cursor(token):
+    return json_util.loads(base64.urlsafe_b64decode(token.encode()).decode())
+
+def keyset_filter(sort_field, direction, cursor):
+    """Match the documents that come after cursor in (sort_field, _id) order."""
+    value, last_id = cursor['v'], cursor['id']
+    if sort_field == '_id':
+        return {'_id': {'$gt' if direction > 0 else '$lt': last_id}}
+
+    # Missing values sort first ascending and last descending
+    if direction > 0:
+        if value is None:
+            return {'$or': [{sort_field: {'$ne': None}},
+                            {sort_field: None, '_id': {'$gt': last_id}}]}
+        return {'$or': [{sort_field: {'$gt': value}},
+                        {sort_field: value, '_id': {'$gt': last_id}}]}
+    if value is None:
+        return {sort_field: None, '_id': {'$lt': last_id}}
+    return {'$or': [{sort_field: {'$lt': value}},
+                    {sort_field: value, '_id': {'$lt': last_id}},
+                    {sort_field: None}]}
+
+def serialize_system(system, apply_defaults=True):
+    """Convert a system document for JSON serialization."""
+    system['_id'] = str(system['_id'])
+    # Convert datetime objects to strings
+    if isinstance(system.get('created_at'), datetime):
+        system['created_at'] = system['created_at'].isoformat()
+    if isinstance(system.get('last_check'), datetime):
+        system['last_check'] = system['last_check'].isoformat()
+    if isinstance(system.get('updated_at'), datetime):
+        system['updated_at'] = system['updated_at'].isoformat()
+    if system.get('sequence_progress'):
+        system['sequence_progress'] = plain(system['sequence_progress'])
+    if apply_defaults:
+        # Ensure all systems have required fields with defaults
+        system['status'] = system.get('status', False)
+        system['last_check'] = system.get('last_check', datetime.now().isoformat())
+        system['last_error'] = system.get('last_error', '')
+        system['sequence_status'] = system.get('sequence_status', 'not_started')
+    return system
+
+def systems_list_plan(args):
+    """Parse the GET /api/systems parameters, returning (plan, None) or (None, (error, status))."""
+    # Build the query from the filter parameters
+    query = {}
+    for field in SYSTEM_FILTERS:
+        value = args.get(field)
+        if value is None or value == '':
+            continue
+        if field == 'status':
+            value = value.lower() in ('1', 'true', 'online')
+        query[field] = value
+
+    sort = args.get('sort', '_id')
+    direction = -1 if sort.startswith('-') else 1
+    sort_field = sort.lstrip('-+')
+    if sort_field not in SYSTEM_SORT_FIELDS:
+        return None, (f'Cannot sort by {sort_field}', 400)
+
+    projection = None
+    if args.get('fields'):
+        projection = {field.strip(): 1 for field in args['fields'].split(',') if field.strip()}
+        projection[sort_field] = 1
+
+    limit = None
+    if args.get('limit'):
+        try:
+            limit = max(1, min(int(args['limit']), MAX_PAGE_SIZE))
+        except ValueError:
+            pass
+
+    since = None
+    if args.get('since'):
+        try:
+            since = parse_timestamp(args['since'])
+        except ValueError:
+            return None, ('Invalid since timestamp', 400)
+        if since < datetime.utcnow() - timedelta(days=TOMBSTONE_RETENTION_DAYS):
+            return None, ('since is older than the deletion history, fetch the full list', 410)
+        query['updated_at'] = {'$gt': since - DELTA_OVERLAP}
+
+    page_query = query
+    if args.get('cursor'):
+        try:
+            cursor = decode_page_cursor(args['cursor'])
+        except Exception:
+            return None, ('Invalid cursor', 400)
+        page_query = {'$and': [query, keyset_filter(sort_field, direction, cursor)]}
+
+    sort_spec = [(sort_field, direction)]
+    if sort_field not in ('_id', 'name'):  # name is unique
+        sort_spec.append(('_id', direction))
+
+    first_page = not args.get('cursor')
+    return {
+        'query': query,
+        'page_query': page_query,
+        'sort_field': sort_field,
+        'sort_spec': sort_spec,
+        'projection': projection,
+        'limit': limit,
+        'since': since,
+        'first_page': first_page,
+        # Tombstones for systems deleted since then, on the first page only
+        'tombstone_query': ({'deleted_at': {'$gt': since - DELTA_OVERLAP}}
+                            if since is not None and first_page else None),
+        'count': args.get('count', '').lower() in ('1', 'true', 'yes'),
+        # last_check moves on every sweep, so it only counts when returned
+        'include_last_check': projection is None or 'last_check' in projection
+    }, None
+
+def systems_etag(seed, query_string):
+    return hashlib.md5(f"{seed}|{query_string}".encode()).hexdigest()
+
+def systems_page(plan, systems, latest_change):
+    """Build the GET /api/systems response body from a page fetched with limit + 1."""
+    limit = plan['limit']
+    next_cursor = None
+    if limit and len(systems) > limit:
+        systems = systems[:limit]
+        next_cursor = encode_page_cursor(systems[-1], plan['sort_field'])
+    return {
+        'systems': [serialize_system(system, apply_defaults=plan['projection'] is None) for system in systems],
+        'next_cursor': next_cursor,
+        'as_of': (latest_change or datetime.utcnow()).isoformat()
+    }
+
 @app.route('/api/systems', methods=['GET'])
 def get_systems():
+    """List systems.
+
+    Optional query parameters: status, sequence_status, app_name and owner
+    filters; sort=<field> or sort=-<field>; fields=<comma separated projection>;
+    limit=<page size> with cursor=<next_cursor> for keyset pagination;
+    count=1 to include the total number of matching systems; and
+    since=<as_of of a previous response> for only the systems changed since
+    then plus the ids of deleted ones. Responses carry an ETag and
+    If-None-Match is answered with 304 when nothing changed.
+    """
     try:
-        print("Attempting to fetch systems from database...")  # Debug log
-        
-        # Test MongoDB connection first
+        plan, error = systems_list_plan(request.args)
+        if error:
+            return jsonify({'error': error[0], 'systems': []}), error[1]
+
+        # Answer unchanged lists without querying them
+        seed, latest_change = systems_version(plan['include_last_check'])
+        etag = systems_etag(seed, request.query_string.decode())
+        if request.if_none_match.contains_weak(etag):
+            response = Response(status=304)
+            response.set_etag(etag, weak=True)
+            return response
+
+        # Get the page of systems with proper error handling
         try:
-            mongo.db.command('ping')
-        except Exception as e:
-            print(f"MongoDB connection error: {str(e)}")
-            return jsonify({'error': 'Database connection error', 'systems': []}), 500
-
-        # Get all systems with proper error handling
-        try:
-            systems = list(mongo.db.systems.find())
-            print(f"Found {len(systems)} systems")  # Debug log
-        except Exception as e:
-            print(f"Error querying systems: {str(e)}")
+            found = mongo.db.systems.find(plan['page_query'], plan['projection']).sort(plan['sort_spec'])
+            if plan['limit']:
+                found = found.limit(plan['limit'] + 1)
+            systems = list(found)
+        except Exception:
+            log.exception("Error querying systems")
             return jsonify({'error': 'Error querying systems', 'systems': []}), 500
 
-        # Convert ObjectId to string for JSON serialization
-        for system in systems:
-            system['_id'] = str(system['_id'])
-            # Convert datetime objects to strings
-            if 'created_at' in system:
-                system['created_at'] = system['created_at'].isoformat()
-            if 'last_check' in system:
-                system['last_check'] = system['last_check'].isoformat()
-            # Ensure all systems have required fields with defaults
-            system['status'] = system.get('status', False)
-            system['last_check'] = system.get('last_check', datetime.now().isoformat())
-            system['last_error'] = system.get('last_error', '')
-            system['sequence_status'] = system.get('sequence_status', 'not_started')
-
-        print(f"Successfully processed {len(systems)} systems")
-        return jsonify({'systems': systems})
+        response = systems_page(plan, systems, latest_change)
+        if plan['count']:
+            response['total'] = mongo.db.systems.count_documents(plan['query'])
+        if plan['tombstone_query'] is not None:
+            tombstones = mongo.db.system_tombstones.find(plan['tombstone_query'], {'_id': 1})
+            response['deleted'] = [str(tombstone['_id']) for tombstone in tombstones]
+        response = jsonify(response)
+        response.set_etag(etag, weak=True)
+        return response
 
     except Exception as e:
-        print(f"Error in get_systems: {str(e)}")  # Debug log
+        log.exception("Error in get_systems")
         return jsonify({'error': str(e), 'systems': []}), 500
 
+def validate_check_interval(system):
+    """Normalize the optional check_interval (seconds), returning an error message if invalid."""
+    value = system.get('check_interval')
+    if value == '':
+        system['check_interval'] = value = None
+    if value is None:
+        return None
+    try:
+        system['check_interval'] = int(value)
+    except (TypeError, ValueError):
+        return "Check interval must be a whole number of seconds"
+    if system['check_interval'] < CHECK_INTERVAL_MIN:
+        return f"Check interval must be at least {CHECK_INTERVAL_MIN} seconds"
+    return None
+
 @app.route('/api/systems', methods=['POST'])
 def add_system():
     try:
@@ -117,13 +446,34 @@ def add_system():
         system['check_type'] = system.get('check_type', 'ping').lower()
         if system['check_type'] not in ['http', 'ping']:
             system['check_type'] = 'ping'
+
+        error = validate_check_interval(system)
+        if error:
+            return jsonify({"error": error}), 400
         
-        mongo.db.systems.insert_one(system)
+        system['_id'] = ObjectId()
+        fields = {key: value for key, value in system.items() if key != '_id'}
+        mongo.db.systems.update_one(
+            {'_id': system['_id']},
+            {'$setOnInsert': fields, '$currentDate': {'updated_at': True}},
+            upsert=True
+        )
+        record_change(None, system)
         return jsonify({"message": "System added successfully"})
     except Exception as e:
-        print(f"Error adding system: {str(e)}")
+        log.exception("Error adding system")
         return jsonify({"error": str(e)}), 500
 
+def system_detail(system):
+    """Build the GET /api/systems/<id> response body for a system document."""
+    system['_id'] = str(system['_id'])
+    # Convert datetime objects to strings
+    if 'created_at' in system:
+        system['created_at'] = system['created_at'].isoformat()
+    if 'last_check' in system:
+        system['last_check'] = system['last_check'].isoformat()
+    return {"system": system}
+
 @app.route('/api/systems/<system_id>', methods=['GET'])
 def get_system(system_id):
     try:
@@ -133,19 +483,9 @@ def get_system(system_id):
         system = mongo.db.systems.find_one({'_id': ObjectId(system_id)})
         if not system:
             return jsonify({"error": "System not found"}), 404
-
-        # Convert ObjectId to string for JSON serialization
-        system['_id'] = str(system['_id'])
-        
-        # Convert datetime objects to strings
-        if 'created_at' in system:
-            system['created_at'] = system['created_at'].isoformat()
-        if 'last_check' in system:
-            system['last_check'] = system['last_check'].isoformat()
-
-        return jsonify({"system": system})
+        return jsonify(system_detail(system))
     except Exception as e:
-        print(f"Error getting system: {str(e)}")
+        log.exception("Error getting system")
         return jsonify({"error": str(e)}), 500
 
 @app.route('/api/systems/<system_id>', methods=['PUT'])
@@ -183,18 +523,28 @@ def update_system(system_id):
         for key in system:
             if isinstance(system[key], str) and not system[key].strip():
                 system[key] = None
+
+        error = validate_check_interval(system)
+        if error:
+            return jsonify({"error": error}), 400
         
-        result = mongo.db.systems.update_one(
+        # The learned HTTP endpoint may no longer match an edited target
+        system.pop('http_endpoint', None)
+        system.pop('_id', None)
+        system.pop('updated_at', None)
+        before = mongo.db.systems.find_one_and_update(
             {'_id': ObjectId(system_id)},
-            {'$set': system}
+            {'$set': system, '$unset': {'http_endpoint': ''}, '$currentDate': {'updated_at': True}},
+            return_document=ReturnDocument.BEFORE
         )
         
-        if result.modified_count == 0:
+        if before is None:
             return jsonify({"error": "System not found"}), 404
+        record_change(before, dict(before, **system))
             
         return jsonify({"message": "System updated successfully"})
     except Exception as e:
-        print(f"Error updating system: {str(e)}")
+        log.exception("Error updating system")
         return jsonify({"error": str(e)}), 500
 
 @app.route('/api/systems/<system_id>', methods=['DELETE'])
@@ -204,44 +554,315 @@ def delete_system(system_id):
         if not ObjectId.is_valid(system_id):
             return jsonify({"error": "Invalid system ID format"}), 400
 
-        result = mongo.db.systems.delete_one({'_id': ObjectId(system_id)})
-        if result.deleted_count == 0:
+        before = mongo.db.systems.find_one_and_delete({'_id': ObjectId(system_id)})
+        if before is None:
             return jsonify({"error": "System not found"}), 404
+        # Tombstone for delta listings (GET /api/systems?since=...)
+        mongo.db.system_tombstones.update_one(
+            {'_id': before['_id']},
+            {'$currentDate': {'deleted_at': True}},
+            upsert=True
+        )
+        record_change(before, None)
         return jsonify({"message": "System deleted successfully"})
     except Exception as e:
-        print(f"Error deleting system: {str(e)}")
+        log.exception("Error deleting system")
         return jsonify({"error": str(e)}), 500
 
 def check_status(target, check_type):
     try:
         if check_type == 'ping':
-            response = ping(target)
-            return response is not None and response is not False
+            return test_ping(target)['success']
         elif check_type == 'http':
-            response = requests.get(target, timeout=5)
+            response = http_client.get(target, timeout=5, verify=False)
             return response.status_code == 200
         return False
     except:
         return False
 
+def probe_system_status(system):
+    """Check a system for the background sweep, returning the fields to store."""
+    if system.get('check_type') == 'http':
+        result = test_http(system.get('target') or '', system.get('http_endpoint'))
+        record_sample(system['_id'], 'http', result['success'], result.get('latency'))
+        return {'status': result['success'], 'http_endpoint': result.get('endpoint')}
+    if system.get('check_type') == 'ping' and system.get('target'):
+        result = test_ping(system['target'])
+        record_sample(system['_id'], 'ping', result['success'], result.get('rtt'))
+        return {'status': result['success']}
+    return {'status': check_status(system.get('target'), system.get('check_type'))}
+
+# Fields a status update can change that the summary counters and change
+# events are computed from. Batched status writes only match while these
+# still hold the values the (before, after) change was computed from.
+STATUS_GUARD_FIELDS = ['status', 'db_status', 'last_error']
+
+def status_filter(system, update):
+    """Match the system only while the guarded fields ``update`` sets are as cached."""
+    query = {'_id': system['_id']}
+    for field in STATUS_GUARD_FIELDS:
+        if field in update:
+            query[field] = system.get(field)
+    return query
+
+def record_status_changes(changes, unmatched):
+    """Record the (system, update) changes of a flushed status batch.
+
+    When guarded updates matched nothing, the systems are re-read: each
+    update stamps its own last_check, so the ones that did not land are
+    those without it. They changed since they were cached, so they are
+    written again by _id and their change is taken from the document the
+    write replaced. Deleted systems are skipped. Returns the number of
+    writes made.
+    """
+    writes = 0
+    stored, missed = changes, []
+    if unmatched:
+        current = {doc['_id']: doc.get('last_check') for doc in mongo.db.systems.find(
+            {'_id': {'$in': [system['_id'] for system, _ in changes]}}, {'last_check': 1})}
+        writes += 1
+        stored = []
+        for system, update in changes:
+            if system['_id'] not in current:
+                continue
+            # BSON dates keep milliseconds
+            last_check = update['last_check']
+            written = current[system['_id']] == last_check.replace(microsecond=last_check.microsecond // 1000 * 1000)
+            (stored if written else missed).append((system, update))
+
+    batch = change_batch()
+    for system, update in stored:
+        batch.add(system, dict(system, **update))
+    for system, update in missed:
+        before = mongo.db.systems.find_one_and_update(
+            {'_id': system['_id']},
+            {'$set': update, '$currentDate': {'updated_at': True}},
+            return_document=ReturnDocument.BEFORE
+        )
+        writes += 1
+        if before is not None:
+            batch.add(before, dict(before, **update))
+    return writes + batch.flush()
+
+def status_writer():
+    """Create a writer that batches probe results into bulk status updates.
+
+    Summary counter deltas and change events are written after each flush,
+    for the updates that were stored.
+    """
+    return BulkWriter(mongo.db.systems, STATUS_BATCH_SIZE, STATUS_FLUSH_INTERVAL,
+                      on_flush=record_status_changes)
+
+def node_updates(stored_nodes, nodes, last_check):
+    """Return ($set fields, array filters) writing only the node fields that changed.
+
+    Returns None when the stored list cannot be matched node by node (legacy
+    string entries, duplicate hosts or added/removed nodes); the whole list
+    must then be rewritten.
+    """
+    if not stored_nodes or not all(isinstance(node, dict) for node in stored_nodes):
+        return None
+    stored = {node.get('host'): node for node in stored_nodes}
+    if len(stored) != len(stored_nodes) or set(stored) != {node['host'] for node in nodes}:
+        return None
+
+    fields = {'cluster_nodes.$[].last_check': last_check}
+    array_filters = []
+    for index, node in enumerate(nodes):
+        changed = {key: value for key, value in node.items()
+                   if key not in ('host', 'last_check') and stored[node['host']].get(key) != value}
+        if not changed:
+            continue
+        name = f"n{index}"
+        array_filters.append({f"{name}.host": node['host']})
+        for key, value in changed.items():
+            fields[f"cluster_nodes.$[{name}].{key}"] = value
+    return fields, array_filters
+
+def status_update(system, update):
+    """Build (update, array filters) storing probe results.
+
+    updated_at is bumped on visible changes, and cluster nodes are updated
+    field by field when possible instead of rewriting the whole list.
+    """
+    fields = update
+    array_filters = None
+    if 'cluster_nodes' in update:
+        targeted = node_updates(system.get('cluster_nodes'), update['cluster_nodes'], update['last_check'])
+        if targeted:
+            node_fields, array_filters = targeted
+            fields = {key: value for key, value in update.items() if key != 'cluster_nodes'}
+            fields.update(node_fields)
+    operation = {'$set': fields}
+    if change_event(system, dict(system, **update)) is not None:
+        operation['$currentDate'] = {'updated_at': True}
+    return operation, array_filters or None
+
+def record_system_status(writer, system, update, error):
+    if error is not None:
+        update = {'status': False}
+    update = dict(update, last_check=datetime.now())
+    store_probe_result(system, update, writer)
+    return update
+
+def store_check_result(writer, system, update, error):
+    """Store the result of a scheduled check and schedule the system's next one.
+
+    The system is released even if storing fails, so it is checked again.
+    """
+    stored = {'status': False} if error is not None else update
+    try:
+        stored = record_system_status(writer, system, update, error)
+        return stored
+    finally:
+        check_scheduler.complete(system['_id'], stored)
+
+def http_sweep_summary(before, after):
+    """Describe HTTP probe latency and connection reuse between two stats snapshots."""
+    made = after['requests'] - before['requests']
+    if not made:
+        return "none"
+    opened = after['connections_opened'] - before['connections_opened']
+    latency = (after['average_latency_ms'] * after['requests'] -
+               before['average_latency_ms'] * before['requests']) / made
+    return f"{made} requests, {max(0, made - opened)} on reused connections, avg {latency:.1f}ms"
+
+def probe_shard(system_id):
+    """Name of the probe lease covering a system, from a stable hash of its _id."""
+    return f"probe-shard-{zlib.crc32(system_id.binary) % PROBE_SHARDS}"
+
 def update_status():
-    while True:
+    """Check systems continuously, each on its own adaptive interval."""
+    metrics.set_route('update_status')
+    writer = status_writer()
+    wakeup = threading.Event()
+    window = {'checks': 0, 'failures': 0}
+    window_lock = threading.Lock()
+
+    def on_result(system, update, error):
         try:
-            systems = mongo.db.systems.find()
-            for system in systems:
-                status = check_status(system['target'], system['check_type'])
-                mongo.db.systems.update_one(
-                    {'_id': system['_id']},
-                    {
-                        '$set': {
-                            'status': status,
-                            'last_check': datetime.now()
-                        }
-                    }
-                )
+            store_check_result(writer, system, update, error)
+            with window_lock:
+                window['checks'] += 1
+                window['failures'] += error is not None
         except Exception as e:
-            print(f"Error in status update: {str(e)}")
-        time.sleep(60)
+            log.warning("Error storing status of %s: %s", system.get('name', 'Unknown'), e)
+        wakeup.set()
+
+    held = None
+    last_sync = last_flush = last_report = time.monotonic()
+    round_trips = writer.round_trips
+    http_before = http_client.stats()
+    while True:
+        try:
+            shards = probe_leases.held()
+            now = time.monotonic()
+            if shards != held or now - last_sync >= STATUS_INTERVAL:
+                # Flush first so reloaded documents include every stored result
+                writer.flush()
+                # status, db_status, name and last_error feed the summary counters, change
+                # events and the guards of status writes
+                found = mongo.db.systems.find({}, {'target': 1, 'check_type': 1, 'http_endpoint': 1,
+                                                   'status': 1, 'db_status': 1, 'name': 1, 'last_error': 1,
+                                                   'check_interval': 1}) if shards else []
+                check_scheduler.sync(system for system in found if probe_shard(system['_id']) in shards)
+                held, last_sync = shards, now
+
+            for system in check_scheduler.pop_due(probe_engine.available()):
+                # Re-checked per system so probing stops as soon as a lease is lost
+                if probe_leases.holds(probe_shard(system['_id'])):
+                    probe_engine.submit(probe_system_status, system, on_result)
+                else:
+                    check_scheduler.drop(system['_id'])
+
+            if now - last_flush >= STATUS_FLUSH_INTERVAL:
+                writer.flush()
+                probe_history.flush()
+                metrics.observe_scheduler(check_scheduler.due_count(now), probe_engine.in_flight,
+                                          len(check_scheduler))
+                last_flush = now
+
+            if now - last_report >= STATUS_INTERVAL:
+                with window_lock:
+                    checks, failures = window['checks'], window['failures']
+                    window['checks'] = window['failures'] = 0
+                scheduled = check_scheduler.stats()
+                metrics.observe_scheduler_pass(checks, scheduled['systems'], now - last_report)
+                log.info("Status checks: %s in the last %.0fs (%s failures), %s systems in %s/%s shards, "
+                         "planned %s/s, %s MongoDB round trips",
+                         checks, now - last_report, failures, scheduled['systems'], len(held), PROBE_SHARDS,
+                         scheduled['checks_per_second'], writer.round_trips - round_trips)
+                log.info("HTTP probes: %s", http_sweep_summary(http_before, http_client.stats()))
+                last_report, round_trips, http_before = now, writer.round_trips, http_client.stats()
+        except Exception:
+            log.exception("Error in status update")
+
+        # Sleep until the next check is due or a running one finishes
+        next_due = check_scheduler.next_due()
+        timeout = 1.0 if next_due is None else next_due - time.monotonic()
+        wakeup.wait(min(max(timeout, 0.01), 1.0))
+        wakeup.clear()
+
+def csv_text_lines(stream):
+    """Decode an uploaded CSV line by line, falling back to latin-1 per line.
+
+    The upload is never read into memory as a whole, so rows can be parsed
+    and inserted while the rest of the file is still being read.
+    """
+    first = True
+    for line in stream:
+        try:
+            text = line.decode('utf-8')
+        except UnicodeDecodeError:
+            text = line.decode('iso-8859-1')
+        if first:
+            text = text.lstrip('\ufeff')
+            first = False
+        yield text
+
+def bulk_insert_systems(entries):
+    """Insert (label, system) pairs with unordered insert_many in chunks.
+
+    Returns the number of systems inserted and a list of (label, system, error)
+    for the documents MongoDB rejected, where error is None for duplicates.
+    """
+    inserted = 0
+    rejected = []
+    chunk = []
+
+    def flush():
+        nonlocal inserted
+        if not chunk:
+            return
+        failed = set()
+        # Stamped here rather than with $currentDate so each chunk is one round trip
+        updated_at = datetime.utcnow()
+        for _, system in chunk:
+            system['updated_at'] = updated_at
+        try:
+            result = mongo.db.systems.insert_many([system for _, system in chunk], ordered=False)
+            inserted += len(result.inserted_ids)
+        except BulkWriteError as e:
+            inserted += e.details.get('nInserted', 0)
+            for write_error in e.details.get('writeErrors', []):
+                failed.add(write_error['index'])
+                label, system = chunk[write_error['index']]
+                error = None if write_error.get('code') == 11000 else write_error.get('errmsg')
+                rejected.append((label, system, error))
+
+        changes = change_batch()
+        for index, (_, system) in enumerate(chunk):
+            if index not in failed:
+                changes.add(None, system)
+        changes.flush()
+        chunk.clear()
+
+    for entry in entries:
+        chunk.append(entry)
+        if len(chunk) >= IMPORT_CHUNK_SIZE:
+            flush()
+    flush()
+    return inserted, rejected
 
 @app.route('/api/systems/import', methods=['POST'])
 def import_systems():
@@ -253,72 +874,59 @@ def import_systems():
         return jsonify({'error': 'Invalid file format. Please upload a CSV file', 'success': False})
     
     try:
-        # Read CSV file with different encodings
-        encodings = ['utf-8', 'iso-8859-1', 'cp1252']
-        csv_data = None
-        
-        for encoding in encodings:
-            try:
-                # Reset file pointer
-                file.seek(0)
-                # Try reading with current encoding
-                reader = csv.DictReader(TextIOWrapper(file, encoding=encoding))
-                csv_data = [row for row in reader if any(row.values())]  # Skip empty rows
-                if csv_data:
-                    break
-            except UnicodeDecodeError:
-                continue
-            except Exception as e:
-                print(f"Error reading CSV with {encoding} encoding: {str(e)}")
-                continue
-        
-        if not csv_data:
-            return jsonify({'error': 'Could not read CSV file with supported encodings or file is empty', 'success': False})
+        started = time.monotonic()
+        reader = csv.DictReader(csv_text_lines(file.stream))
         
         # Auto-map fields
-        field_mappings = auto_map_csv_fields(csv_data[0].keys() if csv_data else [])
-        print(f"Field mappings: {field_mappings}")  # Debug print
+        field_mappings = auto_map_csv_fields(reader.fieldnames or [])
+        log.debug("Field mappings: %s", field_mappings)
         
         if not field_mappings:
             return jsonify({'error': 'Could not map CSV fields to database fields', 'success': False})
         
-        # Process each row
-        success_count = 0
         error_messages = []
-        
-        for row in csv_data:
-            try:
-                # Map fields using the auto-mapped fields and handle None values
-                system_data = {}
-                for key, value in row.items():
-                    if key and key in field_mappings:  # Skip empty keys
-                        mapped_key = field_mappings[key]
-                        if value is not None:
-                            system_data[mapped_key] = str(value).strip()
-                        else:
-                            system_data[mapped_key] = ''
-                
-                print(f"Mapped data: {system_data}")  # Debug print
-                
-                # Validate required fields
-                if not system_data.get('name'):
-                    error_messages.append(f"Skipped row: Missing required field 'name'")
+        rows_read = 0
+
+        def mapped_systems():
+            nonlocal rows_read
+            for row in reader:
+                if not any(row.values()):  # Skip empty rows
                     continue
-                
-                # Set default values and convert string lists to actual lists
-                system_data = set_default_values(system_data)
-                
-                # Insert into database
-                systems_collection = mongo.db.systems
+                rows_read += 1
                 try:
-                    systems_collection.insert_one(system_data)
-                    success_count += 1
-                except DuplicateKeyError:
-                    error_messages.append(f"System '{system_data.get('name', 'Unknown')}' already exists")
-                    continue
-                
-            except Exception as e:
-                error_messages.append(f"Error processing row: {str(e)}")
+                    # Map fields using the auto-mapped fields and handle None values
+                    system_data = {}
+                    for key, value in row.items():
+                        if key and key in field_mappings:  # Skip empty keys
+                            mapped_key = field_mappings[key]
+                            if value is not None:
+                                system_data[mapped_key] = str(value).strip()
+                            else:
+                                system_data[mapped_key] = ''
+                    
+                    # Validate required fields
+                    if not system_data.get('name'):
+                        error_messages.append(f"Skipped row: Missing required field 'name'")
+                        continue
+                    
+                    # Set default values and convert string lists to actual lists
+                    yield system_data.get('name'), set_default_values(system_data)
+                    
+                except Exception as e:
+                    error_messages.append(f"Error processing row: {str(e)}")
+
+        success_count, rejected = bulk_insert_systems(mapped_systems())
+        for name, system, error in rejected:
+            if error is None:
+                error_messages.append(f"System '{name or 'Unknown'}' already exists")
+            else:
+                error_messages.append(f"Error inserting system '{name or 'Unknown'}': {error}")
+
+        if not rows_read:
+            return jsonify({'error': 'Could not read CSV file with supported encodings or file is empty', 'success': False})
+
+        log.info("Imported %s of %s rows in %.2fs", success_count, rows_read, time.monotonic() - started)
+        metrics.observe_import('import', rows_read, time.monotonic() - started)
         
         # Prepare response message
         message = f"Successfully imported {success_count} systems."
@@ -333,39 +941,67 @@ def import_systems():
         })
         
     except Exception as e:
-        print(f"Import error: {str(e)}")  # Debug print
+        log.exception("Import error")
         return jsonify({'error': f'Error importing systems: {str(e)}', 'success': False})
 
+EXPORT_FIELDNAMES = ['name', 'app_name', 'target', 'db_name', 'db_type', 'db_port',
+                     'owner', 'shutdown_sequence', 'check_type', 'cluster_nodes']
+
+def export_csv_chunks(systems, chunk_size=64 * 1024):
+    """Render systems as CSV, yielding text roughly chunk_size characters at a time."""
+    output = io.StringIO()
+    writer = csv.DictWriter(output, fieldnames=EXPORT_FIELDNAMES)
+    writer.writeheader()
+
+    for system in systems:
+        # Convert cluster nodes to string format
+        if system.get('cluster_nodes'):
+            system['cluster_nodes'] = ';'.join(
+                node['host'] if isinstance(node, dict) else str(node)
+                for node in system['cluster_nodes'])
+        else:
+            system['cluster_nodes'] = ''
+
+        # Remove extra fields not needed in CSV
+        writer.writerow({field: system.get(field, 'N/A') for field in EXPORT_FIELDNAMES})
+
+        if output.tell() >= chunk_size:
+            yield output.getvalue()
+            output.seek(0)
+            output.truncate()
+
+    yield output.getvalue()
+
+def gzip_chunks(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31 writes a gzip container
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode('utf-8'))
+        if data:
+            yield data
+    yield compressor.flush()
+
 @app.route('/api/systems/export')
 def export_systems():
     try:
-        systems = list(mongo.db.systems.find({}, {'_id': 0}))
-        
-        # Prepare CSV content
-        output = io.StringIO()
-        fieldnames = ['name', 'app_name', 'target', 'db_name', 'db_type', 'db_port', 
-                     'owner', 'shutdown_sequence', 'check_type', 'cluster_nodes']
-        
-        writer = csv.DictWriter(output, fieldnames=fieldnames)
-        writer.writeheader()
-        
-        for system in systems:
-            # Convert cluster nodes to string format
-            if system.get('cluster_nodes'):
-                system['cluster_nodes'] = ';'.join(node['host'] for node in system['cluster_nodes'])
-            else:
-                system['cluster_nodes'] = ''
-                
-            # Remove extra fields not needed in CSV
-            csv_system = {field: system.get(field, 'N/A') for field in fieldnames}
-            writer.writerow(csv_system)
-        
-        # Create response
-        output.seek(0)
+        projection = {field: 1 for field in EXPORT_FIELDNAMES}
+        projection['_id'] = 0
+        cursor = mongo.db.systems.find({}, projection, batch_size=EXPORT_BATCH_SIZE)
+
+        # Fetch the first batch now so database errors still produce an error response
+        first = next(cursor, None)
+        systems = itertools.chain([first], cursor) if first is not None else iter(())
+
+        headers = {'Content-Disposition': 'attachment; filename=systems_export.csv'}
+        chunks = export_csv_chunks(systems)
+        if request.args.get('gzip', '').lower() in ('1', 'true', 'yes'):
+            headers['Content-Encoding'] = 'gzip'
+            headers['Vary'] = 'Accept-Encoding'
+            chunks = gzip_chunks(chunks)
+
         return Response(
-            output.getvalue(),
+            stream_with_context(chunks),
             mimetype='text/csv',
-            headers={'Content-Disposition': 'attachment; filename=systems_export.csv'}
+            headers=headers
         )
     except Exception as e:
         return jsonify({'error': f'Error exporting systems: {str(e)}'}), 500
@@ -422,93 +1058,89 @@ def import_mapped_csv():
         if not mapping:
             return jsonify({"error": "No field mapping provided"}), 400
 
-        print(f"Received mapping: {mapping}")  # Debug log
+        log.debug("Received mapping: %s", mapping)
 
-        # Read CSV content with explicit encoding
-        try:
-            stream = io.StringIO(file.stream.read().decode("UTF8"), newline=None)
-        except UnicodeDecodeError:
-            stream = io.StringIO(file.stream.read().decode("latin-1"), newline=None)
-        
-        csv_reader = csv.DictReader(stream)
-        
-        systems_added = 0
+        started = time.monotonic()
+        csv_reader = csv.DictReader(csv_text_lines(file.stream))
         errors = []
-        
-        for row_num, row in enumerate(csv_reader, start=2):  # Start from 2 since row 1 is header
-            try:
-                print(f"Processing row {row_num}: {row}")  # Debug log
-                
-                # Map fields according to provided mapping
-                system = {
-                    'created_at': datetime.now(),
-                    'last_check': datetime.now(),
-                    'status': False,
-                    'sequence_status': 'not_started',
-                    'last_error': ''
-                }
+        rows_read = 0
 
-                # Map fields from CSV
-                for field, csv_header in mapping.items():
-                    if csv_header in row:
-                        value = row[csv_header].strip() if row[csv_header] else None
-                        if value:  # Only set if value is not empty
-                            if field == 'cluster_nodes':
-                                system[field] = [node.strip() for node in value.split(';') if node.strip()]
-                            elif field == 'mount_points':
-                                system[field] = [point.strip() for point in value.split(';') if point.strip()]
-                            elif field == 'shutdown_sequence':
-                                system[field] = [step.strip() for step in value.split(';') if step.strip()]
-                            else:
-                                system[field] = value
-
-                # Set default values for optional fields
-                system['app_name'] = system.get('app_name') or 'N/A'
-                system['db_name'] = system.get('db_name') or 'N/A'
-                system['db_type'] = system.get('db_type') or 'N/A'
-                system['owner'] = system.get('owner') or 'N/A'
-                system['db_port'] = system.get('db_port')
-                if system.get('db_port'):
-                    try:
-                        system['db_port'] = int(system['db_port'])
-                    except ValueError:
-                        system['db_port'] = None
-
-                # Validate required fields
-                if not system.get('name'):
-                    errors.append(f"Row {row_num}: Server Name is required")
-                    continue
-
-                # Set default check type if not provided
-                if not system.get('check_type'):
-                    system['check_type'] = 'ping'
-                else:
-                    system['check_type'] = system['check_type'].lower()
+        def mapped_systems():
+            nonlocal rows_read
+            for row_num, row in enumerate(csv_reader, start=2):  # Start from 2 since row 1 is header
+                rows_read += 1
+                try:
+                    # Map fields according to provided mapping
+                    system = {
+                        'created_at': datetime.now(),
+                        'last_check': datetime.now(),
+                        'status': False,
+                        'sequence_status': 'not_started',
+                        'last_error': ''
+                    }
 
-                # Handle target for cluster systems
-                if not system.get('target') and system.get('cluster_nodes'):
-                    system['target'] = system['cluster_nodes'][0]
+                    # Map fields from CSV
+                    for field, csv_header in mapping.items():
+                        if csv_header in row:
+                            value = row[csv_header].strip() if row[csv_header] else None
+                            if value:  # Only set if value is not empty
+                                if field == 'cluster_nodes':
+                                    system[field] = [node.strip() for node in value.split(';') if node.strip()]
+                                elif field == 'mount_points':
+                                    system[field] = [point.strip() for point in value.split(';') if point.strip()]
+                                elif field in ('shutdown_sequence', 'shutdown_after'):
+                                    system[field] = [step.strip() for step in value.split(';') if step.strip()]
+                                else:
+                                    system[field] = value
+
+                    # Set default values for optional fields
+                    system['app_name'] = system.get('app_name') or 'N/A'
+                    system['db_name'] = system.get('db_name') or 'N/A'
+                    system['db_type'] = system.get('db_type') or 'N/A'
+                    system['owner'] = system.get('owner') or 'N/A'
+                    system['db_port'] = system.get('db_port')
+                    if system.get('db_port'):
+                        try:
+                            system['db_port'] = int(system['db_port'])
+                        except ValueError:
+                            system['db_port'] = None
+
+                    # Validate required fields
+                    if not system.get('name'):
+                        errors.append((row_num, "Server Name is required"))
+                        continue
+
+                    # Set default check type if not provided
+                    if not system.get('check_type'):
+                        system['check_type'] = 'ping'
+                    else:
+                        system['check_type'] = system['check_type'].lower()
+
+                    # Handle target for cluster systems
+                    if not system.get('target') and system.get('cluster_nodes'):
+                        system['target'] = system['cluster_nodes'][0]
+
+                    # Validate target
+                    if not system.get('target') and not system.get('cluster_nodes'):
+                        errors.append((row_num, "Target URL/IP is required for non-cluster systems"))
+                        continue
+
+                    yield row_num, system
 
-                # Validate target
-                if not system.get('target') and not system.get('cluster_nodes'):
-                    errors.append(f"Row {row_num}: Target URL/IP is required for non-cluster systems")
+                except Exception as e:
+                    errors.append((row_num, f"Error processing row: {str(e)}"))
                     continue
 
-                print(f"Inserting system: {system}")  # Debug log
-
-                # Insert the system
-                try:
-                    mongo.db.systems.insert_one(system)
-                    systems_added += 1
-                except DuplicateKeyError:
-                    errors.append(f"Row {row_num}: System with name '{system['name']}' already exists")
-                except Exception as e:
-                    errors.append(f"Row {row_num}: Error inserting system: {str(e)}")
+        systems_added, rejected = bulk_insert_systems(mapped_systems())
+        for row_num, system, error in rejected:
+            if error is None:
+                errors.append((row_num, f"System with name '{system['name']}' already exists"))
+            else:
+                errors.append((row_num, f"Error inserting system: {error}"))
+        errors = [f"Row {row_num}: {message}" for row_num, message in sorted(errors)]
 
-            except Exception as e:
-                errors.append(f"Row {row_num}: Error processing row: {str(e)}")
-                print(f"Error processing row {row_num}: {str(e)}")  # Debug log
-                continue
+        log.info("Imported %s systems in %.2fs", systems_added, time.monotonic() - started)
+        metrics.observe_import('csv_import', rows_read, time.monotonic() - started)
 
         result = {
             "systems_added": systems_added,
@@ -521,7 +1153,7 @@ def import_mapped_csv():
         return jsonify(result)
 
     except Exception as e:
-        print(f"Error in import_mapped_csv: {str(e)}")  # Debug log
+        log.exception("Error in import_mapped_csv")
         return jsonify({"error": f"Error processing CSV file: {str(e)}"}), 400
 
 @app.route('/api/csv/template', methods=['GET'])
@@ -653,297 +1285,772 @@ def download_example_csv():
     except Exception as e:
         return jsonify({"error": f"Error generating example CSV: {str(e)}"}), 500
 
-@app.route('/api/systems/test/<system_id>', methods=['POST'])
-def test_system(system_id):
-    try:
-        system = mongo.db.systems.find_one({'_id': ObjectId(system_id)})
-        if not system:
-            return jsonify({'error': 'System not found'}), 404
+def probe_system(system):
+    """Run the configured checks for a system and its cluster nodes.
 
-        results = {
-            'system_id': str(system['_id']),
-            'name': system['name'],
-            'status': False,
-            'messages': [],
-            'nodes': []
-        }
+    Returns the test results and the fields to store on the system document.
+    """
+    results = {
+        'system_id': str(system['_id']),
+        'name': system.get('name', 'Unknown'),
+        'status': False,
+        'messages': [],
+        'nodes': []
+    }
+    update = {}
+    errors = []
+    check_type = system.get('check_type') or 'ping'
+
+    # Test main system if target is provided
+    if system.get('target'):
+        if check_type in ['http', 'both']:
+            http_status = test_http(system['target'], system.get('http_endpoint'))
+            results['messages'].append({
+                'type': 'http',
+                'status': http_status['success'],
+                'message': http_status['message']
+            })
+            update['http_status'] = http_status['success']
+            update['http_error'] = http_status['message'] if not http_status['success'] else ""
+            update['http_endpoint'] = http_status.get('endpoint')
+            record_sample(system['_id'], 'http', http_status['success'], http_status.get('latency'))
+
+        if check_type in ['ping', 'both']:
+            ping_status = test_ping(system['target'])
+            results['messages'].append({
+                'type': 'ping',
+                'status': ping_status['success'],
+                'message': ping_status['message']
+            })
+            update['ping_status'] = ping_status['success']
+            update['ping_error'] = ping_status['message'] if not ping_status['success'] else ""
+            record_sample(system['_id'], 'ping', ping_status['success'], ping_status.get('rtt'))
+
+        # Test database if configured
+        if system.get('db_type') != 'N/A' and system.get('db_port'):
+            db_status = test_db_connection(system['target'], system['db_port'])
+            results['messages'].append({
+                'type': 'database',
+                'status': db_status['success'],
+                'message': db_status['message']
+            })
+            update['db_status'] = db_status['success']
+            record_sample(system['_id'], 'db', db_status['success'], db_status.get('connect_time'))
+
+    errors.extend(msg['message'] for msg in results['messages'] if not msg['status'])
+
+    # Test cluster nodes if present
+    if system.get('cluster_nodes'):
+        nodes = [dict(node) if isinstance(node, dict) else {'host': node}
+                 for node in system['cluster_nodes']]
+
+        # Ping every node in a single batch and run the HTTP checks in parallel
+        node_pings = {}
+        node_https = {}
+        if check_type in ['ping', 'both']:
+            node_pings = ping_hosts([node['host'] for node in nodes])
+        if check_type in ['http', 'both']:
+            endpoints = {node['host']: node.get('http_endpoint') for node in nodes}
+            for host, result, error in node_engine.imap(lambda host: test_http(host, endpoints[host]),
+                                                         list(endpoints)):
+                node_https[host] = result if error is None else {
+                    'success': False, 'message': f"Error: {str(error)}", 'endpoint': endpoints[host]}
+
+        for node in nodes:
+            node_result = {
+                'host': node['host'],
+                'status': False,
+                'messages': []
+            }
 
-        # Test main system if target is provided
-        if system.get('target'):
-            if system['check_type'] in ['http', 'both']:
-                http_status = test_http(system['target'])
-                results['messages'].append({
+            # Test HTTP if applicable
+            if check_type in ['http', 'both']:
+                http_status = node_https[node['host']]
+                node_result['messages'].append({
                     'type': 'http',
                     'status': http_status['success'],
                     'message': http_status['message']
                 })
-                system['http_status'] = http_status['success']
-                system['http_error'] = http_status['message'] if not http_status['success'] else ""
-
-            if system['check_type'] in ['ping', 'both']:
-                ping_status = test_ping(system['target'])
-                results['messages'].append({
+                node['http_status'] = http_status['success']
+                node['http_error'] = http_status['message'] if not http_status['success'] else ""
+                node['http_endpoint'] = http_status.get('endpoint')
+                record_sample(system['_id'], 'http', http_status['success'],
+                              http_status.get('latency'), node=node['host'])
+
+            # Test Ping if applicable
+            if check_type in ['ping', 'both']:
+                ping_status = node_pings[node['host']]
+                node_result['messages'].append({
                     'type': 'ping',
                     'status': ping_status['success'],
                     'message': ping_status['message']
                 })
-                system['ping_status'] = ping_status['success']
-                system['ping_error'] = ping_status['message'] if not ping_status['success'] else ""
-
-            # Test database if configured
-            if system.get('db_type') != 'N/A' and system.get('db_port'):
-                db_status = test_db_connection(system['target'], system['db_port'])
-                results['messages'].append({
-                    'type': 'database',
-                    'status': db_status['success'],
-                    'message': db_status['message']
-                })
-                system['db_status'] = db_status['success']
+                node['ping_status'] = ping_status['success']
+                node['ping_error'] = ping_status['message'] if not ping_status['success'] else ""
+                record_sample(system['_id'], 'ping', ping_status['success'],
+                              ping_status.get('rtt'), node=node['host'])
+
+            # Update node status
+            node_result['status'] = any(msg['status'] for msg in node_result['messages'])
+            node['status'] = node_result['status']
+            node['last_check'] = datetime.now()
+            record_sample(system['_id'], 'status', node['status'], node=node['host'])
+            if not node['status']:
+                errors.append(f"{node['host']}: node is down")
+            results['nodes'].append(node_result)
+        update['cluster_nodes'] = nodes
+
+    # Update overall system status
+    main_system_status = False
+    if system.get('target'):
+        if check_type == 'both':
+            main_system_status = update.get('http_status', False) and update.get('ping_status', False)
+        elif check_type == 'http':
+            main_system_status = update.get('http_status', False)
+        else:
+            main_system_status = update.get('ping_status', False)
 
-        # Test cluster nodes if present
-        if system.get('cluster_nodes'):
-            for node in system['cluster_nodes']:
-                node_result = {
-                    'host': node['host'],
-                    'status': False,
-                    'messages': []
-                }
+    # For cluster systems, consider node statuses
+    if update.get('cluster_nodes'):
+        cluster_status = any(node['status'] for node in update['cluster_nodes'])
+        main_system_status = main_system_status or cluster_status
 
-                # Test HTTP if applicable
-                if system['check_type'] in ['http', 'both']:
-                    http_status = test_http(node['host'])
-                    node_result['messages'].append({
-                        'type': 'http',
-                        'status': http_status['success'],
-                        'message': http_status['message']
-                    })
-                    node['http_status'] = http_status['success']
-                    node['http_error'] = http_status['message'] if not http_status['success'] else ""
-
-                # Test Ping if applicable
-                if system['check_type'] in ['ping', 'both']:
-                    ping_status = test_ping(node['host'])
-                    node_result['messages'].append({
-                        'type': 'ping',
-                        'status': ping_status['success'],
-                        'message': ping_status['message']
-                    })
-                    node['ping_status'] = ping_status['success']
-                    node['ping_error'] = ping_status['message'] if not ping_status['success'] else ""
-
-                # Update node status
-                node_result['status'] = any(msg['status'] for msg in node_result['messages'])
-                node['status'] = node_result['status']
-                node['last_check'] = datetime.now()
-                results['nodes'].append(node_result)
-
-        # Update overall system status
-        main_system_status = False
-        if system.get('target'):
-            if system['check_type'] == 'both':
-                main_system_status = system['http_status'] and system['ping_status']
-            elif system['check_type'] == 'http':
-                main_system_status = system['http_status']
-            else:
-                main_system_status = system['ping_status']
-        
-        # For cluster systems, consider node statuses
-        if system.get('cluster_nodes'):
-            cluster_status = any(node['status'] for node in system['cluster_nodes'])
-            main_system_status = main_system_status or cluster_status
+    update['status'] = main_system_status
+    update['last_check'] = datetime.now()
+    update['last_error'] = '; '.join(errors) if errors else ''
 
-        system['status'] = main_system_status
-        system['last_check'] = datetime.now()
+    results['status'] = main_system_status
+    results['errors'] = errors
+    return results, update
+
+def probe_cache_key(system):
+    """Identify a system's checks; editing what is checked gives a new key."""
+    nodes = tuple(node['host'] if isinstance(node, dict) else str(node)
+                  for node in system.get('cluster_nodes') or [])
+    return (system['_id'], system.get('target'), system.get('check_type'),
+            system.get('db_type'), str(system.get('db_port')), nodes)
+
+def cached_probe_system(system):
+    """probe_system() through the probe cache; returns ((results, update), fresh).
+
+    Only the caller that actually probed gets ``fresh`` True and stores the result.
+    """
+    return probe_cache.get(probe_cache_key(system), lambda: probe_system(system))
+
+@app.route('/api/systems/test/<system_id>', methods=['POST'])
+def test_system(system_id):
+    try:
+        system = mongo.db.systems.find_one({'_id': ObjectId(system_id)})
+        if not system:
+            return jsonify({'error': 'System not found'}), 404
+
+        with span('probe'):
+            (results, update), fresh = cached_probe_system(system)
 
         # Update system in database
-        mongo.db.systems.update_one(
-            {'_id': ObjectId(system_id)},
-            {'$set': system}
-        )
+        if fresh:
+            store_probe_result(system, update)
+            probe_history.flush()
 
-        results['status'] = main_system_status
-        return jsonify(results)
+        return jsonify(dict(results, cached=not fresh))
 
     except Exception as e:
-        print(f"Error testing system: {str(e)}")
+        log.exception("Error testing system")
         return jsonify({'error': f'Error testing system: {str(e)}'}), 500
 
+@app.route('/api/systems/<system_id>/history')
+def get_system_history(system_id):
+    """Return the probe history of a system, or of one of its cluster nodes.
+
+    Query parameters: node=<host>, check=<ping|http|db|status>,
+    start/end=<ISO timestamps, UTC> (default: the last 24 hours) and
+    resolution=<1m|1h|1d> (default: picked from the time range).
+    """
+    try:
+        if not ObjectId.is_valid(system_id):
+            return jsonify({'error': 'Invalid system ID format'}), 400
+
+        try:
+            end = parse_timestamp(request.args['end']) if request.args.get('end') else datetime.utcnow()
+            start = parse_timestamp(request.args['start']) if request.args.get('start') else end - timedelta(days=1)
+        except ValueError:
+            return jsonify({'error': 'Invalid start or end timestamp'}), 400
+        if start >= end:
+            return jsonify({'error': 'start must be before end'}), 400
+
+        resolution = request.args.get('resolution')
+        if not resolution:
+            window = end - start
+            resolution = '1m' if window <= timedelta(hours=6) else '1h' if window <= timedelta(days=14) else '1d'
+        if resolution not in RESOLUTIONS:
+            return jsonify({'error': f"resolution must be one of {', '.join(RESOLUTIONS)}"}), 400
+
+        node = request.args.get('node') or None
+        points = probe_history.series(ObjectId(system_id), resolution, start, end,
+                                      node=node, check=request.args.get('check'))
+        return jsonify({
+            'system_id': system_id,
+            'node': node,
+            'resolution': resolution,
+            'start': start.isoformat(),
+            'end': end.isoformat(),
+            'points': points
+        })
+    except Exception as e:
+        log.exception("Error getting system history")
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/api/systems/sequence/<system_id>', methods=['POST'])
 def update_sequence_status(system_id):
+    """Set a system's sequence status by hand.
+
+    This also releases the system from a shutdown run that never finished,
+    e.g. because its process died.
+    """
     try:
         status = request.json.get('status')
-        if status not in ['not_started', 'in_progress', 'completed']:
+        if status not in SEQUENCE_STATUSES:
             return jsonify({'error': 'Invalid status'}), 400
             
-        result = mongo.db.systems.update_one(
+        before = mongo.db.systems.find_one_and_update(
             {'_id': ObjectId(system_id)},
-            {'$set': {'sequence_status': status}}
+            {'$set': {'sequence_status': status}, '$unset': {'sequence_run': ''},
+             '$currentDate': {'updated_at': True}},
+            return_document=ReturnDocument.BEFORE
         )
         
-        if result.modified_count == 0:
+        if before is None:
             return jsonify({'error': 'System not found'}), 404
+        record_change(before, dict(before, sequence_status=status))
             
         return jsonify({'message': 'Status updated successfully'})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/systems/summary')
-def get_systems_summary():
+def bearer_token_matches(token):
+    supplied = request.headers.get('Authorization', '').removeprefix('Bearer ')
+    return hmac.compare_digest(supplied.encode(), token.encode())
+
+def sequence_runner():
+    """Build the step runner selected by SEQUENCE_RUNNER."""
+    if SEQUENCE_RUNNER == 'ssh':
+        return SSHRunner(user=SEQUENCE_SSH_USER)
+    if SEQUENCE_RUNNER == 'local':
+        return LocalRunner()
+    if SEQUENCE_RUNNER == 'dry-run':
+        return DryRunRunner()
+    raise ValueError(f"Unknown SEQUENCE_RUNNER {SEQUENCE_RUNNER!r}")
+
+def store_sequence_progress(system, sequence_status, progress):
+    """Save a system's shutdown progress so the dashboard sees it as it happens."""
+    before = mongo.db.systems.find_one_and_update(
+        {'_id': system['_id']},
+        {'$set': {'sequence_status': sequence_status, 'sequence_progress': progress},
+         '$currentDate': {'updated_at': True}},
+        return_document=ReturnDocument.BEFORE
+    )
+    if before is not None:
+        record_change(before, dict(before, sequence_status=sequence_status,
+                                   sequence_progress=plain(progress)))
+
+def store_dry_run_progress(run_id, system, sequence_status, progress):
+    """Save a dry run's progress on the run only, so systems and the summary are untouched."""
+    mongo.db.sequence_runs.update_one(
+        {'_id': run_id},
+        {'$set': {f"progress.{system['_id']}": {'sequence_status': sequence_status,
+                                                'sequence_progress': progress}}}
+    )
+
+def claim_sequence_systems(run_id, systems):
+    """Reserve ``systems`` for a shutdown run in a single conditional write.
+
+    Returns the names of the systems that are in another run or in progress;
+    then nothing is reserved.
+    """
+    ids = [system['_id'] for system in systems]
+    claimed = mongo.db.systems.update_many(
+        {'_id': {'$in': ids}, 'sequence_run': None, 'sequence_status': {'$ne': 'in_progress'}},
+        {'$set': {'sequence_run': str(run_id)}}
+    )
+    if claimed.matched_count == len(ids):
+        return []
+    release_sequence_systems(run_id)
+    busy = mongo.db.systems.find({'_id': {'$in': ids}, '$or': [
+        {'sequence_run': {'$nin': [None, str(run_id)]}}, {'sequence_status': 'in_progress'}
+    ]}, {'name': 1})
+    # Systems deleted since they were read also make the claim fall short
+    return [system.get('name') for system in busy] or ['(deleted systems)']
+
+def release_sequence_systems(run_id):
+    mongo.db.systems.update_many({'sequence_run': str(run_id)}, {'$unset': {'sequence_run': ''}})
+
+def run_sequence(run_id, systems):
+    on_progress = store_sequence_progress
+    if SEQUENCE_RUNNER == 'dry-run':
+        on_progress = lambda *args: store_dry_run_progress(run_id, *args)  # noqa: E731
+    engine = SequenceEngine(sequence_runner(), concurrency=SEQUENCE_CONCURRENCY,
+                            step_timeout=SEQUENCE_STEP_TIMEOUT, on_progress=on_progress)
     try:
-        # Get all systems
-        systems = list(mongo.db.systems.find())
-        
-        # Initialize counters
-        total_systems = len(systems)
-        online_systems = sum(1 for system in systems if system.get('status', False))
-        offline_systems = total_systems - online_systems
-        
-        # Count database statuses
-        db_total = sum(1 for system in systems if system.get('db_name'))
-        db_online = sum(1 for system in systems if system.get('db_status', False))
-        db_offline = db_total - db_online
-        
-        # Count sequence statuses
-        sequence_counts = {
-            'not_started': 0,
-            'in_progress': 0,
-            'completed': 0
+        results = engine.run(systems, run_id=str(run_id))
+        counts = {}
+        for result in results.values():
+            counts[result] = counts.get(result, 0) + 1
+        update = {
+            'status': 'completed' if counts.get('completed', 0) == len(systems) else 'failed',
+            'results': {str(system_id): result for system_id, result in results.items()},
+            'counts': counts
         }
-        for system in systems:
-            status = system.get('sequence_status', 'not_started')
-            sequence_counts[status] = sequence_counts.get(status, 0) + 1
-        
-        # Get recent errors
-        recent_errors = []
-        for system in systems:
-            if system.get('last_error'):
-                recent_errors.append({
-                    'system_name': system.get('name', 'Unknown'),
-                    'error': system.get('last_error'),
-                    'timestamp': system.get('last_check', datetime.now()).isoformat() if system.get('last_check') else None
-                })
-        
-        # Sort errors by timestamp (most recent first)
-        recent_errors.sort(key=lambda x: x['timestamp'] if x['timestamp'] else '', reverse=True)
-        recent_errors = recent_errors[:5]  # Keep only 5 most recent errors
-        
-        return jsonify({
-            'total_systems': total_systems,
-            'online_systems': online_systems,
-            'offline_systems': offline_systems,
-            'db_total': db_total,
-            'db_online': db_online,
-            'db_offline': db_offline,
-            'sequence_status': sequence_counts,
-            'recent_errors': recent_errors
+    except Exception as e:
+        log.exception("Error running shutdown sequence %s", run_id)
+        update = {'status': 'failed', 'error': str(e)}
+    finally:
+        release_sequence_systems(run_id)
+    update['finished_at'] = datetime.now()
+    mongo.db.sequence_runs.update_one({'_id': run_id}, {'$set': update})
+
+@app.route('/api/sequence/run', methods=['POST'])
+def start_sequence_run():
+    """Start shutting down systems in dependency order.
+
+    Body: optional ``system_ids`` (defaults to every system). Systems listed
+    in a system's ``shutdown_after`` finish before it starts. Returns the
+    run id to poll at /api/sequence/runs/<run_id>. Unless SEQUENCE_RUNNER
+    is dry-run, callers must send SEQUENCE_TOKEN as a bearer token. A dry
+    run only records its progress on the run.
+    """
+    if SEQUENCE_RUNNER != 'dry-run':
+        if not SEQUENCE_TOKEN:
+            return jsonify({'error': f"Set SEQUENCE_TOKEN to run shutdown steps with the {SEQUENCE_RUNNER} runner"}), 403
+        if not bearer_token_matches(SEQUENCE_TOKEN):
+            return jsonify({'error': 'Unauthorized'}), 401
+    try:
+        system_ids = (request.get_json(silent=True) or {}).get('system_ids')
+        query = {'_id': {'$in': [ObjectId(system_id) for system_id in system_ids]}} if system_ids else {}
+        systems = list(mongo.db.systems.find(query, {
+            'name': 1, 'target': 1, 'shutdown_sequence': 1, 'shutdown_after': 1, 'sequence_status': 1
+        }))
+        if not systems:
+            return jsonify({'error': 'No systems to shut down'}), 404
+
+        try:
+            dependency_graph(systems)
+        except SequenceError as e:
+            return jsonify({'error': str(e)}), 400
+
+        run_id = ObjectId()
+        running = claim_sequence_systems(run_id, systems)
+        if running:
+            return jsonify({'error': f"Shutdown already in progress for: {', '.join(running)}"}), 409
+        try:
+            mongo.db.sequence_runs.insert_one({
+                '_id': run_id,
+                'status': 'running',
+                'runner': SEQUENCE_RUNNER,
+                'system_ids': [system['_id'] for system in systems],
+                'started_at': datetime.now()
+            })
+            thread = threading.Thread(target=run_sequence, args=(run_id, systems))
+            thread.daemon = True
+            thread.start()
+        except Exception:
+            release_sequence_systems(run_id)
+            raise
+        return jsonify({'run_id': str(run_id), 'systems': len(systems), 'runner': SEQUENCE_RUNNER}), 202
+    except Exception as e:
+        log.exception("Error starting shutdown sequence")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/sequence/runs/<run_id>')
+def get_sequence_run(run_id):
+    """Return a shutdown run with the current progress of each of its systems."""
+    try:
+        run = mongo.db.sequence_runs.find_one({'_id': ObjectId(run_id)})
+        if run is None:
+            return jsonify({'error': 'Run not found'}), 404
+        systems = mongo.db.systems.find({'_id': {'$in': run['system_ids']}}, {
+            'name': 1, 'shutdown_after': 1, 'sequence_status': 1, 'sequence_progress': 1
         })
+        run['systems'] = [serialize_system(system, apply_defaults=False) for system in systems]
+        del run['system_ids']
+        progress = run.pop('progress', {})
+        if run.get('runner') == 'dry-run':
+            for system in run['systems']:
+                entry = progress.get(system['_id'], {})
+                system['sequence_status'] = entry.get('sequence_status', 'not_started')
+                system['sequence_progress'] = entry.get('sequence_progress')
+        return jsonify(plain(run))
     except Exception as e:
-        print(f"Error getting systems summary: {str(e)}")
+        log.exception("Error getting shutdown sequence run")
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/systems/check_all')
-def check_all_systems():
+RECENT_ERRORS_LIMIT = 5
+
+def count_truthy(field):
+    """Aggregation accumulator counting documents where field is truthy in Python terms."""
+    is_falsy = {'$in': [{'$ifNull': [field, None]}, [None, False, '', 0]]}
+    return {'$sum': {'$cond': [is_falsy, 0, 1]}}
+
+def summary_pipeline(recent_errors_limit):
+    return [
+        {'$facet': {
+            'counts': [
+                {'$group': {
+                    '_id': None,
+                    'total': {'$sum': 1},
+                    'online': count_truthy('$status'),
+                    'db_total': count_truthy('$db_name'),
+                    'db_online': count_truthy('$db_status')
+                }}
+            ],
+            'sequence_status': [
+                {'$group': {
+                    '_id': {'$ifNull': ['$sequence_status', 'not_started']},
+                    'count': {'$sum': 1}
+                }}
+            ],
+            'recent_errors': [
+                {'$match': {'last_error': {'$nin': [None, '']}}},
+                {'$sort': {'last_check': -1}},
+                {'$limit': recent_errors_limit},
+                {'$project': {'name': 1, 'last_error': 1, 'last_check': 1}}
+            ]
+        }}
+    ]
+
+def aggregate_summary(recent_errors_limit=RECENT_ERRORS_LIMIT):
+    """Compute the summary counters in MongoDB with a single $facet aggregation."""
+    facets = next(mongo.db.systems.aggregate(summary_pipeline(recent_errors_limit)), {})
+    counts = (facets.get('counts') or [{}])[0]
+    return {
+        'total': counts.get('total', 0),
+        'online': counts.get('online', 0),
+        'db_total': counts.get('db_total', 0),
+        'db_online': counts.get('db_online', 0),
+        'sequence_status': {bucket['_id']: bucket['count'] for bucket in facets.get('sequence_status', [])},
+        'recent_errors': [{
+            'system_id': system['_id'],
+            'system_name': system.get('name', 'Unknown'),
+            'error': system.get('last_error'),
+            'timestamp': system.get('last_check')
+        } for system in facets.get('recent_errors', [])],
+        'reconciled_at': datetime.now()
+    }
+
+def reconcile_summary():
+    """Rebuild the materialized summary from the systems collection."""
+    return summary_counters.replace(aggregate_summary(summary_counters.recent_errors_size))
+
+def summary_reconciler():
+    while True:
+        time.sleep(SUMMARY_RECONCILE_INTERVAL)
+        if not maintenance_lease.holds('maintenance'):
+            continue
+        try:
+            reconcile_summary()
+        except Exception:
+            log.exception("Error reconciling summary")
+
+def history_rollup():
+    while True:
+        time.sleep(HISTORY_ROLLUP_INTERVAL)
+        try:
+            probe_history.flush()
+            if maintenance_lease.holds('maintenance'):
+                probe_history.rollup()
+        except Exception:
+            log.exception("Error rolling up probe history")
+
+def summary_response(summary):
+    """Format summary counters as returned by /api/systems/summary."""
+    total_systems = max(0, summary.get('total', 0))
+    online_systems = max(0, summary.get('online', 0))
+    db_total = max(0, summary.get('db_total', 0))
+    db_online = max(0, summary.get('db_online', 0))
+
+    # Count sequence statuses
+    sequence_counts = {status: 0 for status in SEQUENCE_STATUSES}
+    for status, count in (summary.get('sequence_status') or {}).items():
+        if count or status in sequence_counts:
+            sequence_counts[status] = max(0, count)
+
+    # Recent errors, most recent first
+    recent_errors = []
+    for entry in (summary.get('recent_errors') or [])[:RECENT_ERRORS_LIMIT]:
+        timestamp = entry.get('timestamp')
+        recent_errors.append({
+            'system_name': entry.get('system_name', 'Unknown'),
+            'error': entry.get('error'),
+            'timestamp': timestamp.isoformat() if isinstance(timestamp, datetime) else timestamp
+        })
+
+    return {
+        'total_systems': total_systems,
+        'online_systems': online_systems,
+        'offline_systems': total_systems - online_systems,
+        'db_total': db_total,
+        'db_online': db_online,
+        'db_offline': db_total - db_online,
+        'sequence_status': sequence_counts,
+        'recent_errors': recent_errors
+    }
+
+def compute_systems_summary():
+    """Compute the dashboard summary directly from the systems collection."""
+    return summary_response(aggregate_summary())
+
+@app.route('/api/systems/summary')
+def get_systems_summary():
     try:
-        systems = list(mongo.db.systems.find())
-        results = []
-        
-        for system in systems:
-            try:
-                result = test_system(system)
-                system_id = str(system['_id'])
-                
-                # Update system status and last check time
-                update_data = {
-                    'status': result['status'],
-                    'last_check': datetime.now(),
-                    'db_status': result['db_status'],
-                    'http_status': result['http_status'],
-                    'http_error': result['http_error'],
-                    'ping_status': result['ping_status'],
-                    'ping_error': result['ping_error'],
-                    'last_error': '; '.join(result['errors']) if result['errors'] else None
-                }
-                
-                # Update cluster nodes if present
-                if result.get('cluster_nodes'):
-                    update_data['cluster_nodes'] = result['cluster_nodes']
-                
-                mongo.db.systems.update_one(
-                    {'_id': ObjectId(system_id)},
-                    {'$set': update_data}
-                )
-                
-                results.append({
-                    'system_id': system_id,
-                    'name': system.get('name', 'Unknown'),
-                    'status': result['status'],
-                    'errors': result['errors']
-                })
-            except Exception as e:
-                print(f"Error checking system {system.get('name', 'Unknown')}: {str(e)}")
-                results.append({
-                    'system_id': str(system['_id']),
-                    'name': system.get('name', 'Unknown'),
-                    'status': False,
-                    'errors': [str(e)]
-                })
-        
-        return jsonify({'results': results})
+        # O(1) read of the materialized summary, rebuilt if it does not exist yet
+        summary = summary_counters.read() or reconcile_summary()
+        return jsonify(summary_response(summary))
     except Exception as e:
-        print(f"Error checking all systems: {str(e)}")
+        log.exception("Error getting systems summary")
         return jsonify({'error': str(e)}), 500
 
-def test_http(url):
+@app.route('/api/systems/stream')
+def stream_system_events():
+    """Push system changes to the dashboard as Server-Sent Events.
+
+    At most EVENTS_MAX_STREAMS streams are open per process, so streams
+    cannot take every worker thread. Beyond that clients get a busy event
+    and reconnect later, polling for changes meanwhile.
+    """
+    if not event_stream_slots.acquire(blocking=False):
+        return Response(STREAM_BUSY, mimetype='text/event-stream', headers={'Cache-Control': 'no-cache'})
+    last_event_id = parse_event_id(request.headers.get('Last-Event-ID') or request.args.get('last_event_id'))
+
+    def generate():
+        yield STREAM_START
+        try:
+            for event in system_events.tail(last_event_id, heartbeat=EVENTS_HEARTBEAT):
+                yield sse_message(event)
+        except Exception:
+            log.exception("Error streaming system events")
+
+    response = Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+    response.call_on_close(event_stream_slots.release)
+    return response
+
+@app.route('/api/profile', methods=['POST'])
+def run_profile():
+    """Sample stacks and return them in collapsed (flame graph) format.
+
+    Disabled unless PROFILER_TOKEN is set; callers send it as a bearer
+    token. Body: ``seconds`` to sample every thread (e.g. over a check_all
+    or a scheduler interval), or ``requests`` to sample the next N requests
+    served by this process, waiting up to ``timeout`` seconds.
+    """
+    if not PROFILER_TOKEN:
+        return jsonify({'error': 'Profiling is disabled'}), 404
+    if not bearer_token_matches(PROFILER_TOKEN):
+        return jsonify({'error': 'Unauthorized'}), 401
     try:
+        options = request.get_json(silent=True) or {}
+        requests_wanted = options.get('requests')
+        seconds = min(float(options.get('seconds', 10)), 300)
+        timeout = min(float(options.get('timeout', 60)), 300)
+        if requests_wanted is not None:
+            requests_wanted = max(1, int(requests_wanted))
+        profile, samples, profiled = sampling_profiler.profile(seconds=seconds, requests=requests_wanted,
+                                                               timeout=timeout)
+        return Response(profile, mimetype='text/plain', headers={
+            'X-Profile-Samples': str(samples),
+            'X-Profile-Requests': str(profiled)
+        })
+    except RuntimeError as e:
+        return jsonify({'error': str(e)}), 409
+    except (TypeError, ValueError) as e:
+        return jsonify({'error': f'Invalid profile options: {str(e)}'}), 400
+
+@app.route('/metrics')
+def get_metrics():
+    """Prometheus metrics for probes, the scheduler, MongoDB and API routes."""
+    body, content_type = metrics.exposition()
+    return Response(body, content_type=content_type)
+
+@app.route('/api/probe_cache')
+def get_probe_cache_stats():
+    """Hit, miss and coalesced counts of the probe result cache in this process."""
+    return jsonify(dict(probe_cache.stats(), ttl=probe_cache.ttl))
+
+@app.route('/api/systems/check_all')
+def check_all_systems():
+    """Check every system in parallel, streaming one NDJSON line per result."""
+    def generate():
+        started = time.monotonic()
+        checked = 0
+        cached = 0
+        try:
+            writer = status_writer()
+            systems = mongo.db.systems.find()
+            for system, probed, error in probe_engine.imap(cached_probe_system, systems):
+                system_id = str(system['_id'])
+                try:
+                    if error is not None:
+                        raise error
+                    (results, update), fresh = probed
+                    if fresh:
+                        store_probe_result(system, update, writer)
+                    else:
+                        cached += 1
+                    result = {
+                        'system_id': system_id,
+                        'name': results['name'],
+                        'status': results['status'],
+                        'errors': results['errors'],
+                        'last_check': update['last_check'].isoformat()
+                    }
+                except Exception as e:
+                    log.warning("Error checking system %s: %s", system.get('name', 'Unknown'), e)
+                    result = {
+                        'system_id': system_id,
+                        'name': system.get('name', 'Unknown'),
+                        'status': False,
+                        'errors': [str(e)]
+                    }
+                checked += 1
+                yield json.dumps(result) + '\n'
+
+            writer.flush()
+            probe_history.flush()
+            metrics.SWEEP_DURATION.observe(time.monotonic() - started)
+            yield json.dumps({
+                'done': True,
+                'checked': checked,
+                'cached': cached,
+                'duration': round(time.monotonic() - started, 3),
+                'mongo_round_trips': writer.round_trips
+            }) + '\n'
+        except Exception as e:
+            log.exception("Error checking all systems")
+            yield json.dumps({'error': str(e)}) + '\n'
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype='application/x-ndjson',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+def store_probe_result(system, update, writer=None):
+    """Store the fields returned by probe_system() on the system document.
+
+    With a status writer the update is batched; see record_status_changes().
+    """
+    operation, array_filters = status_update(system, update)
+    if writer is not None:
+        writer.update_one(status_filter(system, update), operation, array_filters=array_filters,
+                          change=(system, update))
+    else:
+        before = mongo.db.systems.find_one_and_update({'_id': system['_id']}, operation,
+                                                      array_filters=array_filters,
+                                                      return_document=ReturnDocument.BEFORE)
+        if before is not None:
+            record_change(before, dict(before, **update))
+    record_sample(system['_id'], 'status', update['status'])
+
+def http_endpoint(response):
+    """Describe the scheme, port and final URL that answered an HTTP check."""
+    final = urlparse(response.url)
+    return {
+        'url': response.url,
+        'scheme': final.scheme,
+        'port': final.port or (443 if final.scheme == 'https' else 80),
+        'failures': 0
+    }
+
+def http_result(response):
+    scheme = 'HTTPS' if response.url.startswith('https://') else 'HTTP'
+    return {
+        'success': 200 <= response.status_code < 300,
+        'latency': response.latency,
+        'message': f"{scheme} {response.status_code}: {response.reason}",
+        'endpoint': http_endpoint(response)
+    }
+
+@spanned('http')
+def test_http(url, endpoint=None):
+    """Test an HTTP(S) target, trying the endpoint learned on earlier checks first.
+
+    The result's 'endpoint' is what should be stored for the next check; it is
+    only re-learned after HTTP_RELEARN_AFTER consecutive failures.
+    """
+    try:
+        if endpoint and endpoint.get('url'):
+            try:
+                return http_result(http_client.get(endpoint['url'], verify=False))
+            except RequestException as e:
+                failures = endpoint.get('failures', 0) + 1
+                if failures < HTTP_RELEARN_AFTER:
+                    return {
+                        'success': False,
+                        'message': f"HTTP request failed: {str(e)}",
+                        'endpoint': dict(endpoint, failures=failures)
+                    }
+                log.info("Re-learning HTTP endpoint for %s after %s failures", url, failures)
+
         # Add http:// if no protocol specified
         if not url.startswith(('http://', 'https://')):
             url = f'http://{url}'
         
         # Try with verify=False to handle self-signed certificates
         try:
-            response = requests.get(url, timeout=10, verify=False)
-            return {
-                'success': 200 <= response.status_code < 300,
-                'message': f"HTTP {response.status_code}: {response.reason}"
-            }
+            return http_result(http_client.get(url, verify=False))
         except RequestException as e:
             # If http:// failed, try https://
             if url.startswith('http://'):
                 try:
                     https_url = f"https://{url[7:]}"
-                    print(f"Retrying with HTTPS: {https_url}")
-                    response = requests.get(https_url, timeout=10, verify=False)
-                    return {
-                        'success': 200 <= response.status_code < 300,
-                        'message': f"HTTPS {response.status_code}: {response.reason}"
-                    }
+                    log.debug("Retrying with HTTPS: %s", https_url)
+                    return http_result(http_client.get(https_url, verify=False))
                 except RequestException as e2:
-                    print(f"HTTPS retry failed: {str(e2)}")
-                    return {'success': False, 'message': f"Both HTTP and HTTPS failed: {str(e2)}"}
-            return {'success': False, 'message': f"HTTP request failed: {str(e)}"}
+                    log.debug("HTTPS retry failed: %s", e2)
+                    return {'success': False, 'message': f"Both HTTP and HTTPS failed: {str(e2)}", 'endpoint': None}
+            return {'success': False, 'message': f"HTTP request failed: {str(e)}", 'endpoint': None}
     except Exception as e:
-        print(f"Unexpected error in HTTP test for {url}: {str(e)}")
-        return {'success': False, 'message': f"Error: {str(e)}"}
+        log.warning("Unexpected error in HTTP test for %s: %s", url, e)
+        return {'success': False, 'message': f"Error: {str(e)}", 'endpoint': endpoint}
+
+@spanned('ping')
+def ping_hosts(hosts):
+    """Ping many hosts in one batch, returning {host: result}."""
+    try:
+        return pinger.ping_many(hosts)
+    except PingerUnavailable as e:
+        if not pinger.fallback_logged:
+            log.warning("Batch pinger unavailable, falling back to per-host ping: %s", e)
+            pinger.fallback_logged = True
+        return {host: ping_host(host) for host in hosts}
 
 def test_ping(host):
     """Test if a host is reachable via ping."""
+    return ping_hosts([host])[host]
+
+def ping_host(host):
+    """Ping a single host with nmap or ping3 when no ICMP socket is available."""
     try:
         # First try to resolve the hostname
         try:
-            ip = socket.gethostbyname(host)
+            with span('dns'):
+                ip = socket.gethostbyname(host)
         except socket.gaierror:
-            return {'success': False, 'message': "DNS resolution failed"}
+            return {'success': False, 'rtt': None, 'message': "DNS resolution failed"}
 
         # Try nmap first for more detailed info
         try:
             command = ['/usr/bin/nmap', '-sn', '-Pn', host]
-            process = subprocess.Popen(
-                command,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                universal_newlines=True
-            )
-            stdout, stderr = process.communicate()
+            with span('nmap'):
+                process = subprocess.Popen(
+                    command,
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.PIPE,
+                    universal_newlines=True
+                )
+                stdout, stderr = process.communicate()
             
             if "Host is up" in stdout:
                 # Extract latency if available
@@ -951,62 +2058,58 @@ def test_ping(host):
                 latency = float(latency_match.group(1)) * 1000 if latency_match else None
                 return {
                     'success': True,
+                    'rtt': latency,
                     'message': f"Host is up" + (f" (latency: {latency:.1f}ms)" if latency else "")
                 }
         except:
             pass  # Fall back to ping if nmap fails
 
         # Fallback to ping
-        response_time = ping(host, timeout=2)
+        response_time = ping(host, timeout=2, unit='ms')
         if response_time is not None and response_time is not False:
             return {
                 'success': True,
+                'rtt': response_time,
                 'message': f"Response time: {response_time:.1f}ms"
             }
         return {
             'success': False,
+            'rtt': None,
             'message': "Host not responding to ping"
         }
 
     except Exception as e:
-        return {'success': False, 'message': f"Error: {str(e)}"}
+        return {'success': False, 'rtt': None, 'message': f"Error: {str(e)}"}
+
+def target_host(target):
+    """Return the hostname of a target that may be given as a URL."""
+    if '://' in target:
+        return urlparse(target).hostname or target
+    return target
 
 def test_db_connection(host, port):
-    try:
-        # Try nmap first for detailed port info
+    """Test if a database port accepts TCP connections."""
+    return check_db_ports([(host, port)])[(host, port)]
+
+@spanned('port')
+def check_db_ports(targets):
+    """Check many (host, port) pairs at once, returning {(host, port): result}."""
+    results = {}
+    probes = {}
+    for host, port in targets:
         try:
-            command = ['/usr/bin/nmap', '-p', str(port), '-sV', '-Pn', host]
-            process = subprocess.Popen(
-                command,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                universal_newlines=True
-            )
-            stdout, stderr = process.communicate()
-            
-            if "open" in stdout.lower():
-                # Try to extract service info
-                service_match = re.search(rf'{port}/tcp\s+open\s+([^\n]+)', stdout)
-                service_info = service_match.group(1) if service_match else "unknown"
-                return {
-                    'success': True,
-                    'message': f"Port {port} is open ({service_info})"
-                }
-        except:
-            pass  # Fall back to socket test if nmap fails
-            
-        # Fallback to socket test
-        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        sock.settimeout(2)
-        result = sock.connect_ex((host, int(port)))
-        sock.close()
-        
-        if result == 0:
-            return {'success': True, 'message': f"Port {port} is open"}
-        else:
-            return {'success': False, 'message': f"Port {port} is closed"}
+            probes[(host, port)] = (target_host(host), int(port))
+        except (TypeError, ValueError):
+            results[(host, port)] = {'success': False, 'message': f"Invalid database port: {port}"}
+
+    try:
+        checked = port_prober.probe_many(probes.values(), fingerprint=DB_FINGERPRINT)
+        for target, probe in probes.items():
+            results[target] = checked[probe]
     except Exception as e:
-        return {'success': False, 'message': f"Error checking port {port}: {str(e)}"}
+        for target, probe in probes.items():
+            results[target] = {'success': False, 'message': f"Error checking port {probe[1]}: {str(e)}"}
+    return results
 
 def auto_map_csv_fields(csv_headers):
     """Auto map CSV headers to database fields."""
@@ -1023,6 +2126,7 @@ def auto_map_csv_fields(csv_headers):
         'db_port': ['db_port', 'database_port', 'port'],
         'owner': ['owner', 'team', 'responsible'],
         'shutdown_sequence': ['shutdown_sequence', 'shutdown_steps'],
+        'shutdown_after': ['shutdown_after', 'depends_on'],
         'check_type': ['check_type', 'monitoring_type', 'type'],
         'cluster_nodes': ['cluster_nodes', 'nodes'],
         'mount_points': ['mount_points', 'mounts']
@@ -1074,10 +2178,52 @@ def set_default_values(system_data):
     
     return system_data
 
+def ensure_indexes():
+    """Create the indexes the list, delta and version queries rely on.
+
+    Runs in every process, whatever initialized the database, and keeps the
+    tombstone expiry in line with TOMBSTONE_RETENTION_DAYS.
+    """
+    # _id needs no index of its own and name has a unique one from the init scripts
+    for field in [field for field in SYSTEM_SORT_FIELDS if field not in ('_id', 'name')] + ['updated_at']:
+        mongo.db.systems.create_index([(field, 1), ('_id', 1)])
+    # Only systems reserved by a shutdown run have one
+    mongo.db.systems.create_index('sequence_run', sparse=True)
+    retention = TOMBSTONE_RETENTION_DAYS * 24 * 3600
+    try:
+        mongo.db.system_tombstones.create_index('deleted_at', expireAfterSeconds=retention)
+    except OperationFailure:
+        # Made with another retention; change it in place
+        mongo.db.command({'collMod': mongo.db.system_tombstones.name,
+                          'index': {'keyPattern': {'deleted_at': 1}, 'expireAfterSeconds': retention}})
+
+def start_background_tasks():
+    """Ensure indexes and start the probe scheduler and maintenance loops in this process.
+
+    Safe to call in every process (e.g. each gunicorn worker): the loops only
+    do work while this process holds the matching lease.
+    """
+    try:
+        ensure_indexes()
+    except Exception:
+        log.exception("Error creating indexes")
+    if not PROBE_SCHEDULER:
+        return
+    for target in (probe_leases.run, maintenance_lease.run, update_status,
+                   summary_reconciler, history_rollup):
+        thread = threading.Thread(target=target)
+        thread.daemon = True
+        thread.start()
+
+def stop_background_tasks():
+    """Give up this process's leases so another process takes over right away."""
+    if not PROBE_SCHEDULER:
+        return
+    probe_leases.release_all()
+    maintenance_lease.release_all()
+
 if __name__ == '__main__':
-    status_thread = threading.Thread(target=update_status)
-    status_thread.daemon = True
-    status_thread.start()
+    start_background_tasks()
     
     host = os.getenv('FLASK_HOST', '0.0.0.0')
     port = int(os.getenv('FLASK_PORT', 5000))
@@ -0,0 +1,186 @@
+"""Async serving mode.
+
+    uvicorn asgi_app:app --host 0.0.0.0 --port 5000 --workers 4
+
+The read and streaming routes the dashboard polls or holds open
+(GET /api/systems, /api/systems/<id>, /api/systems/summary and
+/api/systems/stream) are served on the event loop with the motor async
+MongoDB driver, so one process can hold thousands of dashboards and event
+streams. Every other route is the Flask app, run in a thread pool, and the
+background probe scheduler starts as it does under gunicorn.
+"""
+import asyncio
+import os
+from contextlib import asynccontextmanager
+
+from a2wsgi import WSGIMiddleware
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorClient
+from starlette.applications import Starlette
+from starlette.convertors import Convertor, register_url_convertor
+from starlette.responses import Response, StreamingResponse
+from starlette.routing import Mount, Route
+from werkzeug.http import parse_etags, quote_etag
+
+import app as flask_app
+from system_events import NEWEST_EVENT, STREAM_START, TailState, event_exists_query, parse_event_id, sse_message
+
+# Threads running the Flask routes (writes, probes, imports) in each process
+WSGI_THREADS = int(os.getenv("WSGI_THREADS", 10))
+
+log = flask_app.log
+mongo = {}
+
+
+class ObjectIdConvertor(Convertor):
+    regex = '[0-9a-fA-F]{24}'
+
+    def convert(self, value):
+        return ObjectId(value)
+
+    def to_string(self, value):
+        return str(value)
+
+
+register_url_convertor('objectid', ObjectIdConvertor())
+
+
+def json_response(body, status_code=200, headers=None):
+    """Encode like Flask's jsonify, so both serving modes return the same bodies."""
+    return Response(flask_app.app.json.dumps(body, separators=(',', ':')) + '\n', status_code=status_code,
+                    headers=headers, media_type='application/json')
+
+
+async def systems_version(db, include_last_check):
+    """Async flask_app.systems_version()."""
+    docs = await asyncio.gather(*(db[name].find_one(**query)
+                                  for name, query in flask_app.version_queries(include_last_check)))
+    return flask_app.version_from(docs)
+
+
+async def get_systems(request):
+    """GET /api/systems; see flask_app.get_systems for the parameters."""
+    db = mongo['db']
+    try:
+        plan, error = flask_app.systems_list_plan(request.query_params)
+        if error:
+            return json_response({'error': error[0], 'systems': []}, error[1])
+
+        # Answer unchanged lists without querying them
+        seed, latest_change = await systems_version(db, plan['include_last_check'])
+        etag = flask_app.systems_etag(seed, request.url.query)
+        headers = {'ETag': quote_etag(etag, weak=True)}
+        if parse_etags(request.headers.get('if-none-match')).contains_weak(etag):
+            return Response(status_code=304, headers=headers)
+
+        found = db.systems.find(plan['page_query'], plan['projection']).sort(plan['sort_spec'])
+        if plan['limit']:
+            found = found.limit(plan['limit'] + 1)
+        systems = await found.to_list(None)
+
+        body = flask_app.systems_page(plan, systems, latest_change)
+        if plan['count']:
+            body['total'] = await db.systems.count_documents(plan['query'])
+        if plan['tombstone_query'] is not None:
+            tombstones = await db.system_tombstones.find(plan['tombstone_query'], {'_id': 1}).to_list(None)
+            body['deleted'] = [str(tombstone['_id']) for tombstone in tombstones]
+        return json_response(body, headers=headers)
+    except Exception as e:
+        log.exception("Error in get_systems")
+        return json_response({'error': str(e), 'systems': []}, 500)
+
+
+async def get_system(request):
+    try:
+        system = await mongo['db'].systems.find_one({'_id': request.path_params['system_id']})
+        if not system:
+            return json_response({"error": "System not found"}, 404)
+        return json_response(flask_app.system_detail(system))
+    except Exception as e:
+        log.exception("Error getting system")
+        return json_response({"error": str(e)}, 500)
+
+
+async def get_systems_summary(request):
+    try:
+        counters = flask_app.summary_counters
+        summary = await mongo['db'][counters.collection.name].find_one({'_id': counters.doc_id})
+        if summary is None:
+            # Built once with the sync aggregation, then kept up to date by every write
+            summary = await asyncio.to_thread(flask_app.reconcile_summary)
+        return json_response(flask_app.summary_response(summary))
+    except Exception as e:
+        log.exception("Error getting systems summary")
+        return json_response({'error': str(e)}, 500)
+
+
+async def tail_events(collection, last_event_id=None, heartbeat=15):
+    """Async flask_app.system_events.tail(): yields events, or None every ``heartbeat`` seconds of quiet."""
+    newest = await collection.find_one(**NEWEST_EVENT)
+    exists = (last_event_id is not None and
+              await collection.find_one(**event_exists_query(last_event_id)) is not None)
+    state = TailState(last_event_id, exists, newest['_id'] if newest else None, heartbeat)
+    if state.reset:
+        yield state.reset
+
+    while True:
+        cursor = collection.find(**state.cursor_options())
+        try:
+            while cursor.alive:
+                async for event in cursor:
+                    if state.accept(event):
+                        yield event
+                for event in state.caught_up():
+                    yield event
+        finally:
+            await cursor.close()
+        state.restart()
+
+        # Tailable cursors die on an empty collection; wait for the first event
+        await asyncio.sleep(1)
+        for event in state.idle():
+            yield event
+
+
+async def stream_system_events(request):
+    """Server-Sent Events of system changes; each stream is a coroutine, not a thread."""
+    last_event_id = parse_event_id(request.headers.get('last-event-id') or request.query_params.get('last_event_id'))
+    events = mongo['db'][flask_app.system_events.collection.name]
+
+    async def generate():
+        yield STREAM_START
+        try:
+            async for event in tail_events(events, last_event_id, heartbeat=flask_app.EVENTS_HEARTBEAT):
+                yield sse_message(event)
+        except Exception:
+            log.exception("Error streaming system events")
+
+    return StreamingResponse(generate(), media_type='text/event-stream',
+                             headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+@asynccontextmanager
+async def lifespan(starlette_app):
+    client = AsyncIOMotorClient(flask_app.app.config['MONGO_URI'])
+    mongo['db'] = client.get_default_database()
+    # The capped event collection is created by the sync side on first use
+    await asyncio.to_thread(flask_app.system_events.ensure)
+    flask_app.start_background_tasks()
+    try:
+        yield
+    finally:
+        flask_app.stop_background_tasks()
+        client.close()
+
+
+app = Starlette(
+    routes=[
+        Route('/api/systems', get_systems, methods=['GET']),
+        Route('/api/systems/summary', get_systems_summary, methods=['GET']),
+        Route('/api/systems/stream', stream_system_events, methods=['GET']),
+        Route('/api/systems/{system_id:objectid}', get_system, methods=['GET']),
+        # Everything else, including writes, probes and imports, is the Flask app
+        Mount('/', app=WSGIMiddleware(flask_app.app, workers=WSGI_THREADS))
+    ],
+    lifespan=lifespan
+)
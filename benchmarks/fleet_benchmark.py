@@ -0,0 +1,375 @@
+#!/usr/bin/env python3
+"""Fleet-scale benchmarks for the monitor.
+
+Seeds a MongoDB database with a synthetic fleet shaped like the documents in
+mongodb/init/01-init.js (including cluster systems), points every target at
+local stand-in HTTP and TCP responders, and measures the hot paths of the
+app in-process. Results are written as JSON lines, one per benchmark and
+fleet size, so runs can be compared with --compare.
+
+    python benchmarks/fleet_benchmark.py --sizes 1000,10000 --output before.jsonl
+    python benchmarks/fleet_benchmark.py --sizes 1000,10000 --compare before.jsonl
+
+The database named in --mongo-uri is dropped first, so its name must contain
+"bench".
+"""
+import argparse
+import csv
+import io
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime
+
+from pymongo import MongoClient, uri_parser
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+
+import responders  # noqa: E402
+
+BENCHMARKS = ['import', 'seed', 'get_systems', 'get_systems_summary', 'export', 'check_all', 'update_status']
+INDEXED_FIELDS = ['app_name', 'owner', 'status', 'sequence_status', 'created_at', 'last_check', 'updated_at']
+CSV_FIELDS = ['name', 'app_name', 'target', 'db_name', 'db_type', 'db_port',
+              'owner', 'shutdown_sequence', 'check_type', 'cluster_nodes']
+
+
+def loopback(index):
+    """A distinct 127.0.0.0/8 address per index, so each system has its own host."""
+    return f"127.{(index >> 16) & 255}.{(index >> 8) & 255}.{(index & 255) or 1}"
+
+
+def make_system(index, rng, options, ports):
+    """Build one system document like those in mongodb/init/01-init.js."""
+    now = datetime.now()
+    host = loopback(index + 1)
+    check_type = 'ping' if rng.random() < options.ping_ratio else 'http'
+    system = {
+        'name': f"bench-{index:06d}",
+        'app_name': f"app-{index % 500}",
+        'check_type': check_type,
+        'target': f"http://{host}:{ports['http']}" if check_type == 'http' else host,
+        'db_name': 'N/A',
+        'db_type': 'N/A',
+        'mount_points': ['/mnt/data'],
+        'owner': f"team-{index % 50}",
+        'shutdown_sequence': ['service app stop'],
+        'created_at': now,
+        'last_check': now,
+        'status': False,
+        'sequence_status': 'not_started',
+        'http_status': False,
+        'http_error': '',
+        'ping_status': False,
+        'ping_error': '',
+        'db_status': False,
+        'last_error': ''
+    }
+    if rng.random() < options.db_ratio:
+        system.update(db_name=f"db_{index}", db_type='mysql',
+                      db_port=ports['closed'] if rng.random() < options.failure_rate else ports['tcp'])
+    if rng.random() < options.cluster_ratio:
+        system['cluster_nodes'] = [{
+            'host': f"{loopback((1 << 20) + index * 3 + node)}:{ports['http']}",
+            'status': False,
+            'last_check': now,
+            'http_status': False,
+            'http_error': '',
+            'ping_status': False,
+            'ping_error': ''
+        } for node in range(3)]
+    return system
+
+
+def fleet(size, options, ports):
+    rng = random.Random(options.seed)
+    return (make_system(index, rng, options, ports) for index in range(size))
+
+
+def fleet_csv(size, options, ports):
+    output = io.StringIO()
+    writer = csv.DictWriter(output, fieldnames=CSV_FIELDS)
+    writer.writeheader()
+    for system in fleet(size, options, ports):
+        row = {field: system.get(field, '') for field in CSV_FIELDS}
+        row['shutdown_sequence'] = ';'.join(system['shutdown_sequence'])
+        row['cluster_nodes'] = ';'.join(node['host'] for node in system.get('cluster_nodes', []))
+        writer.writerow(row)
+    return output.getvalue().encode('utf-8')
+
+
+def reset_systems(db):
+    db.systems.drop()
+    db.system_tombstones.drop()
+    db.systems.create_index('name', unique=True)
+    for field in INDEXED_FIELDS:
+        db.systems.create_index([(field, 1), ('_id', 1)])
+
+
+def result(name, size, durations, items=None, unit=None, **extra):
+    """Summarize repeated timings of one benchmark."""
+    median = statistics.median(durations)
+    record = {
+        'benchmark': name,
+        'systems': size,
+        'repeats': len(durations),
+        'seconds': round(median, 6),
+        'min_seconds': round(min(durations), 6),
+        'max_seconds': round(max(durations), 6)
+    }
+    if items is not None:
+        record['rate'] = round(items / median, 2) if median else None
+        record['unit'] = unit
+    record.update(extra)
+    return record
+
+
+def timed(action, repeats=1):
+    durations = []
+    value = None
+    for _ in range(repeats):
+        started = time.perf_counter()
+        value = action()
+        durations.append(time.perf_counter() - started)
+    return durations, value
+
+
+class FleetBenchmark:
+    def __init__(self, app_module, options, ports):
+        self.app = app_module
+        self.db = app_module.mongo.db
+        self.client = app_module.app.test_client()
+        self.options = options
+        self.ports = ports
+        self._scheduler_started = False
+
+    def bench_import(self, size):
+        reset_systems(self.db)
+        data = fleet_csv(size, self.options, self.ports)
+
+        def upload():
+            response = self.client.post('/api/systems/import', content_type='multipart/form-data',
+                                        data={'file': (io.BytesIO(data), 'fleet.csv')})
+            return response.get_json()
+
+        durations, body = timed(upload)
+        return [result('import', size, durations, size, 'rows/s',
+                       imported=body.get('imported_count'), bytes=len(data))]
+
+    def bench_seed(self, size):
+        reset_systems(self.db)
+
+        def seed():
+            batch = []
+            for system in fleet(size, self.options, self.ports):
+                batch.append(system)
+                if len(batch) == 1000:
+                    self.db.systems.insert_many(batch)
+                    batch = []
+            if batch:
+                self.db.systems.insert_many(batch)
+
+        durations, _ = timed(seed)
+        self.app.reconcile_summary()
+        return [result('seed', size, durations, size, 'systems/s')]
+
+    def bench_get_systems(self, size):
+        repeats = self.options.repeats
+
+        def full_list():
+            response = self.client.get('/api/systems')
+            return response.headers.get('ETag'), len(response.get_json()['systems'])
+
+        def paged():
+            pages, cursor = 0, None
+            while True:
+                url = '/api/systems?limit=1000' + (f"&cursor={cursor}" if cursor else '')
+                body = self.client.get(url).get_json()
+                pages += 1
+                cursor = body.get('next_cursor')
+                if not cursor:
+                    return pages
+
+        durations, (etag, count) = timed(full_list, repeats)
+        records = [result('get_systems', size, durations, count, 'systems/s')]
+        durations, pages = timed(paged, repeats)
+        records.append(result('get_systems_paged', size, durations, size, 'systems/s', pages=pages))
+        durations, status = timed(lambda: self.client.get('/api/systems', headers={'If-None-Match': etag}).status_code,
+                                  repeats)
+        records.append(result('get_systems_not_modified', size, durations, status=status))
+        return records
+
+    def bench_get_systems_summary(self, size):
+        repeats = self.options.repeats
+        durations, _ = timed(lambda: self.client.get('/api/systems/summary').get_json(), repeats)
+        records = [result('get_systems_summary', size, durations)]
+        durations, _ = timed(self.app.compute_systems_summary, repeats)
+        records.append(result('get_systems_summary_aggregate', size, durations))
+        return records
+
+    def bench_export(self, size):
+        def export():
+            response = self.client.get('/api/systems/export')
+            return len(response.get_data())
+
+        durations, length = timed(export, self.options.repeats)
+        return [result('export', size, durations, size, 'rows/s', bytes=length)]
+
+    def bench_check_all(self, size):
+        def check_all():
+            lines = self.client.get('/api/systems/check_all').get_data(as_text=True).splitlines()
+            done = json.loads(lines[-1])
+            if not done.get('done'):
+                raise RuntimeError(f"check_all failed: {done.get('error')}")
+            return done
+
+        durations, done = timed(check_all)
+        return [result('check_all', size, durations, done.get('checked'), 'systems/s',
+                       mongo_round_trips=done.get('mongo_round_trips'))]
+
+    def bench_update_status(self, size):
+        """Time the background scheduler checking every system once, all due at the same moment."""
+        app = self.app
+        app.probe_leases.tick()
+        systems = list(self.db.systems.find({}, {'target': 1, 'check_type': 1, 'http_endpoint': 1,
+                                                 'status': 1, 'name': 1, 'last_error': 1,
+                                                 'check_interval': 1}))
+        started = time.monotonic()
+        app.check_scheduler.sync([], now=started)
+        app.check_scheduler.sync(systems, now=started - 10 ** 7)
+        if not self._scheduler_started:
+            threading.Thread(target=app.update_status, daemon=True).start()
+            self._scheduler_started = True
+
+        last_tick = started
+        while True:
+            time.sleep(0.1)
+            if time.monotonic() - last_tick > app.LEASE_TTL / 3:
+                app.probe_leases.tick()
+                last_tick = time.monotonic()
+            if app.check_scheduler.scheduled_after(started) >= len(systems):
+                break
+        duration = time.monotonic() - started
+
+        # Stop the scheduler from probing this fleet during later benchmarks
+        app.probe_leases.release_all()
+        app.check_scheduler.sync([])
+        return [result('update_status', size, [duration], len(systems), 'systems/s')]
+
+    def run(self, size, benchmarks):
+        records = []
+        # Everything after import and seed needs the seeded fleet
+        if 'seed' not in benchmarks and set(benchmarks) - {'import'}:
+            benchmarks = ['seed'] + list(benchmarks)
+        for name in BENCHMARKS:
+            if name in benchmarks:
+                for record in getattr(self, f"bench_{name}")(size):
+                    records.append(record)
+                    print(f"{record['benchmark']:32} {size:>7} systems  {record['seconds']:>10.4f}s"
+                          + (f"  {record['rate']:>10} {record['unit']}" if record.get('rate') else ''),
+                          file=sys.stderr)
+        return records
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(records, baseline_path):
+    """Print the change of each benchmark against a previous run's output."""
+    with open(baseline_path) as f:
+        baseline = {(record['benchmark'], record['systems']): record
+                    for record in map(json.loads, f) if 'benchmark' in record}
+    print(f"{'benchmark':32} {'systems':>8} {'before':>10} {'after':>10} {'change':>8}", file=sys.stderr)
+    for record in records:
+        before = baseline.get((record['benchmark'], record['systems']))
+        if before is None:
+            continue
+        change = (record['seconds'] - before['seconds']) / before['seconds'] * 100 if before['seconds'] else 0
+        print(f"{record['benchmark']:32} {record['systems']:>8} {before['seconds']:>10.4f} "
+              f"{record['seconds']:>10.4f} {change:>+7.1f}%", file=sys.stderr)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--mongo-uri', default=os.getenv('BENCH_MONGO_URI', 'mongodb://localhost:27017/app_monitor_bench'))
+    parser.add_argument('--sizes', default='1000,10000,100000', help='comma-separated fleet sizes')
+    parser.add_argument('--benchmarks', default=','.join(BENCHMARKS), help='comma-separated subset of: ' + ', '.join(BENCHMARKS))
+    parser.add_argument('--repeats', type=int, default=5, help='repeats for read benchmarks (median is reported)')
+    parser.add_argument('--seed', type=int, default=42, help='random seed for the fleet and responders')
+    parser.add_argument('--http-latency', type=float, default=0.02, help='seconds before the HTTP responder answers')
+    parser.add_argument('--tcp-latency', type=float, default=0.005, help='seconds before the TCP responder sends its banner')
+    parser.add_argument('--failure-rate', type=float, default=0.05, help='share of HTTP responses that are 503 and of database ports that are closed')
+    parser.add_argument('--cluster-ratio', type=float, default=0.1, help='share of systems with three cluster nodes')
+    parser.add_argument('--db-ratio', type=float, default=0.3, help='share of systems with a database port check')
+    parser.add_argument('--ping-ratio', type=float, default=0.0, help='share of ping systems (needs ICMP privileges)')
+    parser.add_argument('--output', help='write JSON lines here instead of stdout')
+    parser.add_argument('--compare', help='JSON lines from an earlier run to compare against')
+    return parser.parse_args()
+
+
+def main():
+    options = parse_args()
+    database = uri_parser.parse_uri(options.mongo_uri).get('database') or ''
+    if 'bench' not in database:
+        sys.exit(f"Refusing to use database '{database}': its name must contain 'bench' because it is dropped")
+
+    MongoClient(options.mongo_uri).drop_database(database)
+    # Configure the app before importing it: fresh probes every time and no background threads
+    os.environ['MONGO_URI'] = options.mongo_uri
+    os.environ.setdefault('PROBE_CACHE_TTL', '0')
+    os.environ.setdefault('PROBE_SHARDS', '1')
+    import app as app_module
+
+    http = responders.start_http(responders.Responder(options.http_latency, failure_rate=options.failure_rate,
+                                                      seed=options.seed))
+    tcp = responders.start_tcp(responders.Responder(options.tcp_latency, seed=options.seed))
+    ports = {'http': http.server_address[1], 'tcp': tcp.server_address[1], 'closed': responders.closed_port()}
+
+    run = {
+        'commit': git_commit(),
+        'started_at': datetime.now().isoformat(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'options': {key: value for key, value in vars(options).items()
+                    if key not in ('output', 'compare', 'mongo_uri')}
+    }
+    benchmark = FleetBenchmark(app_module, options, ports)
+    benchmarks = [name.strip() for name in options.benchmarks.split(',') if name.strip()]
+    unknown = set(benchmarks) - set(BENCHMARKS)
+    if unknown:
+        sys.exit(f"Unknown benchmarks: {', '.join(sorted(unknown))}")
+
+    records = []
+    output = open(options.output, 'w') if options.output else sys.stdout
+    try:
+        for size in (int(size) for size in options.sizes.split(',')):
+            for record in benchmark.run(size, benchmarks):
+                record['run'] = run
+                records.append(record)
+                output.write(json.dumps(record) + '\n')
+                output.flush()
+    finally:
+        if options.output:
+            output.close()
+        http.shutdown()
+        tcp.shutdown()
+
+    if options.compare:
+        compare(records, options.compare)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+"""Local stand-ins for monitored HTTP services and database ports."""
+import ipaddress
+import random
+import socket
+import socketserver
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class Responder:
+    """Shared latency and failure settings, with a seeded random source."""
+
+    def __init__(self, latency=0.01, jitter=0.5, failure_rate=0.0, seed=0):
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def next_response(self):
+        """Return (delay in seconds, fail) for one request."""
+        with self._lock:
+            delay = self.latency * (1 + self._random.uniform(-self.jitter, self.jitter))
+            return max(0.0, delay), self._random.random() < self.failure_rate
+
+
+class _HTTPHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        delay, fail = self.server.responder.next_response()
+        time.sleep(delay)
+        body = b'unavailable' if fail else b'ok'
+        self.send_response(503 if fail else 200)
+        self.send_header('Content-Type', 'text/plain')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_HEAD = do_GET
+
+    def log_message(self, format, *args):
+        pass
+
+
+class _LoopbackOnly:
+    """Accept connections from this host only.
+
+    Each benchmark system has its own 127.0.0.0/8 address, which a socket
+    bound to 127.0.0.1 alone would refuse, so the servers listen on every
+    address and close connections from anywhere but loopback.
+    """
+
+    def verify_request(self, request, client_address):
+        return ipaddress.ip_address(client_address[0]).is_loopback
+
+
+class _HTTPServer(_LoopbackOnly, ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 4096
+
+
+class _TCPHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        delay, fail = self.server.responder.next_response()
+        time.sleep(delay)
+        if not fail:
+            try:
+                self.request.sendall(self.server.banner)
+            except OSError:
+                pass
+
+
+class _TCPServer(_LoopbackOnly, socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+    request_queue_size = 4096
+
+
+def _serve(server):
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+def start_http(responder, port=0):
+    """Serve HTTP on every loopback address (127.0.0.0/8); returns the server."""
+    server = _HTTPServer(('', port), _HTTPHandler)
+    server.responder = responder
+    return _serve(server)
+
+
+def start_tcp(responder, port=0, banner=b'5.7.44-log\n'):
+    """Accept TCP connections and send a database-like banner after the configured delay."""
+    server = _TCPServer(('', port), _TCPHandler)
+    server.responder = responder
+    server.banner = banner
+    return _serve(server)
+
+
+def closed_port():
+    """Return a local port nothing is listening on."""
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""Compare the gunicorn and ASGI serving modes under dashboard load.
+
+Seeds a MongoDB database with a synthetic fleet, then for each server
+(gunicorn with gunicorn_config.py, and uvicorn with asgi_app) opens
+--streams event streams (GET /api/systems/stream) and holds them while
+--connections clients poll GET /api/systems?limit=100 for --duration
+seconds. Reports requests per second, latency percentiles and how many
+streams were held, as JSON lines.
+
+    python benchmarks/serving_benchmark.py --systems 10000 --streams 1000 --output serving.jsonl
+
+Needs the packages in requirements-async.txt. Holding
+thousands of streams needs a matching open-files limit (ulimit -n). The
+database named in --mongo-uri is dropped first, so its name must contain
+"bench".
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+from types import SimpleNamespace
+
+import httpx
+from pymongo import MongoClient, uri_parser
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+
+from fleet_benchmark import fleet, git_commit, reset_systems  # noqa: E402
+
+SERVERS = ['gunicorn', 'uvicorn']
+
+
+def server_command(name, options):
+    bind = f"127.0.0.1:{options.port}"
+    if name == 'gunicorn':
+        return ['gunicorn', '-c', 'gunicorn_config.py', '--bind', bind,
+                '--workers', str(options.workers), 'app:app']
+    return ['uvicorn', 'asgi_app:app', '--host', '127.0.0.1', '--port', str(options.port),
+            '--workers', str(options.workers), '--log-level', 'warning']
+
+
+def start_server(name, options):
+    env = dict(os.environ, MONGO_URI=options.mongo_uri, PROBE_SCHEDULER='false', LOG_LEVEL='WARNING')
+    process = subprocess.Popen(server_command(name, options), cwd=ROOT, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    url = f"http://127.0.0.1:{options.port}"
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"{name} exited with status {process.returncode}")
+        try:
+            if httpx.get(f"{url}/api/systems?limit=1", timeout=1).status_code == 200:
+                return process, url
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError(f"{name} did not answer within 30 seconds")
+
+
+def stop_server(process):
+    process.terminate()
+    try:
+        process.wait(10)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+
+async def drain(chunks):
+    async for _ in chunks:
+        pass
+
+
+async def hold_stream(client, url, opened, stop):
+    """Open one event stream and read it until ``stop``; returns whether it stayed open."""
+    try:
+        async with client.stream('GET', f"{url}/api/systems/stream", timeout=httpx.Timeout(5, read=None)) as response:
+            if response.status_code != 200:
+                return False
+            chunks = response.aiter_raw()
+            await chunks.__anext__()
+            opened.append(True)
+            reading = asyncio.ensure_future(drain(chunks))
+            stopping = asyncio.ensure_future(stop.wait())
+            await asyncio.wait([reading, stopping], return_when=asyncio.FIRST_COMPLETED)
+            # A stream the server closed before the end of the run was not held
+            held = not reading.done()
+            reading.cancel()
+            stopping.cancel()
+            return held
+    except (httpx.HTTPError, StopAsyncIteration):
+        return False
+
+
+async def poll_systems(client, url, limit, deadline, latencies, errors):
+    while time.monotonic() < deadline:
+        started = time.perf_counter()
+        try:
+            response = await client.get(f"{url}/api/systems", params={'limit': limit})
+            if response.status_code == 200:
+                latencies.append(time.perf_counter() - started)
+            else:
+                errors.append(response.status_code)
+        except httpx.HTTPError as e:
+            errors.append(type(e).__name__)
+
+
+def percentile(values, share):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * share))]
+
+
+async def measure(url, options):
+    limits = httpx.Limits(max_connections=options.streams + options.connections + 10, max_keepalive_connections=None)
+    async with httpx.AsyncClient(limits=limits, timeout=options.request_timeout) as client:
+        stop = asyncio.Event()
+        opened = []
+        streams = [asyncio.ensure_future(hold_stream(client, url, opened, stop)) for _ in range(options.streams)]
+        # Give the streams time to connect before the polling starts
+        deadline = time.monotonic() + options.stream_timeout
+        while len(opened) < options.streams and time.monotonic() < deadline:
+            await asyncio.sleep(0.1)
+        streams_opened = len(opened)
+
+        latencies, errors = [], []
+        started = time.monotonic()
+        await asyncio.gather(*(poll_systems(client, url, options.limit, started + options.duration, latencies, errors)
+                               for _ in range(options.connections)))
+        elapsed = time.monotonic() - started
+
+        stop.set()
+        held = await asyncio.gather(*streams)
+    return {
+        'requests': len(latencies),
+        'errors': len(errors),
+        'rate': round(len(latencies) / elapsed, 2),
+        'unit': 'requests/s',
+        'p50_ms': round(percentile(latencies, 0.5) * 1000, 2) if latencies else None,
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 2) if latencies else None,
+        'mean_ms': round(statistics.mean(latencies) * 1000, 2) if latencies else None,
+        'streams_requested': options.streams,
+        'streams_opened': streams_opened,
+        'streams_held': sum(held)
+    }
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--mongo-uri', default=os.getenv('BENCH_MONGO_URI', 'mongodb://localhost:27017/app_monitor_bench'))
+    parser.add_argument('--servers', default=','.join(SERVERS), help='comma-separated subset of: ' + ', '.join(SERVERS))
+    parser.add_argument('--systems', type=int, default=1000, help='fleet size to seed')
+    parser.add_argument('--workers', type=int, default=1, help='server processes (the same for both servers)')
+    parser.add_argument('--connections', type=int, default=50, help='concurrent clients polling /api/systems')
+    parser.add_argument('--streams', type=int, default=500, help='event streams held open during the run')
+    parser.add_argument('--duration', type=float, default=10, help='seconds of polling per server')
+    parser.add_argument('--limit', type=int, default=100, help='page size of each /api/systems request')
+    parser.add_argument('--request-timeout', type=float, default=10, help='seconds before a request counts as an error')
+    parser.add_argument('--stream-timeout', type=float, default=10, help='seconds to wait for the streams to open')
+    parser.add_argument('--port', type=int, default=5077)
+    parser.add_argument('--seed', type=int, default=42, help='random seed for the fleet')
+    parser.add_argument('--output', help='write JSON lines here instead of stdout')
+    return parser.parse_args()
+
+
+def main():
+    options = parse_args()
+    database = uri_parser.parse_uri(options.mongo_uri).get('database') or ''
+    if 'bench' not in database:
+        sys.exit(f"Refusing to use database '{database}': its name must contain 'bench' because it is dropped")
+    servers = [name.strip() for name in options.servers.split(',') if name.strip()]
+    unknown = set(servers) - set(SERVERS)
+    if unknown:
+        sys.exit(f"Unknown servers: {', '.join(sorted(unknown))}")
+
+    client = MongoClient(options.mongo_uri)
+    client.drop_database(database)
+    db = client.get_default_database()
+    reset_systems(db)
+    # Nothing is probed, so the targets only need to look real
+    shape = SimpleNamespace(seed=options.seed, ping_ratio=0.0, db_ratio=0.3, failure_rate=0.05, cluster_ratio=0.1)
+    systems = list(fleet(options.systems, shape, {'http': 80, 'tcp': 3306, 'closed': 1}))
+    for start in range(0, len(systems), 1000):
+        db.systems.insert_many(systems[start:start + 1000], ordered=False)
+
+    run = {
+        'commit': git_commit(),
+        'started_at': datetime.now().isoformat(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'options': {key: value for key, value in vars(options).items() if key not in ('output', 'mongo_uri')}
+    }
+    output = open(options.output, 'w') if options.output else sys.stdout
+    try:
+        output.write(json.dumps({'run': run}) + '\n')
+        for name in servers:
+            process, url = start_server(name, options)
+            try:
+                record = {'benchmark': 'serving', 'server': name, 'systems': options.systems,
+                          'workers': options.workers, 'connections': options.connections}
+                record.update(asyncio.run(measure(url, options)))
+            finally:
+                stop_server(process)
+            output.write(json.dumps(record) + '\n')
+            output.flush()
+            print(f"{name:10} {record['rate']:>10.1f} req/s  p50 {record['p50_ms']} ms  p99 {record['p99_ms']} ms  "
+                  f"streams held {record['streams_held']}/{options.streams}", file=sys.stderr)
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+
+if __name__ == '__main__':
+    main()
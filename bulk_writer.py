@@ -0,0 +1,87 @@
+import logging
+import threading
+import time
+
+from pymongo import InsertOne, UpdateOne
+from pymongo.errors import BulkWriteError
+
+log = logging.getLogger(__name__)
+
+
+class BulkWriter:
+    """Buffer write operations and flush them with unordered bulk writes.
+
+    A flush happens once ``batch_size`` operations are queued or when an
+    operation is added more than ``flush_interval`` seconds after the last
+    flush. Call ``flush()`` at the end to write whatever is left.
+
+    Operations can carry a ``change``. After a bulk write reaches the server,
+    ``on_flush(changes, unmatched)`` is called with the changes of the
+    operations that did not fail and the number of updates that matched no
+    document; the number of writes it returns is added to ``round_trips``.
+    Changes of a batch that could not be written at all are dropped.
+    """
+
+    def __init__(self, collection, batch_size=500, flush_interval=2.0, on_flush=None):
+        self.collection = collection
+        self.on_flush = on_flush
+        self.batch_size = max(1, int(batch_size))
+        self.flush_interval = flush_interval
+        self.round_trips = 0
+        self.operations = 0
+        self.errors = 0
+        self._pending = []
+        self._last_flush = time.monotonic()
+        self._lock = threading.Lock()
+
+    def update_one(self, filter, update, array_filters=None, change=None):
+        self._add(UpdateOne(filter, update, array_filters=array_filters), change)
+
+    def insert_one(self, document, change=None):
+        self._add(InsertOne(document), change)
+
+    def _add(self, operation, change):
+        with self._lock:
+            self._pending.append((operation, change))
+            due = (len(self._pending) >= self.batch_size or
+                   time.monotonic() - self._last_flush >= self.flush_interval)
+        if due:
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            batch, self._pending = self._pending, []
+            self._last_flush = time.monotonic()
+        if not batch:
+            return
+
+        failed = set()
+        try:
+            result = self.collection.bulk_write([operation for operation, _ in batch], ordered=False)
+            matched = result.matched_count
+        except BulkWriteError as e:
+            write_errors = e.details.get('writeErrors', [])
+            failed = {error['index'] for error in write_errors}
+            matched = e.details.get('nMatched', 0)
+            log.warning("Bulk write errors: %s", write_errors[:3])
+        finally:
+            with self._lock:
+                self.round_trips += 1
+                self.operations += len(batch)
+                self.errors += len(failed)
+
+        if not self.on_flush:
+            return
+        written = [entry for index, entry in enumerate(batch) if index not in failed]
+        updates = sum(1 for operation, _ in written if isinstance(operation, UpdateOne))
+        writes = self.on_flush([change for _, change in written if change is not None], updates - matched)
+        with self._lock:
+            self.round_trips += writes or 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                'operations': self.operations,
+                'round_trips': self.round_trips,
+                'errors': self.errors
+            }
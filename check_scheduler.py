@@ -0,0 +1,156 @@
+import heapq
+import itertools
+import random
+import threading
+import time
+
+
+class CheckScheduler:
+    """Priority queue of upcoming checks, one entry per system.
+
+    Each system is checked every ``check_interval`` seconds (from its
+    document, else ``default_interval``) with random jitter, and new systems
+    start at a random point of their interval, so checks are spread evenly
+    instead of arriving in one burst per cycle. Intervals adapt to results:
+    the next ``fast_checks`` checks after a status change run at a quarter of
+    the interval, and a system that keeps failing backs off exponentially
+    after ``backoff_after`` failures, up to ``max_backoff`` seconds.
+    """
+
+    def __init__(self, default_interval=60, min_interval=10, max_interval=86400, jitter=0.1,
+                 fast_checks=3, backoff_after=5, max_backoff=900):
+        self.default_interval = default_interval
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.jitter = jitter
+        self.fast_checks = fast_checks
+        self.backoff_after = backoff_after
+        self.max_backoff = max_backoff
+        self._heap = []
+        self._entries = {}
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def base_interval(self, system):
+        try:
+            interval = float(system.get('check_interval') or self.default_interval)
+        except (TypeError, ValueError):
+            interval = self.default_interval
+        return min(max(interval, self.min_interval), self.max_interval)
+
+    def _push(self, entry, due):
+        entry['due'] = due
+        heapq.heappush(self._heap, (due, next(self._seq), entry['system']['_id']))
+
+    def sync(self, systems, now=None):
+        """Make the queue match ``systems``, keeping the state of known ones.
+
+        Systems with a check in flight keep their current document, since
+        it already reflects the pending result.
+        """
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            seen = set()
+            for system in systems:
+                system_id = system['_id']
+                seen.add(system_id)
+                entry = self._entries.get(system_id)
+                if entry is None:
+                    entry = self._entries[system_id] = {
+                        'system': system, 'failures': 0, 'fast_left': 0, 'in_flight': False
+                    }
+                    self._push(entry, now + random.uniform(0, self.base_interval(system)))
+                elif not entry['in_flight']:
+                    interval_changed = self.base_interval(system) != self.base_interval(entry['system'])
+                    entry['system'] = system
+                    if interval_changed:
+                        self._push(entry, now + random.uniform(0, self.base_interval(system)))
+            for system_id in list(self._entries):
+                if system_id not in seen:
+                    del self._entries[system_id]
+
+    def drop(self, system_id):
+        with self._lock:
+            self._entries.pop(system_id, None)
+
+    def pop_due(self, limit, now=None):
+        """Take up to ``limit`` systems whose check is due, marking them in flight."""
+        now = time.monotonic() if now is None else now
+        due = []
+        with self._lock:
+            while self._heap and len(due) < limit and self._heap[0][0] <= now:
+                when, _, system_id = heapq.heappop(self._heap)
+                entry = self._entries.get(system_id)
+                if entry is None or entry['in_flight'] or entry['due'] != when:
+                    continue  # Dropped or rescheduled since it was queued
+                entry['in_flight'] = True
+                due.append(entry['system'])
+        return due
+
+    def complete(self, system_id, update, now=None):
+        """Record a check result and schedule the next check; returns the delay used."""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            entry = self._entries.get(system_id)
+            if entry is None:
+                return None
+            system = entry['system']
+            status = bool(update.get('status'))
+            if 'status' in system and bool(system['status']) != status:
+                entry['fast_left'] = self.fast_checks
+            entry['failures'] = 0 if status else entry['failures'] + 1
+            system.update(update)
+            entry['in_flight'] = False
+
+            interval = self.base_interval(system)
+            if entry['fast_left']:
+                entry['fast_left'] -= 1
+                interval = max(self.min_interval, interval / 4)
+            elif entry['failures'] > self.backoff_after:
+                backoff = interval * 2 ** min(entry['failures'] - self.backoff_after, 16)
+                interval = max(interval, min(backoff, self.max_backoff))
+            interval *= 1 + random.uniform(-self.jitter, self.jitter)
+            self._push(entry, now + interval)
+            return interval
+
+    def due_count(self, now=None):
+        """Number of checks that are due but not started, visiting only due heap entries."""
+        now = time.monotonic() if now is None else now
+        count = 0
+        with self._lock:
+            stack = [0] if self._heap else []
+            while stack:
+                index = stack.pop()
+                when, _, system_id = self._heap[index]
+                if when > now:
+                    continue  # Children are due even later
+                entry = self._entries.get(system_id)
+                if entry is not None and not entry['in_flight'] and entry['due'] == when:
+                    count += 1
+                stack.extend(child for child in (2 * index + 1, 2 * index + 2) if child < len(self._heap))
+        return count
+
+    def scheduled_after(self, when):
+        """Number of systems not in flight whose next check is due after ``when``.
+
+        When every system was due at ``when``, these are the ones checked since.
+        """
+        with self._lock:
+            return sum(1 for entry in self._entries.values() if not entry['in_flight'] and entry['due'] > when)
+
+    def next_due(self):
+        with self._lock:
+            return self._heap[0][0] if self._heap else None
+
+    def stats(self):
+        """Systems scheduled, checks in flight and the planned check rate per second."""
+        with self._lock:
+            entries = list(self._entries.values())
+        return {
+            'systems': len(entries),
+            'in_flight': sum(1 for entry in entries if entry['in_flight']),
+            'checks_per_second': round(sum(1 / self.base_interval(entry['system']) for entry in entries), 2)
+        }
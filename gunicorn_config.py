@@ -1,4 +1,10 @@
 import multiprocessing
+import os
+import shutil
+import tempfile
+
+# Workers write metrics to files in this directory; /metrics merges them
+os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', os.path.join(tempfile.gettempdir(), 'app-monitor-metrics'))
 
 # Server socket
 bind = "0.0.0.0:5000"
@@ -6,7 +12,12 @@ backlog = 2048
 
 # Worker processes
 workers = multiprocessing.cpu_count() * 2 + 1
-worker_class = 'sync'
+# Threaded workers keep heartbeating while a request streams, so long-running
+# responses such as /api/systems/check_all are not killed by the timeout below.
+# Up to EVENTS_MAX_STREAMS (8) threads per worker hold open event streams; the
+# rest serve every other request.
+worker_class = 'gthread'
+threads = int(os.getenv('GUNICORN_THREADS', 16))
 worker_connections = 1000
 timeout = 30
 keepalive = 2
@@ -15,3 +26,23 @@ keepalive = 2
 accesslog = '-'
 errorlog = '-'
 loglevel = 'info'
+
+def on_starting(server):
+    # Start with empty metric files so counters from a previous run are not merged in
+    metrics_dir = os.environ['PROMETHEUS_MULTIPROC_DIR']
+    shutil.rmtree(metrics_dir, ignore_errors=True)
+    os.makedirs(metrics_dir)
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
+
+# Every worker runs the probe scheduler; MongoDB leases make sure each system
+# is probed by only one of them (see PROBE_SHARDS and LEASE_TTL)
+def post_worker_init(worker):
+    from app import start_background_tasks
+    start_background_tasks()
+
+def worker_exit(server, worker):
+    from app import stop_background_tasks
+    stop_background_tasks()
@@ -0,0 +1,68 @@
+import threading
+import time
+from http.cookiejar import CookieJar, DefaultCookiePolicy
+
+import requests
+import urllib3
+from requests.adapters import HTTPAdapter
+
+# Probes deliberately skip certificate verification to handle self-signed certs
+urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+
+
+class ProbeHTTPClient:
+    """Shared HTTP client for probes with per-host keep-alive connection pools.
+
+    One ``requests.Session`` is shared by every probe thread. Cookies are never
+    stored, so concurrent probes cannot leak state into each other through the
+    session, and ``pool_block`` caps the number of connections per host.
+    """
+
+    def __init__(self, pool_connections=100, pool_maxsize=10, pool_block=True, timeout=10):
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.cookies = CookieJar(policy=DefaultCookiePolicy(allowed_domains=[]))
+        self.session.headers['User-Agent'] = 'app-monitor-probe'
+        adapter = HTTPAdapter(pool_connections=pool_connections,
+                              pool_maxsize=pool_maxsize,
+                              pool_block=pool_block,
+                              max_retries=0)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.adapter = adapter
+
+        self._lock = threading.Lock()
+        self._requests = 0
+        self._latency_total = 0.0
+
+    def get(self, url, timeout=None, **kwargs):
+        """GET ``url`` over a pooled connection, recording the request latency."""
+        started = time.monotonic()
+        try:
+            response = self.session.get(url, timeout=timeout or self.timeout, **kwargs)
+        finally:
+            latency = (time.monotonic() - started) * 1000
+            with self._lock:
+                self._requests += 1
+                self._latency_total += latency
+        response.latency = latency
+        return response
+
+    def stats(self):
+        """Return request count, connections opened and average latency in ms."""
+        opened = 0
+        pools = self.adapter.poolmanager.pools
+        for key in pools.keys():
+            pool = pools.get(key)
+            # Pools evicted from the manager since keys() was read are skipped
+            if pool is not None:
+                opened += pool.num_connections
+        with self._lock:
+            requests_made = self._requests
+            average = self._latency_total / requests_made if requests_made else 0.0
+        return {
+            'requests': requests_made,
+            'connections_opened': opened,
+            'connections_reused': max(0, requests_made - opened),
+            'average_latency_ms': round(average, 1)
+        }
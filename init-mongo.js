@@ -5,7 +5,22 @@ db = db.getSiblingDB('app_monitor');
 db.createCollection('systems');
 
 // Create indexes
+// Filter/sort indexes for GET /api/systems; the trailing _id keeps keyset
+// pagination on (field, _id) index-backed
 db.systems.createIndex({ "name": 1 }, { unique: true });
+db.systems.createIndex({ "app_name": 1, "_id": 1 });
+db.systems.createIndex({ "owner": 1, "_id": 1 });
+db.systems.createIndex({ "status": 1, "_id": 1 });
+db.systems.createIndex({ "sequence_status": 1, "_id": 1 });
+db.systems.createIndex({ "created_at": 1, "_id": 1 });
+db.systems.createIndex({ "last_check": 1, "_id": 1 });
+db.systems.createIndex({ "updated_at": 1, "_id": 1 });
+// Systems reserved by a running shutdown sequence
+db.systems.createIndex({ "sequence_run": 1 }, { sparse: true });
+
+// Deleted system ids for delta listings (GET /api/systems?since=...), kept
+// for TOMBSTONE_RETENTION_DAYS (7 by default; the app adjusts it on startup)
+db.system_tombstones.createIndex({ "deleted_at": 1 }, { expireAfterSeconds: 7 * 24 * 3600 });
 
 // Insert some initial test data
 const initialSystems = [
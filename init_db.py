@@ -2,6 +2,7 @@
 from pymongo import MongoClient
 from datetime import datetime
 import argparse
+import os
 import sys
 
 def init_database(mongo_uri, drop_existing=False):
@@ -24,6 +25,12 @@ def init_database(mongo_uri, drop_existing=False):
         # Create indexes
         db.systems.create_index("name", unique=True)
         print("Created index on name field")
+        for field in ["app_name", "owner", "status", "sequence_status", "created_at", "last_check", "updated_at"]:
+            db.systems.create_index([(field, 1), ("_id", 1)])
+        print("Created filter and sort indexes")
+        retention_days = int(os.getenv("TOMBSTONE_RETENTION_DAYS", 7))
+        db.system_tombstones.create_index("deleted_at", expireAfterSeconds=retention_days * 24 * 3600)
+        print("Created tombstone expiry index")
 
         # Insert initial test data if collection is empty
         if db.systems.count_documents({}) == 0:
@@ -0,0 +1,107 @@
+import logging
+import math
+import os
+import socket
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+log = logging.getLogger(__name__)
+
+
+class LeaseManager:
+    """Hold a fair share of named leases stored in MongoDB.
+
+    Every process in ``group`` registers itself as a member and claims at most
+    ``ceil(leases / live members)`` of the leases, so work spreads out as
+    processes join and is picked up again within ``ttl`` seconds when one
+    dies. A lease is only used while it is known to be held: ``holds()``
+    goes false locally before the lease can expire in MongoDB. Expiry times
+    come from each host's clock, so hosts should run NTP.
+    """
+
+    def __init__(self, collection, group, names, ttl=30, owner=None):
+        self.collection = collection
+        self.group = group
+        self.names = list(names)
+        self.ttl = ttl
+        self.owner = owner or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._held = {}
+        self._lock = threading.Lock()
+
+    def holds(self, name):
+        with self._lock:
+            valid_until = self._held.get(name)
+        return valid_until is not None and valid_until > time.monotonic()
+
+    def held(self):
+        return [name for name in self.names if self.holds(name)]
+
+    def tick(self):
+        """Renew held leases, release any above our share and claim free ones up to it."""
+        now = datetime.utcnow()
+        expires_at = now + timedelta(seconds=self.ttl)
+        self.collection.update_one(
+            {'_id': f"member:{self.group}:{self.owner}"},
+            {'$set': {'kind': 'member', 'group': self.group, 'expires_at': expires_at}},
+            upsert=True
+        )
+        # Forget members that died without releasing anything
+        self.collection.delete_many({'kind': 'member', 'group': self.group,
+                                     'expires_at': {'$lt': now - timedelta(seconds=self.ttl * 10)}})
+        members = self.collection.count_documents(
+            {'kind': 'member', 'group': self.group, 'expires_at': {'$gt': now}})
+        share = math.ceil(len(self.names) / max(1, members))
+
+        held = [name for name in self.names
+                if name in self._held and self._claim(name, now, expires_at)]
+        for name in held[share:]:
+            self.release(name)
+        for name in self.names:
+            if len(self.held()) >= share:
+                break
+            if name not in self._held:
+                self._claim(name, now, expires_at)
+
+    def _claim(self, name, now, expires_at):
+        started = time.monotonic()
+        try:
+            self.collection.find_one_and_update(
+                {'_id': name, '$or': [{'owner': self.owner}, {'expires_at': {'$lte': now}}]},
+                {'$set': {'kind': 'lease', 'group': self.group, 'owner': self.owner,
+                          'expires_at': expires_at}},
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            )
+        except DuplicateKeyError:
+            # Held by another live process
+            with self._lock:
+                self._held.pop(name, None)
+            return False
+        with self._lock:
+            # Stop relying on the lease a little before it can expire for others
+            self._held[name] = started + self.ttl * 0.8
+        return True
+
+    def release(self, name):
+        with self._lock:
+            self._held.pop(name, None)
+        self.collection.delete_one({'_id': name, 'owner': self.owner})
+
+    def release_all(self):
+        for name in list(self._held):
+            self.release(name)
+        self.collection.delete_one({'_id': f"member:{self.group}:{self.owner}"})
+
+    def run(self):
+        """Keep the leases renewed; meant for a daemon thread."""
+        while True:
+            try:
+                self.tick()
+            except Exception:
+                log.exception("Error renewing %s leases", self.group)
+            time.sleep(self.ttl / 3)
@@ -0,0 +1,125 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+
+# Attributes every LogRecord has; anything else came in through ``extra=``
+STANDARD_ATTRS = set(vars(logging.makeLogRecord({}))) | {'message', 'asctime'}
+
+_listener = None
+
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per line, including fields passed with ``extra=``."""
+
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'thread': record.threadName,
+            'message': record.getMessage()
+        }
+        for key, value in vars(record).items():
+            if key not in STANDARD_ATTRS and not key.startswith('_'):
+                entry[key] = value
+        if record.exc_info:
+            entry['exc_info'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class RateLimitFilter(logging.Filter):
+    """Let at most ``limit`` records through per message template and logger every ``window`` seconds.
+
+    Records are grouped by their unformatted message, so per-row and
+    per-probe messages that differ only in their arguments share a budget.
+    The first record after a window notes how many were suppressed. Records
+    at ``max_level`` or above are never dropped.
+    """
+
+    def __init__(self, limit=10, window=60, max_level=logging.WARNING):
+        super().__init__()
+        self.limit = limit
+        self.window = window
+        self.max_level = max_level
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        if self.limit <= 0 or record.levelno >= self.max_level:
+            return True
+        key = (record.name, record.msg if isinstance(record.msg, str) else type(record.msg))
+        now = time.monotonic()
+        with self._lock:
+            started, count, suppressed = self._counts.get(key, (now, 0, 0))
+            if now - started >= self.window:
+                started, count = now, 0
+            if count >= self.limit:
+                self._counts[key] = (started, count, suppressed + 1)
+                return False
+            self._counts[key] = (started, count + 1, 0)
+        if suppressed:
+            record.suppressed = suppressed
+        return True
+
+
+class TextFormatter(logging.Formatter):
+    def format(self, record):
+        text = super().format(record)
+        suppressed = getattr(record, 'suppressed', 0)
+        return f"{text} ({suppressed} similar messages suppressed)" if suppressed else text
+
+
+def parse_levels(spec):
+    """Parse 'module=LEVEL,other=LEVEL' into {logger name: level}."""
+    levels = {}
+    for item in (spec or '').split(','):
+        if '=' in item:
+            name, level = item.split('=', 1)
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def configure(level=None, levels=None, log_format=None, rate_limit=None, rate_window=None):
+    """Send all logging through a queue to one background writer thread.
+
+    Logging calls only put the record on a queue, so slow stdout/stderr
+    never blocks request or probe threads. Settings default to LOG_LEVEL,
+    LOG_LEVELS, LOG_FORMAT, LOG_RATE_LIMIT and LOG_RATE_WINDOW. Calling it
+    again has no effect.
+    """
+    global _listener
+    if _listener is not None:
+        return
+
+    level = level or os.getenv('LOG_LEVEL', 'INFO').upper()
+    levels = levels if levels is not None else parse_levels(os.getenv('LOG_LEVELS'))
+    log_format = log_format or os.getenv('LOG_FORMAT', 'text').lower()
+    rate_limit = rate_limit if rate_limit is not None else int(os.getenv('LOG_RATE_LIMIT', 10))
+    rate_window = rate_window if rate_window is not None else float(os.getenv('LOG_RATE_WINDOW', 60))
+
+    output = logging.StreamHandler(sys.stdout)
+    if log_format == 'json':
+        output.setFormatter(JSONFormatter())
+    else:
+        output.setFormatter(TextFormatter('%(asctime)s %(levelname)s [%(name)s] %(message)s'))
+
+    records = queue.SimpleQueue()
+    handler = logging.handlers.QueueHandler(records)
+    handler.addFilter(RateLimitFilter(rate_limit, rate_window))
+
+    root = logging.getLogger()
+    root.setLevel(level)
+    root.addHandler(handler)
+    for name, logger_level in levels.items():
+        logging.getLogger(name).setLevel(logger_level)
+
+    _listener = logging.handlers.QueueListener(records, output, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
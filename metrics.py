@@ -0,0 +1,121 @@
+import os
+import threading
+import time
+
+from prometheus_client import (CollectorRegistry, Counter, Gauge, Histogram,
+                               CONTENT_TYPE_LATEST, REGISTRY, generate_latest)
+from prometheus_client import multiprocess
+from pymongo import monitoring
+
+# Set by gunicorn_config.py so every worker writes its samples to shared files
+MULTIPROCESS = bool(os.getenv('PROMETHEUS_MULTIPROC_DIR'))
+
+LATENCY_BUCKETS = (.001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10, 30)
+
+PROBE_LATENCY = Histogram('monitor_probe_latency_seconds',
+                          'Latency of successful probe checks', ['check'], buckets=LATENCY_BUCKETS)
+PROBE_CHECKS = Counter('monitor_probe_checks_total', 'Probe checks run', ['check', 'result'])
+SWEEP_DURATION = Histogram('monitor_check_all_duration_seconds', 'Duration of check_all sweeps',
+                           buckets=(1, 5, 10, 30, 60, 120, 300, 600, 1800))
+SCHEDULER_PASS_DURATION = Histogram('monitor_scheduler_pass_duration_seconds',
+                                    'Time the background scheduler takes to check every scheduled system once',
+                                    buckets=(1, 5, 10, 30, 60, 120, 300, 600, 1800))
+PROBE_QUEUE_DEPTH = Gauge('monitor_probe_queue_depth', 'Scheduled checks that are due but not started',
+                          multiprocess_mode='livesum')
+PROBES_IN_FLIGHT = Gauge('monitor_probes_in_flight', 'Scheduled checks currently running',
+                         multiprocess_mode='livesum')
+SCHEDULED_SYSTEMS = Gauge('monitor_scheduled_systems', 'Systems in the probe schedule',
+                          multiprocess_mode='livesum')
+MONGO_LATENCY = Histogram('monitor_mongo_operation_seconds', 'MongoDB command latency',
+                          ['route', 'command'], buckets=LATENCY_BUCKETS)
+REQUEST_LATENCY = Histogram('monitor_http_request_duration_seconds', 'API request latency',
+                            ['route', 'method', 'status'], buckets=LATENCY_BUCKETS)
+IMPORT_ROWS = Counter('monitor_import_rows_total', 'CSV rows imported', ['source'])
+IMPORT_RATE = Gauge('monitor_import_rows_per_second', 'Rows per second of the last CSV import',
+                    ['source'], multiprocess_mode='mostrecent')
+
+# Label MongoDB commands with the route (or background task) of the calling thread
+_context = threading.local()
+
+
+def set_route(route):
+    _context.route = route
+
+
+def observe_probe(check, success, latency=None):
+    """Count a check and record its latency (milliseconds, as stored in probe history)."""
+    PROBE_CHECKS.labels(check, 'success' if success else 'failure').inc()
+    if success and latency is not None:
+        PROBE_LATENCY.labels(check).observe(latency / 1000)
+
+
+def observe_import(source, rows, seconds):
+    IMPORT_ROWS.labels(source).inc(rows)
+    if seconds > 0:
+        IMPORT_RATE.labels(source).set(rows / seconds)
+
+
+def observe_scheduler(queue_depth, in_flight, systems):
+    PROBE_QUEUE_DEPTH.set(queue_depth)
+    PROBES_IN_FLIGHT.set(in_flight)
+    SCHEDULED_SYSTEMS.set(systems)
+
+
+def observe_scheduler_pass(checks, systems, seconds):
+    """Record how long a full pass over ``systems`` takes at the rate of ``checks`` in ``seconds``.
+
+    The scheduler has no sweeps to time, so this is its counterpart of
+    SWEEP_DURATION, measured over each report window.
+    """
+    if checks and systems:
+        SCHEDULER_PASS_DURATION.observe(seconds * systems / checks)
+
+
+class MongoCommandTimer(monitoring.CommandListener):
+    """Record the latency of every MongoDB command, labeled by route."""
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        MONGO_LATENCY.labels(getattr(_context, 'route', 'background'),
+                             event.command_name).observe(event.duration_micros / 1e6)
+
+    def failed(self, event):
+        MONGO_LATENCY.labels(getattr(_context, 'route', 'background'),
+                             event.command_name).observe(event.duration_micros / 1e6)
+
+
+def init_app(app):
+    """Time every request by its URL rule and label MongoDB commands it runs."""
+    from flask import g, request
+
+    @app.before_request
+    def start_timer():
+        g.metrics_started = time.perf_counter()
+        set_route(request.url_rule.rule if request.url_rule else 'unmatched')
+
+    @app.after_request
+    def keep_status(response):
+        g.metrics_status = response.status_code
+        return response
+
+    @app.teardown_request
+    def stop_timer(error=None):
+        # Runs after streamed responses finish, so their full duration is counted
+        started = g.pop('metrics_started', None)
+        if started is None:
+            return
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        status = 500 if error is not None else g.pop('metrics_status', 500)
+        REQUEST_LATENCY.labels(route, request.method, str(status)).observe(time.perf_counter() - started)
+
+
+def exposition():
+    """Return (body, content type) for /metrics, merging all workers when multiprocess."""
+    if MULTIPROCESS:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
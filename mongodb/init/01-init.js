@@ -57,6 +57,17 @@ db.createCollection('systems', {
                     },
                     description: "Shutdown sequence commands"
                 },
+                shutdown_after: {
+                    bsonType: "array",
+                    items: {
+                        bsonType: "string"
+                    },
+                    description: "Names of systems that must finish shutting down first"
+                },
+                sequence_progress: {
+                    bsonType: "object",
+                    description: "Progress of the last shutdown run"
+                },
                 cluster_nodes: {
                     bsonType: "array",
                     items: {
@@ -90,6 +101,10 @@ db.createCollection('systems', {
                             ping_error: {
                                 bsonType: "string",
                                 description: "Ping check error message"
+                            },
+                            http_endpoint: {
+                                bsonType: ["object", "null"],
+                                description: "Learned HTTP scheme, port and final URL"
                             }
                         }
                     },
@@ -108,7 +123,7 @@ db.createCollection('systems', {
                     description: "Overall system status"
                 },
                 sequence_status: {
-                    enum: ["not_started", "in_progress", "completed"],
+                    enum: ["not_started", "in_progress", "completed", "failed"],
                     description: "Sequence status"
                 },
                 http_status: {
@@ -127,6 +142,14 @@ db.createCollection('systems', {
                     bsonType: "string",
                     description: "Ping check error"
                 },
+                http_endpoint: {
+                    bsonType: ["object", "null"],
+                    description: "Learned HTTP scheme, port and final URL"
+                },
+                check_interval: {
+                    bsonType: ["int", "null"],
+                    description: "Seconds between checks; null uses STATUS_INTERVAL"
+                },
                 db_status: {
                     bsonType: "bool",
                     description: "Database check status"
@@ -143,12 +166,22 @@ db.createCollection('systems', {
 });
 
 // Create indexes
+// Filter/sort indexes for GET /api/systems; the trailing _id keeps keyset
+// pagination on (field, _id) index-backed
 db.systems.createIndex({ "name": 1 }, { unique: true });
-db.systems.createIndex({ "app_name": 1 });
-db.systems.createIndex({ "status": 1 });
-db.systems.createIndex({ "sequence_status": 1 });
-db.systems.createIndex({ "created_at": 1 });
-db.systems.createIndex({ "last_check": 1 });
+db.systems.createIndex({ "app_name": 1, "_id": 1 });
+db.systems.createIndex({ "owner": 1, "_id": 1 });
+db.systems.createIndex({ "status": 1, "_id": 1 });
+db.systems.createIndex({ "sequence_status": 1, "_id": 1 });
+db.systems.createIndex({ "created_at": 1, "_id": 1 });
+db.systems.createIndex({ "last_check": 1, "_id": 1 });
+db.systems.createIndex({ "updated_at": 1, "_id": 1 });
+// Systems reserved by a running shutdown sequence
+db.systems.createIndex({ "sequence_run": 1 }, { sparse: true });
+
+// Deleted system ids for delta listings (GET /api/systems?since=...), kept
+// for TOMBSTONE_RETENTION_DAYS (7 by default)
+db.system_tombstones.createIndex({ "deleted_at": 1 }, { expireAfterSeconds: 7 * 24 * 3600 });
 
 // Insert sample data
 db.systems.insertMany([
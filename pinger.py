@@ -0,0 +1,171 @@
+import os
+import socket
+import struct
+import threading
+import time
+
+ICMP_ECHO_REQUEST = 8
+ICMP_ECHO_REPLY = 0
+
+
+class PingerUnavailable(OSError):
+    """Raised when no ICMP socket can be opened (no CAP_NET_RAW and no ping socket)."""
+
+
+def checksum(data):
+    if len(data) % 2:
+        data += b'\x00'
+    total = sum(struct.unpack(f'!{len(data) // 2}H', data))
+    total = (total >> 16) + (total & 0xffff)
+    total += total >> 16
+    return ~total & 0xffff
+
+
+class _Batch:
+    def __init__(self, expected):
+        self.remaining = expected
+        self.done = threading.Event()
+        if expected == 0:
+            self.done.set()
+
+    def reply(self):
+        self.remaining -= 1
+        if self.remaining <= 0:
+            self.done.set()
+
+
+class BatchPinger:
+    """Send ICMP echo requests to many hosts over one shared socket.
+
+    Replies are matched to requests by identifier and sequence number on a
+    single receiver thread, so any number of callers (and any number of hosts
+    per call) share the same socket instead of forking a process per target.
+    """
+
+    def __init__(self, timeout=2, payload_size=16):
+        self.timeout = timeout
+        self.payload = b'\x00' * payload_size
+        self.sock = None
+        self.raw = False
+        self.ident = os.getpid() & 0xffff
+        self._seq = 0
+        self._pending = {}
+        self._lock = threading.Lock()
+        self.unavailable = None
+        self.fallback_logged = False
+
+    def _open(self):
+        with self._lock:
+            if self.sock is not None:
+                return
+            if self.unavailable is not None:
+                raise self.unavailable
+            try:
+                sock = socket.socket(socket.AF_INET, socket.SOCK_RAW, socket.IPPROTO_ICMP)
+                self.raw = True
+            except PermissionError:
+                try:
+                    # Unprivileged ping socket, see net.ipv4.ping_group_range
+                    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_ICMP)
+                    self.raw = False
+                    self.ident = sock.getsockname()[1] & 0xffff
+                except OSError as e:
+                    self.unavailable = PingerUnavailable(f"Cannot open ICMP socket: {str(e)}")
+                    raise self.unavailable
+            self.sock = sock
+            receiver = threading.Thread(target=self._receive, name='pinger-receiver')
+            receiver.daemon = True
+            receiver.start()
+
+    def _next_seq(self):
+        self._seq = (self._seq + 1) & 0xffff
+        return self._seq
+
+    def _packet(self, seq):
+        header = struct.pack('!BBHHH', ICMP_ECHO_REQUEST, 0, 0, self.ident, seq)
+        csum = checksum(header + self.payload)
+        return struct.pack('!BBHHH', ICMP_ECHO_REQUEST, 0, csum, self.ident, seq) + self.payload
+
+    def _receive(self):
+        while True:
+            try:
+                data, addr = self.sock.recvfrom(2048)
+            except OSError:
+                time.sleep(0.1)
+                continue
+            received_at = time.monotonic()
+
+            # Raw sockets include the IP header, ping sockets do not
+            offset = (data[0] & 0x0f) * 4 if self.raw else 0
+            if len(data) < offset + 8:
+                continue
+            icmp_type, _, _, ident, seq = struct.unpack('!BBHHH', data[offset:offset + 8])
+            if icmp_type != ICMP_ECHO_REPLY or (self.raw and ident != self.ident):
+                continue
+
+            with self._lock:
+                request = self._pending.get(seq)
+                if not request or request['ip'] != addr[0] or 'rtt' in request:
+                    continue
+                request['rtt'] = (received_at - request['sent_at']) * 1000
+                request['batch'].reply()
+
+    def ping_many(self, hosts, count=1, timeout=None):
+        """Ping every host and return {host: {success, rtt, loss, message}}.
+
+        ``rtt`` is the average round trip time in milliseconds of the replies
+        received, ``loss`` the fraction of the ``count`` requests that got none.
+        """
+        self._open()
+        timeout = self.timeout if timeout is None else timeout
+        results = {}
+        targets = {}
+
+        for host in dict.fromkeys(hosts):
+            try:
+                targets[host] = socket.gethostbyname(host)
+            except (socket.gaierror, UnicodeError):
+                results[host] = {'success': False, 'rtt': None, 'loss': 1.0,
+                                 'message': "DNS resolution failed"}
+
+        batch = _Batch(len(targets) * count)
+        requests_by_host = {host: [] for host in targets}
+        with self._lock:
+            for _ in range(count):
+                for host, ip in targets.items():
+                    seq = self._next_seq()
+                    request = {'ip': ip, 'batch': batch, 'sent_at': time.monotonic()}
+                    self._pending[seq] = request
+                    requests_by_host[host].append((seq, request))
+                    try:
+                        self.sock.sendto(self._packet(seq), (ip, 0))
+                    except OSError as e:
+                        request['error'] = str(e)
+                        batch.reply()
+
+        batch.done.wait(timeout)
+
+        with self._lock:
+            for host, sent in requests_by_host.items():
+                rtts = []
+                error = None
+                for seq, request in sent:
+                    if self._pending.get(seq) is request:
+                        del self._pending[seq]
+                    if 'rtt' in request:
+                        rtts.append(request['rtt'])
+                    error = request.get('error', error)
+
+                if rtts:
+                    rtt = sum(rtts) / len(rtts)
+                    results[host] = {'success': True, 'rtt': rtt,
+                                     'loss': 1 - len(rtts) / count,
+                                     'message': f"Response time: {rtt:.1f}ms"}
+                else:
+                    results[host] = {'success': False, 'rtt': None, 'loss': 1.0,
+                                     'message': f"Ping failed: {error}" if error else "Host not responding to ping"}
+
+        return results
+
+    def ping(self, host, timeout=None):
+        return self.ping_many([host], timeout=timeout)[host]
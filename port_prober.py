@@ -0,0 +1,170 @@
+import errno
+import re
+import selectors
+import socket
+import threading
+import time
+
+# Services commonly found on database ports, used when no banner identifies them
+KNOWN_PORTS = {
+    1433: 'mssql',
+    1521: 'oracle',
+    3306: 'mysql',
+    5432: 'postgresql',
+    6379: 'redis',
+    9042: 'cassandra',
+    9200: 'elasticsearch',
+    27017: 'mongodb'
+}
+
+
+def identify_service(port, banner):
+    """Guess the service behind a port from its greeting banner."""
+    if banner:
+        # MySQL/MariaDB handshake: 4 byte header, protocol 10, NUL-terminated version
+        if len(banner) > 5 and banner[4] == 0x0a:
+            version = banner[5:].split(b'\x00', 1)[0].decode('ascii', 'replace')
+            return f"mysql {version}" if version else 'mysql'
+        text = banner.decode('ascii', 'replace').strip()
+        match = re.match(r'[\w.\-]+ ?[\w.\-/]*', text)
+        if match:
+            return match.group(0)[:60]
+    return KNOWN_PORTS.get(port, 'unknown')
+
+
+class PortProber:
+    """Check many (host, port) pairs at once with non-blocking connects.
+
+    Every connect gets its own deadline, so a batch of targets finishes within
+    one timeout window. Optional service fingerprints (read from the greeting
+    banner) are cached per target for ``fingerprint_ttl`` seconds.
+    """
+
+    def __init__(self, timeout=2, banner_timeout=0.5, fingerprint_ttl=3600, max_sockets=512):
+        self.timeout = timeout
+        self.banner_timeout = banner_timeout
+        self.fingerprint_ttl = fingerprint_ttl
+        self.max_sockets = max_sockets
+        self._fingerprints = {}
+        self._lock = threading.Lock()
+
+    def _cached_service(self, target):
+        with self._lock:
+            cached = self._fingerprints.get(target)
+        if cached and cached[1] > time.monotonic():
+            return cached[0]
+        return None
+
+    def _cache_service(self, target, service):
+        with self._lock:
+            self._fingerprints[target] = (service, time.monotonic() + self.fingerprint_ttl)
+
+    def probe_many(self, targets, timeout=None, fingerprint=False):
+        """Probe every (host, port) pair and return {(host, port): result}."""
+        timeout = self.timeout if timeout is None else timeout
+        targets = list(dict.fromkeys((host, int(port)) for host, port in targets))
+        results = {}
+        for start in range(0, len(targets), self.max_sockets):
+            results.update(self._probe_chunk(targets[start:start + self.max_sockets],
+                                             timeout, fingerprint))
+        return results
+
+    def probe(self, host, port, timeout=None, fingerprint=False):
+        return self.probe_many([(host, port)], timeout=timeout, fingerprint=fingerprint)[(host, int(port))]
+
+    def _probe_chunk(self, targets, timeout, fingerprint):
+        results = {}
+        selector = selectors.DefaultSelector()
+        pending = {}
+
+        for target in targets:
+            host, port = target
+            try:
+                family, kind, proto, _, address = socket.getaddrinfo(
+                    host, port, type=socket.SOCK_STREAM)[0]
+            except (socket.gaierror, UnicodeError):
+                results[target] = self._result(False, "DNS resolution failed")
+                continue
+
+            sock = socket.socket(family, kind, proto)
+            sock.setblocking(False)
+            started = time.monotonic()
+            code = sock.connect_ex(address)
+            if code not in (0, errno.EINPROGRESS, errno.EWOULDBLOCK):
+                sock.close()
+                results[target] = self._result(False, f"Port {port} is closed ({errno.errorcode.get(code, code)})")
+                continue
+
+            pending[sock] = {'target': target, 'started': started,
+                             'deadline': started + timeout, 'connected': None}
+            selector.register(sock, selectors.EVENT_WRITE)
+
+        while pending:
+            now = time.monotonic()
+            next_deadline = min(state['deadline'] for state in pending.values())
+            for key, _ in selector.select(max(0, next_deadline - now)):
+                sock = key.fileobj
+                state = pending[sock]
+                port = state['target'][1]
+
+                if state['connected'] is None:
+                    code = sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+                    if code != 0:
+                        self._finish(selector, pending, sock)
+                        results[state['target']] = self._result(
+                            False, f"Port {port} is closed ({errno.errorcode.get(code, code)})")
+                        continue
+
+                    state['connected'] = (time.monotonic() - state['started']) * 1000
+                    service = self._cached_service(state['target']) if fingerprint else None
+                    if not fingerprint or service:
+                        self._finish(selector, pending, sock)
+                        results[state['target']] = self._open_result(port, state['connected'], service)
+                        continue
+
+                    # Wait briefly for a greeting banner to fingerprint the service
+                    state['deadline'] = time.monotonic() + self.banner_timeout
+                    selector.modify(sock, selectors.EVENT_READ)
+                else:
+                    try:
+                        banner = sock.recv(256)
+                    except OSError:
+                        banner = b''
+                    self._finish(selector, pending, sock)
+                    service = identify_service(port, banner)
+                    self._cache_service(state['target'], service)
+                    results[state['target']] = self._open_result(port, state['connected'], service)
+
+            # Expire anything past its deadline
+            now = time.monotonic()
+            for sock, state in list(pending.items()):
+                if state['deadline'] > now:
+                    continue
+                port = state['target'][1]
+                self._finish(selector, pending, sock)
+                if state['connected'] is None:
+                    results[state['target']] = self._result(
+                        False, f"Port {port} is closed (no response within {timeout}s)")
+                else:
+                    # Connected but silent (e.g. PostgreSQL waits for the client)
+                    service = identify_service(port, b'')
+                    self._cache_service(state['target'], service)
+                    results[state['target']] = self._open_result(port, state['connected'], service)
+
+        selector.close()
+        return results
+
+    @staticmethod
+    def _finish(selector, pending, sock):
+        selector.unregister(sock)
+        del pending[sock]
+        sock.close()
+
+    @staticmethod
+    def _result(success, message, connect_time=None, service=None):
+        return {'success': success, 'message': message,
+                'connect_time': connect_time, 'service': service}
+
+    def _open_result(self, port, connect_time, service):
+        message = f"Port {port} is open ({service})" if service else f"Port {port} is open"
+        return self._result(True, message, connect_time, service)
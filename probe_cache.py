@@ -0,0 +1,76 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class ProbeCache:
+    """Short-lived cache of probe results with single-flight coalescing.
+
+    ``get(key, probe)`` returns a cached result younger than ``ttl`` seconds,
+    waits for the probe already running for ``key`` if there is one, and
+    otherwise runs ``probe()`` itself. Errors are shared with the waiting
+    callers but not cached. At most ``max_entries`` results are kept.
+    """
+
+    def __init__(self, ttl=10, max_entries=10000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self._entries = OrderedDict()
+        self._in_flight = {}
+        self._lock = threading.Lock()
+
+    def get(self, key, probe):
+        """Return (result, fresh); ``fresh`` is True only for the caller that ran the probe."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] > time.monotonic():
+                self.hits += 1
+                return entry[0], False
+            flight = self._in_flight.get(key)
+            if flight is None:
+                flight = self._in_flight[key] = {'done': threading.Event(), 'result': None, 'error': None}
+                self.misses += 1
+                leader = True
+            else:
+                self.coalesced += 1
+                leader = False
+
+        if not leader:
+            flight['done'].wait()
+            if flight['error'] is not None:
+                raise flight['error']
+            return flight['result'], False
+
+        try:
+            flight['result'] = probe()
+        except Exception as e:
+            flight['error'] = e
+            raise
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+                if flight['error'] is None and self.ttl > 0:
+                    now = time.monotonic()
+                    self._entries[key] = (flight['result'], now + self.ttl)
+                    self._entries.move_to_end(key)
+                    # Entries are in expiry order: drop expired ones, then the oldest over the limit
+                    while self._entries and (next(iter(self._entries.values()))[1] <= now
+                                             or len(self._entries) > self.max_entries):
+                        self._entries.popitem(last=False)
+            flight['done'].set()
+        return flight['result'], True
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses + self.coalesced
+            return {
+                'entries': len(self._entries),
+                'in_flight': len(self._in_flight),
+                'hits': self.hits,
+                'misses': self.misses,
+                'coalesced': self.coalesced,
+                'hit_ratio': round((self.hits + self.coalesced) / lookups, 4) if lookups else None
+            }
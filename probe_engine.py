@@ -0,0 +1,73 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+
+class ProbeEngine:
+    """Run probe functions over many systems with bounded concurrency."""
+
+    def __init__(self, concurrency=50):
+        self.concurrency = max(1, int(concurrency))
+        self.executor = ThreadPoolExecutor(max_workers=self.concurrency,
+                                           thread_name_prefix='probe')
+        self.in_flight = 0
+        self._lock = threading.Lock()
+
+    def imap(self, probe, items):
+        """Yield (item, result, error) tuples as each probe finishes.
+
+        At most ``concurrency`` probes are in flight at once, so a Mongo cursor
+        can be passed straight in without loading the whole fleet in memory.
+        They count towards ``in_flight`` like submitted probes, so the
+        scheduler leaves the executor to a running sweep.
+        """
+        pending = {}
+        items = iter(items)
+        exhausted = False
+
+        while pending or not exhausted:
+            while not exhausted and len(pending) < self.concurrency:
+                try:
+                    item = next(items)
+                except StopIteration:
+                    exhausted = True
+                    break
+                with self._lock:
+                    self.in_flight += 1
+                future = self.executor.submit(probe, item)
+                future.add_done_callback(self._finished)
+                pending[future] = item
+
+            if not pending:
+                break
+
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                item = pending.pop(future)
+                try:
+                    yield item, future.result(), None
+                except Exception as e:
+                    yield item, None, e
+
+    def _finished(self, future):
+        with self._lock:
+            self.in_flight -= 1
+
+    def available(self):
+        """Number of probes that can be submitted without queueing."""
+        with self._lock:
+            return self.concurrency - self.in_flight
+
+    def submit(self, probe, item, on_result):
+        """Run one probe in the pool and call ``on_result(item, result, error)`` when it finishes."""
+        with self._lock:
+            self.in_flight += 1
+
+        def done(future):
+            self._finished(future)
+            try:
+                result, error = future.result(), None
+            except Exception as e:
+                result, error = None, e
+            on_result(item, result, error)
+
+        self.executor.submit(probe, item).add_done_callback(done)
@@ -0,0 +1,153 @@
+import threading
+from datetime import datetime, timedelta
+
+from pymongo.errors import CollectionInvalid
+
+from bulk_writer import BulkWriter
+
+# Resolutions a series can be read at: raw samples per minute, hourly and daily rollups
+RESOLUTIONS = ['1m', '1h', '1d']
+
+
+def rollup_stages(unit):
+    """Group samples or finer rollups into buckets of one ``unit`` per system, node and check."""
+    return [
+        {'$group': {
+            '_id': {
+                'system_id': '$meta.system_id',
+                'node': '$meta.node',
+                'check': '$meta.check',
+                'ts': {'$dateTrunc': {'date': '$ts', 'unit': unit}}
+            },
+            'count': {'$sum': '$count'},
+            'successes': {'$sum': '$successes'},
+            'latency_sum': {'$sum': '$latency_sum'},
+            'latency_count': {'$sum': '$latency_count'},
+            'latency_min': {'$min': '$latency_min'},
+            'latency_max': {'$max': '$latency_max'}
+        }},
+        {'$set': {
+            'ts': '$_id.ts',
+            'meta': {'system_id': '$_id.system_id', 'node': '$_id.node', 'check': '$_id.check'}
+        }}
+    ]
+
+
+# Raw samples reshaped like rollup documents so every tier shares rollup_stages()
+SAMPLE_FIELDS = {
+    '$set': {
+        'count': {'$literal': 1},
+        'successes': {'$cond': ['$success', 1, 0]},
+        'latency_sum': {'$ifNull': ['$latency', 0]},
+        'latency_count': {'$cond': [{'$gt': ['$latency', None]}, 1, 0]},
+        'latency_min': '$latency',
+        'latency_max': '$latency'
+    }
+}
+
+
+def point(bucket):
+    """Format a rollup bucket as a series point."""
+    count = bucket.get('count') or 0
+    latency_count = bucket.get('latency_count') or 0
+    return {
+        'ts': bucket['ts'].isoformat(),
+        'check': bucket['meta']['check'],
+        'count': count,
+        'availability': round(bucket.get('successes', 0) / count, 4) if count else None,
+        'latency_avg': round(bucket['latency_sum'] / latency_count, 2) if latency_count else None,
+        'latency_min': bucket.get('latency_min'),
+        'latency_max': bucket.get('latency_max')
+    }
+
+
+class ProbeHistory:
+    """Probe results over time, stored in a MongoDB time-series collection.
+
+    Every check adds a raw sample (success and latency in ms) through a
+    batching writer. ``rollup()`` folds raw samples into hourly buckets and
+    hourly buckets into daily ones with ``$merge``, recomputing only the
+    current and previous bucket, so it can run as often as needed. Each tier
+    expires on its own TTL. Timestamps are UTC.
+    """
+
+    def __init__(self, db, raw_days=7, hourly_days=90, daily_days=730,
+                 batch_size=500, flush_interval=2.0):
+        self.db = db
+        self.raw = db.probe_history
+        self.hourly = db.probe_history_1h
+        self.daily = db.probe_history_1d
+        self.raw_days = raw_days
+        self.hourly_days = hourly_days
+        self.daily_days = daily_days
+        self.writer = BulkWriter(self.raw, batch_size, flush_interval)
+        self._ready = False
+        self._lock = threading.Lock()
+
+    def ensure(self):
+        """Create the time-series collection and rollup indexes on first use."""
+        with self._lock:
+            if self._ready:
+                return
+            try:
+                self.db.create_collection(
+                    self.raw.name,
+                    timeseries={'timeField': 'ts', 'metaField': 'meta', 'granularity': 'minutes'},
+                    expireAfterSeconds=self.raw_days * 86400)
+            except CollectionInvalid:
+                pass  # Already exists
+            for collection, days in ((self.hourly, self.hourly_days), (self.daily, self.daily_days)):
+                collection.create_index([('meta.system_id', 1), ('meta.node', 1), ('ts', 1)])
+                collection.create_index('ts', expireAfterSeconds=days * 86400)
+            self._ready = True
+
+    def record(self, system_id, check, success, latency=None, node=None):
+        """Queue one sample; ``latency`` is in milliseconds."""
+        # The writer can flush on its own, and must never create a plain collection
+        self.ensure()
+        self.writer.insert_one({
+            'ts': datetime.utcnow(),
+            'meta': {'system_id': system_id, 'node': node, 'check': check},
+            'success': bool(success),
+            'latency': float(latency) if latency is not None else None
+        })
+
+    def flush(self):
+        self.ensure()
+        self.writer.flush()
+
+    def rollup(self, now=None):
+        """Refresh the hourly and daily buckets that may still be changing."""
+        self.ensure()
+        now = now or datetime.utcnow()
+        hour_start = now.replace(minute=0, second=0, microsecond=0) - timedelta(hours=1)
+        day_start = now.replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(days=1)
+
+        self.raw.aggregate([{'$match': {'ts': {'$gte': hour_start}}}, SAMPLE_FIELDS] +
+                           rollup_stages('hour') +
+                           [{'$merge': {'into': self.hourly.name, 'whenMatched': 'replace'}}])
+        self.hourly.aggregate([{'$match': {'ts': {'$gte': day_start}}}] +
+                              rollup_stages('day') +
+                              [{'$merge': {'into': self.daily.name, 'whenMatched': 'replace'}}])
+
+    def series(self, system_id, resolution, start, end, node=None, check=None):
+        """Return the points for a system (or one of its cluster nodes) between start and end."""
+        self.ensure()
+        match = {'meta.system_id': system_id, 'meta.node': node, 'ts': {'$gte': start, '$lt': end}}
+        if check:
+            match['meta.check'] = check
+
+        # Include the bucket that start falls in
+        if resolution == '1h':
+            match['ts']['$gte'] = start.replace(minute=0, second=0, microsecond=0)
+        elif resolution == '1d':
+            match['ts']['$gte'] = start.replace(hour=0, minute=0, second=0, microsecond=0)
+
+        if resolution == '1m':
+            buckets = self.raw.aggregate([{'$match': match}, SAMPLE_FIELDS] +
+                                         rollup_stages('minute') +
+                                         [{'$sort': {'ts': 1, 'meta.check': 1}}])
+        else:
+            collection = self.hourly if resolution == '1h' else self.daily
+            buckets = collection.find(match).sort([('ts', 1), ('meta.check', 1)])
+        return [point(bucket) for bucket in buckets]
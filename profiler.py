@@ -0,0 +1,102 @@
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+
+
+def frame_stack(frame):
+    """Return a frame's call stack, outermost first, as 'function (file:line)' labels."""
+    stack = []
+    while frame is not None:
+        code = frame.f_code
+        stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+        frame = frame.f_back
+    stack.reverse()
+    return stack
+
+
+def folded(samples):
+    """Render stack counts in the collapsed format read by flamegraph.pl and speedscope."""
+    return ''.join(f"{stack} {count}\n" for stack, count in samples.most_common())
+
+
+class ProfileSession:
+    """One profiling run: either every thread for a time, or the next ``requests`` requests."""
+
+    def __init__(self, requests=None):
+        self.remaining = requests
+        self.active = set()
+        self.finished = 0
+        self.done = threading.Event()
+        self._lock = threading.Lock()
+
+    def enter(self):
+        """Start profiling the calling request thread if the session still wants requests."""
+        with self._lock:
+            if not self.remaining:
+                return False
+            self.remaining -= 1
+            self.active.add(threading.get_ident())
+            return True
+
+    def leave(self):
+        with self._lock:
+            self.active.discard(threading.get_ident())
+            self.finished += 1
+            if not self.remaining and not self.active:
+                self.done.set()
+
+    def targets(self, exclude):
+        if self.remaining is None:
+            return None  # Every thread
+        with self._lock:
+            return set(self.active) - exclude
+
+
+class SamplingProfiler:
+    """Statistical profiler that samples thread stacks every ``interval`` seconds.
+
+    Nothing runs while no session is active; request hooks only check
+    ``session``. Only one session runs at a time per process.
+    """
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.session = None
+        self._lock = threading.Lock()
+
+    def profile(self, seconds=None, requests=None, timeout=60):
+        """Profile every thread for ``seconds``, or the next ``requests`` requests of this process.
+
+        Returns (folded stacks, number of samples, requests profiled).
+        """
+        session = ProfileSession(requests)
+        with self._lock:
+            if self.session is not None:
+                raise RuntimeError('A profile is already running')
+            self.session = session
+
+        samples = Counter()
+        exclude = {threading.get_ident()}
+        names = {}
+        deadline = time.monotonic() + (seconds if requests is None else timeout)
+        try:
+            while time.monotonic() < deadline and not session.done.is_set():
+                targets = session.targets(exclude)
+                frames = sys._current_frames()
+                if any(ident not in names for ident in frames):
+                    names = {thread.ident: re.sub(r'[_-]?\d+$', '', thread.name)
+                             for thread in threading.enumerate()}
+                for ident, frame in frames.items():
+                    if ident in exclude or (targets is not None and ident not in targets):
+                        continue
+                    stack = [names.get(ident, 'thread')] + frame_stack(frame)
+                    samples[';'.join(stack)] += 1
+                del frames
+                time.sleep(self.interval)
+        finally:
+            with self._lock:
+                self.session = None
+        return folded(samples), sum(samples.values()), session.finished
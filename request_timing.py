@@ -0,0 +1,102 @@
+import functools
+import threading
+import time
+from contextlib import contextmanager
+
+from flask.json.provider import DefaultJSONProvider
+from pymongo import monitoring
+
+# Spans of the request handled by the current thread: {name: [seconds, count]}
+_local = threading.local()
+
+
+def start():
+    _local.spans = {}
+    _local.started = time.perf_counter()
+
+
+def finish():
+    """Stop collecting for this thread; returns (spans, total seconds) or None."""
+    spans = _local.__dict__.pop('spans', None)
+    started = _local.__dict__.pop('started', None)
+    if spans is None:
+        return None
+    return spans, time.perf_counter() - started
+
+
+def add(name, seconds):
+    spans = getattr(_local, 'spans', None)
+    if spans is not None:
+        entry = spans.setdefault(name, [0.0, 0])
+        entry[0] += seconds
+        entry[1] += 1
+
+
+@contextmanager
+def span(name):
+    """Add the time spent in the block to span ``name`` of the current request, if any."""
+    if getattr(_local, 'spans', None) is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        add(name, time.perf_counter() - started)
+
+
+def spanned(name):
+    """Decorator counting each call of a function in span ``name``."""
+    def decorate(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def server_timing(spans, total):
+    """Format spans as a Server-Timing header value, in milliseconds."""
+    parts = [f'{name};dur={seconds * 1000:.2f};desc="{count}x"'
+             for name, (seconds, count) in sorted(spans.items())]
+    parts.append(f"total;dur={total * 1000:.2f}")
+    return ', '.join(parts)
+
+
+class MongoSpanListener(monitoring.CommandListener):
+    """Count MongoDB command time in the 'db' span of the calling request."""
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        add('db', event.duration_micros / 1e6)
+
+    def failed(self, event):
+        add('db', event.duration_micros / 1e6)
+
+
+class TimedJSONProvider(DefaultJSONProvider):
+    """JSON provider that counts jsonify() time in the 'serialize' span."""
+
+    def dumps(self, obj, **kwargs):
+        with span('serialize'):
+            return super().dumps(obj, **kwargs)
+
+
+def init_app(app):
+    """Collect spans for every request and report them in a Server-Timing header."""
+    app.json = TimedJSONProvider(app)
+
+    @app.before_request
+    def start_spans():
+        start()
+
+    @app.after_request
+    def add_server_timing(response):
+        # Streamed responses only report the time until their headers are sent
+        timing = finish()
+        if timing is not None:
+            response.headers['Server-Timing'] = server_timing(*timing)
+        return response
@@ -0,0 +1,225 @@
+import os
+import re
+import signal
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from datetime import datetime
+from urllib.parse import urlparse
+
+OUTPUT_LIMIT = 1000
+# Host names and IPv4/IPv6 addresses; nothing that ssh could read as an option
+HOST_PATTERN = re.compile(r'^[A-Za-z0-9][A-Za-z0-9._:%-]*$')
+USER_PATTERN = re.compile(r'^[A-Za-z0-9_][A-Za-z0-9_.-]*$')
+
+
+class SequenceError(ValueError):
+    """Raised when a shutdown plan cannot be run, e.g. because of a dependency cycle."""
+
+
+def sequence_steps(system):
+    """Return the shutdown steps of a system as a list of commands."""
+    steps = system.get('shutdown_sequence')
+    if isinstance(steps, str):
+        steps = [] if steps.strip() in ('', 'N/A') else steps.split(';')
+    return [step.strip() for step in steps or [] if isinstance(step, str) and step.strip()]
+
+
+def dependency_graph(systems):
+    """Map each system _id to the _ids it must wait for.
+
+    A system waits for every system named in its ``shutdown_after`` list that
+    is part of the same run; names outside the run are ignored. Raises
+    SequenceError if the dependencies form a cycle.
+    """
+    by_name = {system.get('name'): system['_id'] for system in systems}
+    graph = {}
+    for system in systems:
+        after = system.get('shutdown_after') or []
+        if isinstance(after, str):
+            after = after.split(';')
+        graph[system['_id']] = {by_name[name.strip()] for name in after
+                                if name.strip() in by_name and by_name[name.strip()] != system['_id']}
+
+    # Kahn's algorithm: anything left unvisited is on a cycle
+    waiting = {system_id: len(deps) for system_id, deps in graph.items()}
+    dependents = {system_id: [] for system_id in graph}
+    for system_id, deps in graph.items():
+        for dep in deps:
+            dependents[dep].append(system_id)
+    ready = [system_id for system_id, count in waiting.items() if count == 0]
+    visited = 0
+    while ready:
+        system_id = ready.pop()
+        visited += 1
+        for dependent in dependents[system_id]:
+            waiting[dependent] -= 1
+            if waiting[dependent] == 0:
+                ready.append(dependent)
+    if visited != len(graph):
+        names = {system['_id']: system.get('name') for system in systems}
+        cycle = sorted(names[system_id] for system_id, count in waiting.items() if count > 0)
+        raise SequenceError(f"Shutdown dependencies form a cycle between: {', '.join(cycle)}")
+    return graph
+
+
+class SubprocessRunner:
+    """Run each step as a subprocess, killing its whole process group on timeout."""
+
+    def command(self, system, step):
+        raise NotImplementedError
+
+    def run(self, system, step, timeout):
+        """Run one step and return {'status': 'ok'|'failed'|'timeout', 'output': ...}."""
+        process = subprocess.Popen(self.command(system, step), stdout=subprocess.PIPE,
+                                   stderr=subprocess.STDOUT, stdin=subprocess.DEVNULL,
+                                   start_new_session=True)
+        try:
+            output, _ = process.communicate(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            os.killpg(process.pid, signal.SIGKILL)
+            output, _ = process.communicate()
+            return {'status': 'timeout', 'output': self._tail(output)}
+        status = 'ok' if process.returncode == 0 else 'failed'
+        return {'status': status, 'output': self._tail(output), 'exit_code': process.returncode}
+
+    @staticmethod
+    def _tail(output):
+        return (output or b'').decode('utf-8', 'replace')[-OUTPUT_LIMIT:]
+
+
+class LocalRunner(SubprocessRunner):
+    """Run steps with the local shell; a stand-in for remote hosts when testing."""
+
+    def command(self, system, step):
+        return ['/bin/sh', '-c', step]
+
+
+class SSHRunner(SubprocessRunner):
+    """Run steps on the system's target host over ssh (key-based, non-interactive)."""
+
+    def __init__(self, user=None, connect_timeout=10):
+        if user and not USER_PATTERN.match(user):
+            raise SequenceError(f"Invalid ssh user: {user!r}")
+        self.user = user
+        self.connect_timeout = connect_timeout
+
+    def command(self, system, step):
+        target = system.get('target') or ''
+        host = urlparse(target).hostname if '://' in target else target
+        if not host or not HOST_PATTERN.match(host):
+            raise SequenceError(f"Invalid ssh host: {host!r}")
+        destination = f"{self.user}@{host}" if self.user else host
+        return ['ssh', '-o', 'BatchMode=yes', '-o', f"ConnectTimeout={self.connect_timeout}",
+                '--', destination, step]
+
+
+class DryRunRunner:
+    """Pretend to run every step successfully, optionally taking ``delay`` seconds."""
+
+    def __init__(self, delay=0):
+        self.delay = delay
+
+    def run(self, system, step, timeout):
+        if self.delay:
+            time.sleep(min(self.delay, timeout))
+        return {'status': 'ok', 'output': f"dry run: {step}"}
+
+
+class SequenceEngine:
+    """Run shutdown sequences for many systems in dependency order.
+
+    Systems whose dependencies are done run in parallel, up to
+    ``concurrency`` at once; the steps of one system run one after another,
+    each limited to ``step_timeout`` seconds. When a system fails, systems
+    that wait for it are skipped. ``on_progress(system, sequence_status,
+    progress)`` is called on every change so callers can store it live.
+    ``runner`` is anything with ``run(system, step, timeout)`` returning a
+    dict with a ``status`` of 'ok', 'failed' or 'timeout'.
+    """
+
+    def __init__(self, runner, concurrency=10, step_timeout=300, on_progress=None):
+        self.runner = runner
+        self.concurrency = max(1, int(concurrency))
+        self.step_timeout = step_timeout
+        self.on_progress = on_progress
+
+    def _notify(self, system, sequence_status, progress):
+        if self.on_progress:
+            self.on_progress(system, sequence_status, progress)
+
+    def run(self, systems, run_id=None):
+        """Run every system's sequence; returns {_id: 'completed'|'failed'|'skipped'}."""
+        systems = {system['_id']: system for system in systems}
+        graph = dependency_graph(list(systems.values()))
+        dependents = {system_id: [] for system_id in graph}
+        for system_id, deps in graph.items():
+            for dep in deps:
+                dependents[dep].append(system_id)
+
+        results = {}
+        waiting = {system_id: set(deps) for system_id, deps in graph.items()}
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='sequence') as pool:
+            futures = {}
+
+            def start_ready():
+                for system_id, deps in list(waiting.items()):
+                    if not deps:
+                        del waiting[system_id]
+                        futures[pool.submit(self._run_system, systems[system_id], run_id)] = system_id
+
+            def skip(system_id, reason):
+                if system_id in results:
+                    return
+                waiting.pop(system_id, None)
+                results[system_id] = 'skipped'
+                self._notify(systems[system_id], 'not_started', {
+                    'run_id': run_id, 'state': 'skipped', 'reason': reason,
+                    'finished_at': datetime.now()
+                })
+                for dependent in dependents[system_id]:
+                    skip(dependent, reason)
+
+            start_ready()
+            while futures:
+                done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for future in done:
+                    system_id = futures.pop(future)
+                    try:
+                        completed = future.result()
+                    except Exception:
+                        completed = False
+                    results[system_id] = 'completed' if completed else 'failed'
+                    for dependent in dependents[system_id]:
+                        if completed:
+                            if dependent in waiting:
+                                waiting[dependent].discard(system_id)
+                        else:
+                            skip(dependent, f"{systems[system_id].get('name')} failed")
+                start_ready()
+        return results
+
+    def _run_system(self, system, run_id):
+        steps = [{'command': command, 'status': 'pending'} for command in sequence_steps(system)]
+        progress = {'run_id': run_id, 'state': 'running', 'step': 0, 'total': len(steps),
+                    'steps': steps, 'started_at': datetime.now()}
+        self._notify(system, 'in_progress', progress)
+
+        for index, step in enumerate(steps):
+            progress['step'] = index + 1
+            step.update(status='running', started_at=datetime.now())
+            self._notify(system, 'in_progress', progress)
+            try:
+                result = self.runner.run(system, step['command'], self.step_timeout)
+            except Exception as e:
+                result = {'status': 'failed', 'output': str(e)}
+            step.update(status=result['status'], output=result.get('output', ''),
+                        finished_at=datetime.now())
+            if result['status'] != 'ok':
+                progress.update(state='failed', finished_at=datetime.now())
+                self._notify(system, 'failed', progress)
+                return False
+
+        progress.update(state='completed', finished_at=datetime.now())
+        self._notify(system, 'completed', progress)
+        return True
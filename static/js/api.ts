@@ -7,9 +7,25 @@ class ApiService {
         return response.json();
     }
 
-    static async getSystems(): Promise<System[]> {
-        const response = await fetch('/api/systems');
-        return this.handleResponse<System[]>(response);
+    static async getSystems(params: SystemsQuery = {}): Promise<SystemsPage> {
+        const query = new URLSearchParams(params as Record<string, string>);
+        const response = await fetch(`/api/systems?${query}`);
+        return this.handleResponse<SystemsPage>(response);
+    }
+
+    // Systems changed since an earlier as_of, with the ids of deleted ones; null when since is too old
+    static async getSystemChanges(since: string): Promise<SystemsPage | null> {
+        const response = await fetch(`/api/systems?${new URLSearchParams({ since })}`);
+        if (response.status === 410) {
+            return null;
+        }
+        return this.handleResponse<SystemsPage>(response);
+    }
+
+    static async getSystem(systemId: string): Promise<System> {
+        const response = await fetch(`/api/systems/${systemId}`);
+        const data = await this.handleResponse<{ system: System }>(response);
+        return data.system;
     }
 
     static async testSystem(systemId: string): Promise<{ status: boolean; errors?: Record<string, string> }> {
@@ -7,11 +7,28 @@ export class ApiService {
         return response.json();
     }
 
-    static async getSystems() {
-        const response = await fetch('/api/systems');
+    // Returns one page: { systems, next_cursor, total? }
+    static async getSystems(params = {}) {
+        const query = new URLSearchParams(params);
+        const response = await fetch(`/api/systems?${query}`);
         return this.handleResponse(response);
     }
 
+    // Systems changed since an earlier as_of, with the ids of deleted ones; null when since is too old
+    static async getSystemChanges(since) {
+        const response = await fetch(`/api/systems?${new URLSearchParams({ since })}`);
+        if (response.status === 410) {
+            return null;
+        }
+        return this.handleResponse(response);
+    }
+
+    static async getSystem(systemId) {
+        const response = await fetch(`/api/systems/${systemId}`);
+        const data = await this.handleResponse(response);
+        return data.system;
+    }
+
     static async testSystem(systemId) {
         const response = await fetch(`/api/systems/${systemId}/test`, {
             method: 'POST'
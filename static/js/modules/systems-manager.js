@@ -1,12 +1,24 @@
 import { ApiService } from './api-service.js';
 import { UiService } from './ui-service.js';
 
+const SYSTEMS_PAGE_SIZE = 200;
+// Polling for changes while no event stream is open
+const CHANGES_POLL_INTERVAL = 10000;
+const STREAM_BACKOFF_MAX = 60000;
+
 export class SystemsManager {
+    // as_of of the last full list, where polling for changes starts
+    static #systemsAsOf = null;
+    static #pollTimer = null;
+    static #streamBackoff = 1000;
+    static #lastEventId = null;
+
     static async initialize() {
         try {
             UiService.initialize();
             await this.loadSystems();
             this.setupEventListeners();
+            this.subscribeToEvents();
         } catch (error) {
             console.error('Error initializing SystemsManager:', error);
             UiService.showToast('Error initializing application', 'error');
@@ -29,24 +41,38 @@ export class SystemsManager {
     static async loadSystems() {
         try {
             UiService.clearSystemsContainer();
-            const systems = await ApiService.getSystems();
-            
-            if (!systems.length) {
-                UiService.showEmptyState();
-                return;
-            }
+            const container = UiService.getSystemsContainer();
+            let cursor = null;
+            let loaded = 0;
 
-            const fragment = document.createDocumentFragment();
-            systems.forEach(system => {
-                const card = UiService.createSystemCard(system);
-                if (card) {
-                    fragment.appendChild(card);
+            // Render each page as soon as it arrives instead of waiting for the whole fleet
+            do {
+                const params = { limit: SYSTEMS_PAGE_SIZE, sort: 'name' };
+                if (cursor) {
+                    params.cursor = cursor;
+                }
+                const page = await ApiService.getSystems(params);
+                if (!params.cursor) {
+                    this.#systemsAsOf = page.as_of;
                 }
-            });
 
-            const container = UiService.getSystemsContainer();
-            if (container) {
-                container.appendChild(fragment);
+                const fragment = document.createDocumentFragment();
+                page.systems.forEach(system => {
+                    const card = UiService.createSystemCard(system);
+                    if (card) {
+                        fragment.appendChild(card);
+                    }
+                });
+                if (container) {
+                    container.appendChild(fragment);
+                }
+
+                loaded += page.systems.length;
+                cursor = page.next_cursor;
+            } while (cursor);
+
+            if (!loaded) {
+                UiService.showEmptyState();
             }
         } catch (error) {
             console.error('Error loading systems:', error);
@@ -55,6 +81,83 @@ export class SystemsManager {
         }
     }
 
+    static subscribeToEvents() {
+        // Changes pushed by the server; EventSource resumes from the last event id on reconnect
+        const url = this.#lastEventId
+            ? `/api/systems/stream?${new URLSearchParams({ last_event_id: this.#lastEventId })}`
+            : '/api/systems/stream';
+        const events = new EventSource(url);
+        const listen = (type, handler) => {
+            events.addEventListener(type, (e) => {
+                if (e.lastEventId) {
+                    this.#lastEventId = e.lastEventId;
+                }
+                handler(e);
+            });
+        };
+
+        // Every stream starts with ready; a busy server sends busy instead and the
+        // browser reconnects after its retry delay, so changes are polled until then
+        listen('ready', () => {
+            this.#streamBackoff = 1000;
+            this.#stopPollingChanges();
+        });
+        listen('busy', () => this.#startPollingChanges());
+        events.onerror = () => {
+            this.#startPollingChanges();
+            if (events.readyState === EventSource.CLOSED) {
+                // The browser gave up (e.g. on an error status); open a new stream
+                setTimeout(() => this.subscribeToEvents(), this.#streamBackoff);
+                this.#streamBackoff = Math.min(this.#streamBackoff * 2, STREAM_BACKOFF_MAX);
+            }
+        };
+
+        listen('update', async (e) => {
+            const { system_id, fields } = JSON.parse(e.data);
+            if (['name', 'app_name', 'owner', 'target', 'check_type', 'cluster_nodes'].some(key => key in fields)) {
+                try {
+                    UiService.replaceSystemCard(await ApiService.getSystem(system_id));
+                } catch (error) {
+                    console.error('Error refreshing system:', error);
+                }
+            } else if ('status' in fields) {
+                UiService.updateSystemStatus(system_id, fields.status);
+            }
+        });
+        listen('add', (e) => UiService.replaceSystemCard(JSON.parse(e.data).system));
+        listen('delete', (e) => UiService.removeSystemCard(JSON.parse(e.data).system_id));
+        listen('reset', () => this.loadSystems());
+    }
+
+    static async #pollChanges() {
+        if (!this.#systemsAsOf) return;
+        try {
+            const changes = await ApiService.getSystemChanges(this.#systemsAsOf);
+            if (!changes) {
+                // Too old to diff, start over
+                await this.loadSystems();
+                return;
+            }
+            changes.systems.forEach(system => UiService.replaceSystemCard(system));
+            (changes.deleted || []).forEach(systemId => UiService.removeSystemCard(systemId));
+            this.#systemsAsOf = changes.as_of;
+        } catch (error) {
+            console.error('Error polling system changes:', error);
+        }
+    }
+
+    static #startPollingChanges() {
+        if (this.#pollTimer !== null) return;
+        this.#pollChanges();
+        this.#pollTimer = setInterval(() => this.#pollChanges(), CHANGES_POLL_INTERVAL);
+    }
+
+    static #stopPollingChanges() {
+        if (this.#pollTimer === null) return;
+        clearInterval(this.#pollTimer);
+        this.#pollTimer = null;
+    }
+
     static async testSystem(systemId) {
         try {
             const card = document.querySelector(`[data-system-id="${systemId}"]`);
@@ -91,8 +194,7 @@ export class SystemsManager {
 
     static async editSystem(systemId) {
         try {
-            const systems = await ApiService.getSystems();
-            const system = systems.find(s => s._id === systemId);
+            const system = await ApiService.getSystem(systemId);
             
             if (!system) {
                 UiService.showToast('System not found', 'error');
@@ -142,7 +244,7 @@ export class SystemsManager {
         try {
             await ApiService.deleteSystem(systemId);
             UiService.showToast('System deleted successfully', 'success');
-            await this.loadSystems();
+            UiService.removeSystemCard(systemId);
         } catch (error) {
             console.error('Error deleting system:', error);
             UiService.showToast('Error deleting system', 'error');
@@ -164,7 +266,7 @@ export class SystemsManager {
         try {
             await ApiService.updateSystem(systemId, system);
             UiService.showToast('System updated successfully', 'success');
-            await this.loadSystems();
+            UiService.replaceSystemCard(await ApiService.getSystem(systemId));
         } catch (error) {
             console.error('Error updating system:', error);
             UiService.showToast('Error updating system', 'error');
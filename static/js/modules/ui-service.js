@@ -175,6 +175,25 @@ export class UiService {
         }
     }
 
+    static replaceSystemCard(system) {
+        const existing = document.querySelector(`[data-system-id="${system._id}"]`);
+        const card = this.createSystemCard(system);
+        if (!card) return;
+
+        if (existing) {
+            existing.closest('.col').replaceWith(card);
+        } else if (this.#systemsContainer) {
+            this.#systemsContainer.appendChild(card);
+        }
+    }
+
+    static removeSystemCard(systemId) {
+        const card = document.querySelector(`[data-system-id="${systemId}"]`);
+        if (card) {
+            card.closest('.col').remove();
+        }
+    }
+
     static clearSystemsContainer() {
         if (this.#systemsContainer) {
             this.#systemsContainer.innerHTML = '';
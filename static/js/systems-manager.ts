@@ -1,4 +1,15 @@
+const SYSTEMS_PAGE_SIZE = 200;
+// Polling for changes while no event stream is open
+const CHANGES_POLL_INTERVAL = 10000;
+const STREAM_BACKOFF_MAX = 60000;
+
 class SystemsManager {
+    // as_of of the last full list, where polling for changes starts
+    private static systemsAsOf: string | null = null;
+    private static pollTimer: number | null = null;
+    private static streamBackoff: number = 1000;
+    private static lastEventId: string | null = null;
+
     static async initialize(): Promise<void> {
         try {
             if (!UiService.initialize()) {
@@ -6,6 +17,7 @@ class SystemsManager {
             }
             await this.loadSystems();
             this.setupEventListeners();
+            this.subscribeToEvents();
         } catch (error) {
             console.error('Error initializing SystemsManager:', error);
             UiService.showToast('Error initializing application', 'error');
@@ -22,24 +34,38 @@ class SystemsManager {
     static async loadSystems(): Promise<void> {
         try {
             UiService.clearSystemsContainer();
-            const systems = await ApiService.getSystems();
-            
-            if (!systems.length) {
-                UiService.showEmptyState();
-                return;
-            }
+            const container = document.getElementById('systemsContainer');
+            let cursor: string | null = null;
+            let loaded = 0;
 
-            const fragment = document.createDocumentFragment();
-            systems.forEach(system => {
-                const card = UiService.createSystemCard(system);
-                if (card) {
-                    fragment.appendChild(card);
+            // Render each page as soon as it arrives instead of waiting for the whole fleet
+            do {
+                const params: SystemsQuery = { limit: String(SYSTEMS_PAGE_SIZE), sort: 'name' };
+                if (cursor) {
+                    params.cursor = cursor;
+                }
+                const page: SystemsPage = await ApiService.getSystems(params);
+                if (!params.cursor) {
+                    this.systemsAsOf = page.as_of;
                 }
-            });
 
-            const container = document.getElementById('systemsContainer');
-            if (container) {
-                container.appendChild(fragment);
+                const fragment = document.createDocumentFragment();
+                page.systems.forEach(system => {
+                    const card = UiService.createSystemCard(system);
+                    if (card) {
+                        fragment.appendChild(card);
+                    }
+                });
+                if (container) {
+                    container.appendChild(fragment);
+                }
+
+                loaded += page.systems.length;
+                cursor = page.next_cursor;
+            } while (cursor);
+
+            if (!loaded) {
+                UiService.showEmptyState();
             }
         } catch (error) {
             console.error('Error loading systems:', error);
@@ -48,6 +74,83 @@ class SystemsManager {
         }
     }
 
+    private static subscribeToEvents(): void {
+        // Changes pushed by the server; EventSource resumes from the last event id on reconnect
+        const url = this.lastEventId
+            ? `/api/systems/stream?${new URLSearchParams({ last_event_id: this.lastEventId })}`
+            : '/api/systems/stream';
+        const events = new EventSource(url);
+        const listen = (type: string, handler: (e: MessageEvent) => void): void => {
+            events.addEventListener(type, (e: MessageEvent) => {
+                if (e.lastEventId) {
+                    this.lastEventId = e.lastEventId;
+                }
+                handler(e);
+            });
+        };
+
+        // Every stream starts with ready; a busy server sends busy instead and the
+        // browser reconnects after its retry delay, so changes are polled until then
+        listen('ready', () => {
+            this.streamBackoff = 1000;
+            this.stopPollingChanges();
+        });
+        listen('busy', () => this.startPollingChanges());
+        events.onerror = () => {
+            this.startPollingChanges();
+            if (events.readyState === EventSource.CLOSED) {
+                // The browser gave up (e.g. on an error status); open a new stream
+                setTimeout(() => this.subscribeToEvents(), this.streamBackoff);
+                this.streamBackoff = Math.min(this.streamBackoff * 2, STREAM_BACKOFF_MAX);
+            }
+        };
+
+        listen('update', async (e: MessageEvent) => {
+            const { system_id, fields }: SystemUpdateEvent = JSON.parse(e.data);
+            if (['name', 'app_name', 'owner', 'target', 'check_type', 'cluster_nodes'].some(key => key in fields)) {
+                try {
+                    UiService.replaceSystemCard(await ApiService.getSystem(system_id));
+                } catch (error) {
+                    console.error('Error refreshing system:', error);
+                }
+            } else if (fields.status !== undefined) {
+                UiService.updateSystemStatus(system_id, fields.status);
+            }
+        });
+        listen('add', (e: MessageEvent) => UiService.replaceSystemCard(JSON.parse(e.data).system));
+        listen('delete', (e: MessageEvent) => UiService.removeSystemCard(JSON.parse(e.data).system_id));
+        listen('reset', () => this.loadSystems());
+    }
+
+    private static async pollChanges(): Promise<void> {
+        if (!this.systemsAsOf) return;
+        try {
+            const changes = await ApiService.getSystemChanges(this.systemsAsOf);
+            if (!changes) {
+                // Too old to diff, start over
+                await this.loadSystems();
+                return;
+            }
+            changes.systems.forEach(system => UiService.replaceSystemCard(system));
+            (changes.deleted || []).forEach(systemId => UiService.removeSystemCard(systemId));
+            this.systemsAsOf = changes.as_of;
+        } catch (error) {
+            console.error('Error polling system changes:', error);
+        }
+    }
+
+    private static startPollingChanges(): void {
+        if (this.pollTimer !== null) return;
+        this.pollChanges();
+        this.pollTimer = window.setInterval(() => this.pollChanges(), CHANGES_POLL_INTERVAL);
+    }
+
+    private static stopPollingChanges(): void {
+        if (this.pollTimer === null) return;
+        window.clearInterval(this.pollTimer);
+        this.pollTimer = null;
+    }
+
     static async testSystem(systemId: string): Promise<void> {
         try {
             const card = document.querySelector(`[data-system-id="${systemId}"]`);
@@ -84,8 +187,7 @@ class SystemsManager {
 
     static async editSystem(systemId: string): Promise<void> {
         try {
-            const systems = await ApiService.getSystems();
-            const system = systems.find(s => s._id === systemId);
+            const system = await ApiService.getSystem(systemId);
             
             if (!system) {
                 UiService.showToast('System not found', 'error');
@@ -135,7 +237,7 @@ class SystemsManager {
         try {
             await ApiService.deleteSystem(systemId);
             UiService.showToast('System deleted successfully', 'success');
-            await this.loadSystems();
+            UiService.removeSystemCard(systemId);
         } catch (error) {
             console.error('Error deleting system:', error);
             UiService.showToast('Error deleting system', 'error');
@@ -157,7 +259,7 @@ class SystemsManager {
         try {
             await ApiService.updateSystem(systemId, system);
             UiService.showToast('System updated successfully', 'success');
-            await this.loadSystems();
+            UiService.replaceSystemCard(await ApiService.getSystem(systemId));
         } catch (error) {
             console.error('Error updating system:', error);
             UiService.showToast('Error updating system', 'error');
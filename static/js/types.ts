@@ -31,4 +31,31 @@ interface System {
     ping_error?: string;
     db_status?: boolean;
     last_error?: string;
+    check_interval?: number | null;
+}
+
+interface SystemsQuery {
+    status?: string;
+    sequence_status?: string;
+    app_name?: string;
+    owner?: string;
+    sort?: string;
+    fields?: string;
+    limit?: string;
+    cursor?: string;
+    count?: string;
+    since?: string;
+}
+
+interface SystemsPage {
+    systems: System[];
+    next_cursor: string | null;
+    as_of: string;
+    total?: number;
+    deleted?: string[];
+}
+
+interface SystemUpdateEvent {
+    system_id: string;
+    fields: Partial<System>;
 }
@@ -193,6 +193,23 @@ class UiService {
         }
     }
 
+    static replaceSystemCard(system: System): void {
+        const existing = document.querySelector(`[data-system-id="${system._id}"]`);
+        const card = this.createSystemCard(system);
+        if (!card) return;
+
+        if (existing) {
+            existing.closest('.col')?.replaceWith(card);
+        } else if (this.systemsContainer) {
+            this.systemsContainer.appendChild(card);
+        }
+    }
+
+    static removeSystemCard(systemId: string): void {
+        const card = document.querySelector(`[data-system-id="${systemId}"]`);
+        card?.closest('.col')?.remove();
+    }
+
     static clearSystemsContainer(): void {
         if (this.systemsContainer) {
             this.systemsContainer.innerHTML = '';
@@ -0,0 +1,109 @@
+import threading
+from collections import defaultdict
+
+SEQUENCE_STATUSES = ['not_started', 'in_progress', 'completed', 'failed']
+
+
+def contribution(system):
+    """Return the counters a single system document adds to the summary."""
+    if not system:
+        return {}
+    sequence_status = system.get('sequence_status') or 'not_started'
+    return {
+        'total': 1,
+        'online': 1 if system.get('status') else 0,
+        'db_total': 1 if system.get('db_name') else 0,
+        'db_online': 1 if system.get('db_status') else 0,
+        f'sequence_status.{sequence_status}': 1
+    }
+
+
+class SummaryCounters:
+    """Materialized dashboard summary kept current with $inc deltas.
+
+    The summary lives in a single document so every worker process shares it.
+    Writers describe each change as (before, after) system documents; only the
+    counters that actually change are incremented. Nothing is upserted: if the
+    document is missing, the next read rebuilds it from a full aggregation.
+    """
+
+    def __init__(self, collection, doc_id='systems', recent_errors_size=50):
+        self.collection = collection
+        self.doc_id = doc_id
+        self.recent_errors_size = recent_errors_size
+
+    def batch(self):
+        return SummaryBatch(self)
+
+    def record(self, before, after):
+        """Apply the change from before to after (None for inserts and deletes)."""
+        batch = self.batch()
+        batch.add(before, after)
+        batch.flush()
+
+    def read(self):
+        return self.collection.find_one({'_id': self.doc_id})
+
+    def replace(self, summary):
+        summary = dict(summary, _id=self.doc_id)
+        self.collection.replace_one({'_id': self.doc_id}, summary, upsert=True)
+        return summary
+
+
+class SummaryBatch:
+    """Accumulate summary deltas and write them in at most three updates."""
+
+    def __init__(self, counters):
+        self.counters = counters
+        self._increments = defaultdict(int)
+        self._errors = {}
+        self._cleared = set()
+        self._lock = threading.Lock()
+
+    def add(self, before, after):
+        system = after or before
+        if not system or '_id' not in system:
+            return
+
+        with self._lock:
+            for key, value in contribution(after).items():
+                self._increments[key] += value
+            for key, value in contribution(before).items():
+                self._increments[key] -= value
+
+            system_id = system['_id']
+            if after and after.get('last_error'):
+                self._errors[system_id] = {
+                    'system_id': system_id,
+                    'system_name': after.get('name', 'Unknown'),
+                    'error': after['last_error'],
+                    'timestamp': after.get('last_check')
+                }
+                self._cleared.discard(system_id)
+            elif after is None or 'last_error' in after:
+                self._errors.pop(system_id, None)
+                self._cleared.add(system_id)
+
+    def flush(self):
+        """Write the accumulated deltas; returns the number of updates sent."""
+        with self._lock:
+            increments = {key: value for key, value in self._increments.items() if value}
+            errors = list(self._errors.values())
+            pulled = list(self._cleared | set(self._errors))
+            self._increments.clear()
+            self._errors.clear()
+            self._cleared.clear()
+
+        collection = self.counters.collection
+        doc = {'_id': self.counters.doc_id}
+        if increments:
+            collection.update_one(doc, {'$inc': increments})
+        if pulled:
+            collection.update_one(doc, {'$pull': {'recent_errors': {'system_id': {'$in': pulled}}}})
+        if errors:
+            collection.update_one(doc, {'$push': {'recent_errors': {
+                '$each': errors,
+                '$sort': {'timestamp': -1},
+                '$slice': self.counters.recent_errors_size
+            }}})
+        return bool(increments) + bool(pulled) + bool(errors)
@@ -0,0 +1,260 @@
+import json
+import threading
+import time
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+from pymongo import CursorType
+from pymongo.errors import CollectionInvalid
+
+# Fields whose changes are pushed to dashboards. last_check is deliberately
+# missing: it changes on every probe and only rides along with real changes.
+EVENT_FIELDS = ['name', 'app_name', 'owner', 'target', 'check_type', 'status',
+                'http_status', 'ping_status', 'db_status', 'last_error', 'sequence_status',
+                'sequence_progress']
+NODE_FIELDS = ['host', 'status', 'http_status', 'ping_status']
+# Ids are made just before the insert, so an event stored after another one
+# never has an id made more than this long before it
+RESUME_WINDOW = timedelta(seconds=60)
+
+
+def plain(value):
+    """Convert BSON values to JSON-ready ones (ObjectId and datetime to strings)."""
+    if isinstance(value, dict):
+        return {key: plain(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [plain(item) for item in value]
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def node_states(nodes):
+    return [tuple(node.get(key) for key in NODE_FIELDS) if isinstance(node, dict) else (node,)
+            for node in nodes or []]
+
+
+def change_event(before, after):
+    """Describe the change from before to after as an event, or None if nothing visible changed."""
+    if after is None:
+        return {'type': 'delete', 'data': {'system_id': str(before['_id'])}}
+    if before is None:
+        return {'type': 'add', 'data': {'system_id': str(after['_id']), 'system': plain(after)}}
+
+    fields = {key: after[key] for key in EVENT_FIELDS
+              if key in after and after[key] != before.get(key)}
+    if 'cluster_nodes' in after and node_states(after['cluster_nodes']) != node_states(before.get('cluster_nodes')):
+        fields['cluster_nodes'] = after['cluster_nodes']
+    if not fields:
+        return None
+    if 'last_check' in after:
+        fields['last_check'] = after['last_check']
+    return {'type': 'update', 'data': {'system_id': str(after['_id']), 'fields': plain(fields)}}
+
+
+# First message of every stream: the browser's reconnect delay, and a ready
+# event telling clients that changes are pushed again
+STREAM_START = 'retry: 5000\nevent: ready\ndata: {}\n\n'
+# The whole response when a process has no stream to spare. It is a 200 so
+# browsers reconnect after the delay instead of giving up as they do on
+# error statuses; clients poll GET /api/systems?since= until then.
+STREAM_BUSY = 'retry: 15000\nevent: busy\ndata: {}\n\n'
+
+
+def sse_message(event):
+    """Format an event, or None for a heartbeat, as a Server-Sent Events message."""
+    if event is None:
+        return ': heartbeat\n\n'
+    return f"id: {event['_id']}\nevent: {event['type']}\ndata: {json.dumps(event['data'])}\n\n"
+
+
+def parse_event_id(value):
+    """The event id from a Last-Event-ID header or last_event_id parameter, or None."""
+    return ObjectId(value) if value and ObjectId.is_valid(value) else None
+
+
+# find_one() arguments for the newest event, and for checking that an event still exists
+NEWEST_EVENT = {'filter': {}, 'projection': {'_id': 1}, 'sort': [('$natural', -1)]}
+
+
+def event_exists_query(event_id):
+    return {'filter': {'_id': event_id}, 'projection': {'_id': 1}}
+
+
+class TailState:
+    """A reader's position in the event collection, in insertion order.
+
+    Event ids are made by each publishing process, so ids from different
+    processes are not ordered like the inserts and ``_id > last id`` could
+    skip events. Readers instead follow the collection in natural (insertion)
+    order and skip everything up to the last event they delivered. The sync
+    and async readers only do the I/O; every rule about what to query and
+    what to yield lives here.
+    """
+
+    def __init__(self, last_event_id, last_exists, newest_id, heartbeat=15):
+        self.heartbeat = heartbeat
+        self.reset = None
+        if last_event_id is not None and not last_exists:
+            # Overwritten in the capped collection: the client must reload
+            self.reset = {'_id': newest_id or last_event_id, 'type': 'reset', 'data': {}}
+            last_event_id = newest_id
+        elif last_event_id is None:
+            last_event_id = newest_id  # Only events published from now on
+        self.last = last_event_id
+        self.skipping = last_event_id is not None
+        self.quiet_since = time.monotonic()
+
+    def cursor_options(self):
+        """find() arguments for a new tailable cursor over the collection."""
+        query = {}
+        if self.skipping:
+            query = {'_id': {'$gte': ObjectId.from_datetime(self.last.generation_time - RESUME_WINDOW)}}
+        return {'filter': query, 'cursor_type': CursorType.TAILABLE_AWAIT,
+                'max_await_time_ms': int(self.heartbeat * 1000)}
+
+    def accept(self, event):
+        """Whether to deliver ``event``, read in natural order from a cursor made with cursor_options()."""
+        if self.skipping:
+            if event['_id'] == self.last:
+                self.skipping = False
+            return False
+        self.last = event['_id']
+        self.quiet_since = time.monotonic()
+        return True
+
+    def caught_up(self):
+        """Call when the cursor has no more events; returns what to yield (reset events and heartbeats)."""
+        pending = []
+        if self.skipping:
+            # The resume position was overwritten while the cursor was being read
+            self.skipping = False
+            pending.append({'_id': self.last, 'type': 'reset', 'data': {}})
+        return pending + self.idle()
+
+    def idle(self):
+        """[None] if a heartbeat is due, else []."""
+        if time.monotonic() - self.quiet_since < self.heartbeat:
+            return []
+        self.quiet_since = time.monotonic()
+        return [None]
+
+    def restart(self):
+        """Call before replacing a dead cursor, so the new one resumes after the last delivered event."""
+        self.skipping = self.last is not None
+
+
+class SystemEvents:
+    """Change feed for dashboards, stored in a capped MongoDB collection.
+
+    Writers record (before, after) system documents and only visible changes
+    become events. Readers in any worker process follow the collection with a
+    tailable cursor, so this works on a standalone mongod where change streams
+    are not available. Clients resume with the id of the last event they saw;
+    see TailState.
+    """
+
+    def __init__(self, collection, size_bytes=16 * 1024 * 1024):
+        self.collection = collection
+        self.size_bytes = size_bytes
+        self._ready = False
+        self._lock = threading.Lock()
+
+    def ensure(self):
+        """Create the capped collection on first use."""
+        with self._lock:
+            if self._ready:
+                return
+            try:
+                self.collection.database.create_collection(
+                    self.collection.name, capped=True, size=self.size_bytes)
+            except CollectionInvalid:
+                pass  # Already exists
+            self._ready = True
+
+    def batch(self):
+        return EventBatch(self)
+
+    def record(self, before, after):
+        batch = self.batch()
+        batch.add(before, after)
+        batch.flush()
+
+    def publish(self, events):
+        if not events:
+            return
+        self.ensure()
+        now = datetime.now()
+        self.collection.insert_many([dict(event, _id=ObjectId(), created_at=now) for event in events],
+                                    ordered=True)
+
+    def tail(self, last_event_id=None, heartbeat=15):
+        """Yield events after ``last_event_id``, or None every ``heartbeat`` seconds of quiet.
+
+        Without ``last_event_id`` only events published from now on are
+        returned. If ``last_event_id`` has already been overwritten in the
+        capped collection, a single ``reset`` event comes first so the client
+        knows to reload everything.
+        """
+        self.ensure()
+        newest = self.collection.find_one(**NEWEST_EVENT)
+        exists = (last_event_id is not None and
+                  self.collection.find_one(**event_exists_query(last_event_id)) is not None)
+        state = TailState(last_event_id, exists, newest['_id'] if newest else None, heartbeat)
+        if state.reset:
+            yield state.reset
+
+        while True:
+            cursor = self.collection.find(**state.cursor_options())
+            try:
+                while cursor.alive:
+                    for event in cursor:
+                        if state.accept(event):
+                            yield event
+                    yield from state.caught_up()
+            finally:
+                cursor.close()
+            state.restart()
+
+            # Tailable cursors die on an empty collection; wait for the first event
+            time.sleep(1)
+            yield from state.idle()
+
+
+class EventBatch:
+    """Accumulate change events and publish them with a single insert."""
+
+    def __init__(self, events):
+        self.events = events
+        self._pending = []
+        self._lock = threading.Lock()
+
+    def add(self, before, after):
+        event = change_event(before, after)
+        if event is not None:
+            with self._lock:
+                self._pending.append(event)
+
+    def flush(self):
+        """Publish the accumulated events; returns the number of inserts sent."""
+        with self._lock:
+            pending, self._pending = self._pending, []
+        self.events.publish(pending)
+        return 1 if pending else 0
+
+
+class BatchGroup:
+    """Fan each (before, after) change out to several batches."""
+
+    def __init__(self, *batches):
+        self.batches = batches
+
+    def add(self, before, after):
+        for batch in self.batches:
+            batch.add(before, after)
+
+    def flush(self):
+        """Flush every batch; returns the total number of writes sent."""
+        return sum(batch.flush() or 0 for batch in self.batches)
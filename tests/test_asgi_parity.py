@@ -0,0 +1,174 @@
+"""The async routes in asgi_app must answer exactly like the Flask routes."""
+import asyncio
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+
+import pytest
+from bson import ObjectId
+
+mongomock = pytest.importorskip('mongomock')
+mongomock_motor = pytest.importorskip('mongomock_motor')
+pytest.importorskip('starlette')
+pytest.importorskip('a2wsgi')
+pytest.importorskip('httpx')
+
+from starlette.testclient import TestClient  # noqa: E402
+
+import app  # noqa: E402
+import asgi_app  # noqa: E402
+
+
+@pytest.fixture
+def clients(monkeypatch):
+    """A Flask and an ASGI test client over the same in-memory database."""
+    client = mongomock.MongoClient()
+    db = client.app_monitor
+    monkeypatch.setattr(app.mongo, 'db', db)
+    monkeypatch.setattr(app.summary_counters, 'collection', db.system_summary)
+    monkeypatch.setattr(app.system_events, 'collection', db.system_events)
+    monkeypatch.setattr(app.system_events, '_ready', True)
+    monkeypatch.setattr(app, 'PROBE_SCHEDULER', False)
+
+    async_client = mongomock_motor.AsyncMongoMockClient()
+    async_client._AsyncMongoMockClient__client = client
+
+    @asynccontextmanager
+    async def lifespan(starlette_app):
+        asgi_app.mongo['db'] = async_client['app_monitor']
+        yield
+
+    monkeypatch.setattr(asgi_app.app.router, 'lifespan_context', lifespan)
+    flask_client = app.app.test_client()
+    for index in range(6):
+        flask_client.post('/api/systems', json={'name': f"web-{index}", 'app_name': f"app-{index % 2}",
+                                                'target': f"http://10.0.0.{index}", 'check_type': 'http'})
+    with TestClient(asgi_app.app) as starlette_client:
+        yield flask_client, starlette_client
+
+
+def assert_same(flask_client, starlette_client, url, headers=None):
+    expected = flask_client.get(url, headers=headers)
+    actual = starlette_client.get(url, headers=headers)
+    assert actual.status_code == expected.status_code, url
+    assert actual.text == expected.get_data(as_text=True), url
+    assert actual.headers.get('etag') == expected.headers.get('ETag'), url
+    return actual
+
+
+def test_systems_routes_match(clients):
+    flask_client, starlette_client = clients
+    for url in ['/api/systems', '/api/systems?limit=2&sort=-name&fields=name,status',
+                '/api/systems?app_name=app-1&count=1', '/api/systems?sort=bogus',
+                '/api/systems?since=not-a-date', '/api/systems/summary', '/api/systems/' + 'a' * 24]:
+        assert_same(flask_client, starlette_client, url)
+
+    first = assert_same(flask_client, starlette_client, '/api/systems?limit=2')
+    assert_same(flask_client, starlette_client, f"/api/systems?limit=2&cursor={first.json()['next_cursor']}")
+    assert_same(flask_client, starlette_client, '/api/systems?limit=2', {'If-None-Match': first.headers['etag']})
+    system_id = first.json()['systems'][0]['_id']
+    assert_same(flask_client, starlette_client, f"/api/systems/{system_id}")
+
+    # Deltas with tombstones
+    as_of = first.json()['as_of']
+    flask_client.delete(f"/api/systems/{system_id}")
+    delta = assert_same(flask_client, starlette_client, f"/api/systems?since={as_of}")
+    assert system_id in delta.json()['deleted']
+
+
+class FakeCursor:
+    def __init__(self, docs):
+        self.docs = docs
+        self.alive = True
+
+    def __iter__(self):
+        yield from self.docs
+        self.alive = False
+
+    def close(self):
+        pass
+
+
+class FakeEvents:
+    """Capped collection stand-in: documents in insertion order, tailable cursors that end when read."""
+
+    def __init__(self, docs):
+        self.docs = docs
+
+    @staticmethod
+    def matches(doc, query):
+        wanted = query.get('_id')
+        if wanted is None:
+            return True
+        if isinstance(wanted, dict):
+            return doc['_id'] >= wanted['$gte']
+        return doc['_id'] == wanted
+
+    def find_one(self, filter, projection=None, sort=None):
+        docs = reversed(self.docs) if sort == [('$natural', -1)] else self.docs
+        return next((doc for doc in docs if self.matches(doc, filter)), None)
+
+    def find(self, filter, cursor_type=None, max_await_time_ms=None):
+        return FakeCursor([doc for doc in self.docs if self.matches(doc, filter)])
+
+
+class AsyncFakeCursor(FakeCursor):
+    async def __anext__(self):
+        if not self.docs:
+            self.alive = False
+            raise StopAsyncIteration
+        return self.docs.pop(0)
+
+    def __aiter__(self):
+        return self
+
+    async def close(self):
+        pass
+
+
+class AsyncFakeEvents(FakeEvents):
+    async def find_one(self, filter, projection=None, sort=None):
+        return FakeEvents.find_one(self, filter, projection, sort)
+
+    def find(self, filter, cursor_type=None, max_await_time_ms=None):
+        return AsyncFakeCursor([doc for doc in self.docs if self.matches(doc, filter)])
+
+
+def until_heartbeat(events):
+    found = []
+    for event in events:
+        if event is None:
+            return found
+        found.append(event)
+
+
+async def async_until_heartbeat(events):
+    found = []
+    async for event in events:
+        if event is None:
+            return found
+        found.append(event)
+
+
+@pytest.mark.parametrize('resume', ['first', 'out_of_order', 'overwritten', 'none'])
+def test_event_tail_matches(resume):
+    now = datetime.utcnow()
+    first = ObjectId.from_datetime(now - timedelta(seconds=5))
+    newer = ObjectId.from_datetime(now)
+    # Made before `newer` in another process but inserted after it
+    older = ObjectId.from_datetime(now - timedelta(seconds=1))
+    docs = [{'_id': event_id, 'type': 'update', 'data': {'n': index}}
+            for index, event_id in enumerate([first, newer, older])]
+    last_event_id = {'first': first, 'out_of_order': newer, 'none': None,
+                     'overwritten': ObjectId.from_datetime(now - timedelta(days=1))}[resume]
+
+    events = app.SystemEvents(FakeEvents(docs))
+    events._ready = True
+    expected = until_heartbeat(events.tail(last_event_id, heartbeat=0.05))
+    actual = asyncio.run(async_until_heartbeat(
+        asgi_app.tail_events(AsyncFakeEvents(docs), last_event_id, heartbeat=0.05)))
+
+    assert actual == expected
+    if resume == 'out_of_order':
+        assert [event['_id'] for event in expected] == [older]
+    if resume == 'overwritten':
+        assert expected[0]['type'] == 'reset'
@@ -0,0 +1,21 @@
+import threading
+
+import app
+from system_events import STREAM_BUSY, STREAM_START
+
+
+def test_streams_over_the_cap_get_a_busy_event(monkeypatch):
+    monkeypatch.setattr(app, 'event_stream_slots', threading.BoundedSemaphore(1))
+    client = app.app.test_client()
+
+    first = client.get('/api/systems/stream', buffered=False)
+    assert next(first.response).decode() == STREAM_START
+
+    # EventSource reconnects after a 200 but gives up on an error status
+    busy = client.get('/api/systems/stream')
+    assert busy.status_code == 200
+    assert busy.mimetype == 'text/event-stream'
+    assert busy.get_data(as_text=True) == STREAM_BUSY
+
+    first.close()
+    assert app.event_stream_slots.acquire(blocking=False)
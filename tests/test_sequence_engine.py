@@ -0,0 +1,106 @@
+import os
+import threading
+import time
+
+import pytest
+
+from sequence_engine import LocalRunner, SequenceEngine, SequenceError, SSHRunner
+
+
+def test_ssh_command_ends_options_before_destination():
+    command = SSHRunner(user='ops').command({'target': 'https://db1.example.com:8443/health'}, 'service app stop')
+    assert command[-3:] == ['--', 'ops@db1.example.com', 'service app stop']
+
+
+@pytest.mark.parametrize('target', ['-oProxyCommand=touch /tmp/pwned', 'http://-oProxyCommand=x/', '', 'host name'])
+def test_ssh_rejects_targets_read_as_options(target):
+    with pytest.raises(SequenceError):
+        SSHRunner().command({'target': target}, 'service app stop')
+
+
+def test_ssh_rejects_user_read_as_option():
+    with pytest.raises(SequenceError):
+        SSHRunner(user='-oProxyCommand=x')
+
+
+def test_invalid_target_fails_the_system():
+    system = {'_id': 1, 'name': 'web', 'target': '-oProxyCommand=touch /tmp/pwned',
+              'shutdown_sequence': ['service app stop']}
+    assert SequenceEngine(SSHRunner()).run([system]) == {1: 'failed'}
+
+
+class RecordingRunner:
+    """Records the steps it runs; steps named in ``failing`` fail."""
+
+    def __init__(self, failing=(), delay=0):
+        self.failing = set(failing)
+        self.delay = delay
+        self.steps = []
+        self.running = 0
+        self.most_running = 0
+        self._lock = threading.Lock()
+
+    def run(self, system, step, timeout):
+        with self._lock:
+            self.running += 1
+            self.most_running = max(self.most_running, self.running)
+        time.sleep(self.delay)
+        with self._lock:
+            self.running -= 1
+            self.steps.append(step)
+        return {'status': 'failed' if step in self.failing else 'ok'}
+
+
+def fleet(*specs):
+    """Systems from (name, shutdown_after) pairs, each with one step named after it."""
+    return [{'_id': index, 'name': name, 'shutdown_after': after, 'shutdown_sequence': [f"stop {name}"]}
+            for index, (name, after) in enumerate(specs)]
+
+
+def test_systems_wait_for_their_dependencies():
+    runner = RecordingRunner(delay=0.01)
+    systems = fleet(('db', ['app1', 'app2']), ('app1', ['lb']), ('app2', []), ('lb', []))
+    assert set(SequenceEngine(runner).run(systems).values()) == {'completed'}
+    order = runner.steps.index
+    assert order('stop lb') < order('stop app1') < order('stop db')
+    assert order('stop app2') < order('stop db')
+
+
+def test_failure_skips_every_dependent():
+    progress = []
+    engine = SequenceEngine(RecordingRunner(failing=['stop app']),
+                            on_progress=lambda system, status, state: progress.append((system['name'], state['state'])))
+    systems = fleet(('app', []), ('db', ['app']), ('backup', ['db']), ('other', []))
+    results = engine.run(systems)
+    assert results == {0: 'failed', 1: 'skipped', 2: 'skipped', 3: 'completed'}
+    assert ('db', 'skipped') in progress and ('backup', 'skipped') in progress
+
+
+def test_concurrency_limit():
+    runner = RecordingRunner(delay=0.05)
+    systems = fleet(*[(f"web-{index}", []) for index in range(6)])
+    SequenceEngine(runner, concurrency=2).run(systems)
+    assert runner.most_running == 2
+
+
+def alive(pid):
+    try:
+        with open(f"/proc/{pid}/stat") as stat:
+            # Killed children may linger as zombies until they are reaped
+            return stat.read().rsplit(')', 1)[1].split()[0] != 'Z'
+    except FileNotFoundError:
+        return False
+
+
+@pytest.mark.skipif(not os.path.isdir('/proc'), reason='needs /proc')
+def test_timeout_kills_the_whole_process_group(tmp_path):
+    pid_file = tmp_path / 'pid'
+    started = time.monotonic()
+    result = LocalRunner().run({}, f"sleep 30 & echo $! > {pid_file}; wait", timeout=0.5)
+    assert result['status'] == 'timeout'
+    assert time.monotonic() - started < 10
+    pid = int(pid_file.read_text())
+    deadline = time.monotonic() + 5
+    while alive(pid) and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert not alive(pid)
@@ -0,0 +1,51 @@
+import pytest
+from bson import ObjectId
+
+import app
+
+mongomock = pytest.importorskip('mongomock')
+
+
+@pytest.fixture
+def db(monkeypatch):
+    db = mongomock.MongoClient().app_monitor
+    monkeypatch.setattr(app.mongo, 'db', db)
+    monkeypatch.setattr(app.summary_counters, 'collection', db.system_summary)
+    monkeypatch.setattr(app.system_events, 'collection', db.system_events)
+    monkeypatch.setattr(app.system_events, '_ready', True)
+    db.systems.insert_many([
+        {'_id': ObjectId(), 'name': 'app', 'sequence_status': 'not_started', 'shutdown_sequence': ['stop app']},
+        {'_id': ObjectId(), 'name': 'db', 'sequence_status': 'not_started', 'shutdown_sequence': ['stop db'],
+         'shutdown_after': ['app']}
+    ])
+    return db
+
+
+def test_dry_run_leaves_systems_alone(db, monkeypatch):
+    monkeypatch.setattr(app, 'SEQUENCE_RUNNER', 'dry-run')
+    systems = list(db.systems.find())
+    run_id = ObjectId()
+    assert app.claim_sequence_systems(run_id, systems) == []
+    db.sequence_runs.insert_one({'_id': run_id, 'status': 'running', 'runner': 'dry-run',
+                                 'system_ids': [system['_id'] for system in systems]})
+    app.run_sequence(run_id, systems)
+
+    assert [system['sequence_status'] for system in db.systems.find()] == ['not_started', 'not_started']
+    assert db.systems.count_documents({'sequence_run': {'$exists': True}}) == 0
+    assert db.system_events.count_documents({}) == 0
+    run = app.app.test_client().get(f"/api/sequence/runs/{run_id}").get_json()
+    assert run['status'] == 'completed'
+    assert [system['sequence_status'] for system in run['systems']] == ['completed', 'completed']
+
+
+def test_systems_in_a_run_cannot_join_another(db):
+    systems = list(db.systems.find())
+    first = ObjectId()
+    assert app.claim_sequence_systems(first, systems[:1]) == []
+    assert app.claim_sequence_systems(ObjectId(), systems) == ['app']
+    # The losing claim reserved nothing
+    assert db.systems.count_documents({'sequence_run': str(first)}) == 1
+    assert db.systems.count_documents({'sequence_run': {'$exists': True}}) == 1
+
+    app.release_sequence_systems(first)
+    assert app.claim_sequence_systems(ObjectId(), systems) == []
@@ -0,0 +1,117 @@
+import threading
+import time
+
+import pytest
+from bson import ObjectId
+
+import app
+from check_scheduler import CheckScheduler
+from probe_engine import ProbeEngine
+
+
+@pytest.fixture
+def scheduler(monkeypatch):
+    scheduler = CheckScheduler(default_interval=10, min_interval=10, jitter=0)
+    monkeypatch.setattr(app, 'check_scheduler', scheduler)
+    return scheduler
+
+
+def test_failed_store_still_schedules_next_check(scheduler, monkeypatch):
+    system = {'_id': ObjectId(), 'name': 'web', 'status': True}
+    scheduler.sync([system], now=0)
+    assert scheduler.pop_due(10, now=time.monotonic() + 100) == [system]
+
+    def fail(*args):
+        raise RuntimeError('write failed')
+    monkeypatch.setattr(app, 'record_system_status', fail)
+
+    with pytest.raises(RuntimeError):
+        app.store_check_result(None, system, {'status': True}, None)
+
+    assert scheduler.stats()['in_flight'] == 0
+    assert [due['_id'] for due in scheduler.pop_due(10, now=time.monotonic() + 100)] == [system['_id']]
+
+
+def test_sweep_probes_count_as_in_flight():
+    engine = ProbeEngine(concurrency=2)
+    started = threading.Event()
+    release = threading.Event()
+
+    def probe(item):
+        started.set()
+        release.wait(5)
+        return item
+
+    results = engine.imap(probe, range(2))
+    first = threading.Thread(target=lambda: next(results))
+    first.start()
+    started.wait(5)
+    assert engine.in_flight == 2 and engine.available() == 0
+    release.set()
+    first.join(5)
+    list(results)
+    assert engine.in_flight == 0
+
+
+@pytest.fixture
+def db(monkeypatch):
+    mongomock = pytest.importorskip('mongomock')
+    db = mongomock.MongoClient().app_monitor
+    monkeypatch.setattr(app.mongo, 'db', db)
+    monkeypatch.setattr(app.summary_counters, 'collection', db.system_summary)
+    monkeypatch.setattr(app.system_events, 'collection', db.system_events)
+    monkeypatch.setattr(app.system_events, '_ready', True)
+    monkeypatch.setattr(app, 'record_sample', lambda *args, **kwargs: None)
+    db.system_summary.insert_one({'_id': 'systems', 'total': 1, 'online': 1})
+    return db
+
+
+def online(db):
+    return db.system_summary.find_one({'_id': 'systems'})['online']
+
+
+def test_status_writer_counts_summary_and_event_writes(db):
+    system = {'_id': ObjectId(), 'name': 'web', 'status': True, 'last_error': ''}
+    db.systems.insert_one(dict(system))
+
+    writer = app.status_writer()
+    app.record_system_status(writer, system, {'status': False, 'last_error': 'down'}, None)
+    writer.flush()
+
+    # The status update, the summary $inc, $pull and $push, and the change event
+    assert writer.round_trips == 5
+    assert online(db) == 0
+
+
+def test_failed_status_write_records_no_change(db, monkeypatch):
+    system = {'_id': ObjectId(), 'name': 'web', 'status': True, 'last_error': ''}
+    db.systems.insert_one(dict(system))
+
+    def fail(*args, **kwargs):
+        raise RuntimeError('write failed')
+    monkeypatch.setattr(db.systems, 'bulk_write', fail)
+
+    writer = app.status_writer()
+    app.record_system_status(writer, system, {'status': False}, None)
+    with pytest.raises(RuntimeError):
+        writer.flush()
+    assert online(db) == 1
+    assert db.system_events.count_documents({}) == 0
+
+
+def test_status_change_comes_from_the_stored_document(db):
+    # Cached as online, but the stored document went offline since
+    system = {'_id': ObjectId(), 'name': 'web', 'status': True, 'last_error': ''}
+    db.systems.insert_one(dict(system, status=False))
+    db.system_summary.update_one({'_id': 'systems'}, {'$set': {'online': 0}})
+    gone = {'_id': ObjectId(), 'name': 'old', 'status': True, 'last_error': ''}
+
+    writer = app.status_writer()
+    app.record_system_status(writer, system, {'status': False}, None)
+    app.record_system_status(writer, gone, {'status': False}, None)
+    writer.flush()
+
+    stored = db.systems.find_one({'_id': system['_id']})
+    assert stored['status'] is False and 'last_check' in stored
+    assert online(db) == 0
+    assert db.system_events.count_documents({}) == 0